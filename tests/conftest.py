@@ -1,5 +1,7 @@
 import os
 
+import pytest
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
 PROJECT_DIR_NAME = 'yatube'
@@ -37,3 +39,9 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def strict_query_budget(settings):
+    """Превышение бюджета запросов и N+1 роняют тест."""
+    settings.QUERY_BUDGET_STRICT = True
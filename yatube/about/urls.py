@@ -1,9 +1,12 @@
 from django.urls import path
+
+from core.replicas import use_replica
 from . import views
 
 app_name = 'about'
 
 urlpatterns = [
-    path('author/', views.AboutAuthorView.as_view(), name='author'),
-    path('tech/', views.AboutTechView.as_view(), name='tech'),
+    path('author/', use_replica(views.AboutAuthorView.as_view()),
+         name='author'),
+    path('tech/', use_replica(views.AboutTechView.as_view()), name='tech'),
 ]
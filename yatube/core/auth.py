@@ -0,0 +1,53 @@
+"""Кеш пользователя для AuthenticationMiddleware.
+
+Каждый запрос авторизованного посетителя достаёт пользователя по id
+из сессии. CachedModelBackend держит его в кеше USER_CACHE_TIMEOUT
+секунд; сохранение пользователя (в том числе смена пароля), удаление
+и выход из системы сбрасывают запись. Сброс виден другим процессам,
+только если кеш у них общий, поэтому по умолчанию кеш выключен.
+"""
+from django.conf import settings
+from django.contrib.auth import user_logged_out
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+PREFIX = 'user'
+
+
+def _key(user_id):
+    return f'{PREFIX}:{user_id}'
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend, который берёт пользователя сессии из кеша."""
+
+    def get_user(self, user_id):
+        timeout = settings.USER_CACHE_TIMEOUT
+        if not timeout:
+            return super().get_user(user_id)
+        user = cache.get(_key(user_id))
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(_key(user_id), user, timeout)
+        return user
+
+
+def forget_user(user_id):
+    cache.delete(_key(user_id))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_user(sender, instance, **kwargs):
+    # Хеш пароля в кеше должен совпадать с базой: по нему
+    # AuthenticationMiddleware проверяет сессию после смены пароля
+    forget_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def invalidate_logged_out(sender, request, user, **kwargs):
+    if user is not None:
+        forget_user(user.pk)
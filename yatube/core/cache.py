@@ -0,0 +1,119 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .replicas import read_primary_if_changed
+
+GENERATION_PREFIX = 'generation'
+CHANGED_PREFIX = 'changed'
+
+
+def _key(name):
+    return f'{GENERATION_PREFIX}:{name}'
+
+
+def _changed_key(name):
+    return f'{CHANGED_PREFIX}:{name}'
+
+
+def _latest_change(found, names):
+    changes = [found.get(_changed_key(name)) for name in names]
+    if None in changes:
+        return None
+    return max(changes, default=None)
+
+
+def _initial():
+    # После вытеснения ключа поколение не должно вернуться к уже
+    # использованному значению, поэтому стартуем от текущего времени
+    return int(time.time() * 1000)
+
+
+def generation(name):
+    """Текущее поколение данных name для ключей кеша."""
+    return generations(name)[0]
+
+
+def generations(*names):
+    """Поколения нескольких имён за одно обращение к кешу.
+
+    Данные, изменённые только что, запрос дальше читает из основной
+    базы: то, что он закеширует под этими поколениями, не должно быть
+    старой копией с реплики.
+    """
+    found = cache.get_many([*(_key(name) for name in names),
+                            *(_changed_key(name) for name in names)])
+    read_primary_if_changed(_latest_change(found, names))
+    values = []
+    for name in names:
+        value = found.get(_key(name))
+        if value is None:
+            cache.add(_key(name), _initial(), None)
+            # Когда данные менялись, неизвестно: считаем, что только что
+            cache.add(_changed_key(name), time.time(), None)
+            value = cache.get(_key(name))
+        values.append(value)
+    return values
+
+
+def changed_at(*names):
+    """Время последнего bump() по любому из имён или None.
+
+    None означает, что время неизвестно: ключ вытеснен или данные
+    не менялись с запуска кеша.
+    """
+    return _latest_change(
+        cache.get_many([_changed_key(name) for name in names]), names)
+
+
+def bump(*names):
+    """Сдвигает поколения: все закешированные по ним записи устаревают.
+
+    Внутри транзакции поколения сдвигаются ещё раз после коммита:
+    читатель мог увидеть новое поколение раньше новых строк и сохранить
+    под ним старые данные.
+    """
+    _bump(names)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(names))
+
+
+def _bump(names):
+    now = time.time()
+    for name in names:
+        try:
+            cache.incr(_key(name))
+        except ValueError:
+            cache.set(_key(name), _initial(), None)
+    cache.set_many({_changed_key(name): now for name in names}, None)
+
+
+def get_current(entries):
+    """Свежие записи кеша вместе с их поколениями за одно обращение.
+
+    entries — {ключ: имена поколений, от которых зависит запись}.
+    Запись, сохранённая set_current() при других поколениях, считается
+    устаревшей. Возвращает найденные значения и текущие поколения.
+    """
+    names = {name for deps in entries.values() for name in deps}
+    found = cache.get_many([*entries, *(_key(name) for name in names),
+                            *(_changed_key(name) for name in names)])
+    read_primary_if_changed(_latest_change(found, names))
+    versions = {name: found.get(_key(name)) for name in names}
+    missing = [name for name, value in versions.items() if value is None]
+    if missing:
+        versions.update(zip(missing, generations(*missing)))
+    values = {}
+    for key, deps in entries.items():
+        entry = found.get(key)
+        if entry is not None and entry[0] == [versions[name]
+                                              for name in deps]:
+            values[key] = entry[1]
+    return values, versions
+
+
+def set_current(entries, values, versions, timeout):
+    """Сохраняет values с поколениями, прочитанными get_current()."""
+    cache.set_many({key: ([versions[name] for name in entries[key]], value)
+                    for key, value in values.items()}, timeout)
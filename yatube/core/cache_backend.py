@@ -0,0 +1,194 @@
+"""Кеш в общем файле SQLite для всех процессов-воркеров одного хоста.
+
+В отличие от LocMemCache запись и сброс ключа в одном воркере сразу
+видны остальным, а внешний сервис вроде memcached не нужен.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+)
+# Как часто проверять, не пора ли вытеснять старые записи
+CULL_CHECK_EVERY = 100
+# Отметку последнего чтения для LRU обновляем не чаще раза в секунду
+TOUCH_INTERVAL = 1.0
+
+
+def _dump(value):
+    # Целые храним как INTEGER, чтобы incr был одним UPDATE в SQLite
+    if type(value) is int:
+        return value
+    return sqlite3.Binary(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+
+def _load(value):
+    if isinstance(value, int):
+        return value
+    return pickle.loads(value)
+
+
+class SQLiteCache(BaseCache):
+    """Кеш с TTL, вытеснением по LRU и атомарным incr.
+
+    LOCATION — путь к файлу базы. Файл работает в режиме WAL, поэтому
+    читатели не блокируют писателя.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self):
+        # У каждого потока и каждого процесса после fork своё соединение
+        if getattr(self._local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self._path, timeout=30,
+                                         isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    @contextmanager
+    def _transaction(self):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        now = time.time()
+        rows = self._connection().execute(
+            'SELECT key, value, accessed FROM cache '
+            'WHERE key IN (%s) AND (expires IS NULL OR expires > ?)'
+            % ', '.join('?' * len(keys)),
+            [*keys, now]).fetchall()
+        stale = [key for key, _, accessed in rows
+                 if accessed < now - TOUCH_INTERVAL]
+        if stale:
+            self._connection().execute(
+                'UPDATE cache SET accessed = ? WHERE key IN (%s)'
+                % ', '.join('?' * len(stale)), [now, *stale])
+        return {keys[key]: _load(value) for key, value, _ in rows}
+
+    def _write(self, key, value, timeout, only_new=False):
+        now = time.time()
+        expires = self.get_backend_timeout(timeout)
+        with self._transaction() as connection:
+            if only_new:
+                connection.execute(
+                    'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                    (key, now))
+            cursor = connection.execute(
+                'INSERT OR %s INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)' % ('IGNORE' if only_new else 'REPLACE'),
+                (key, _dump(value), expires, now))
+            written = cursor.rowcount == 1
+        self._writes += 1
+        if self._writes % CULL_CHECK_EVERY == 0:
+            self._cull()
+        return written
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write(self._key(key, version), value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._write(self._key(key, version), value, timeout,
+                           only_new=True)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        for key, value in data.items():
+            self.set(key, value, timeout, version=version)
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self._connection().execute(
+            'UPDATE cache SET expires = ? '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), self._key(key, version),
+             time.time()))
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE cache SET value = value + ? WHERE key = ? "
+                "AND typeof(value) = 'integer' "
+                "AND (expires IS NULL OR expires > ?)",
+                (delta, key, time.time()))
+            if cursor.rowcount != 1:
+                raise ValueError("Key '%s' not found" % key)
+            return connection.execute(
+                'SELECT value FROM cache WHERE key = ?', (key,)).fetchone()[0]
+
+    def has_key(self, key, version=None):
+        return self._connection().execute(
+            'SELECT 1 FROM cache '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self._key(key, version), time.time())).fetchone() is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            self._connection().execute(
+                'DELETE FROM cache WHERE key IN (%s)'
+                % ', '.join('?' * len(keys)), keys)
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def _cull(self):
+        """Удаляет просроченные записи, а при переполнении — самые старые."""
+        with self._transaction() as connection:
+            connection.execute('DELETE FROM cache WHERE expires <= ?',
+                               (time.time(),))
+            count = connection.execute(
+                'SELECT COUNT(*) FROM cache').fetchone()[0]
+            if count > self._max_entries:
+                connection.execute(
+                    'DELETE FROM cache WHERE key IN ('
+                    'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                    (max(count - self._max_entries,
+                         count // self._cull_frequency),))
+
+    def close(self, **kwargs):
+        # Соединение живёт столько же, сколько поток воркера
+        pass
@@ -0,0 +1,138 @@
+"""Очередь фоновых задач в основной базе.
+
+enqueue() записывает задачу в таблицу Job в той же транзакции, что и
+данные запроса: откат отменяет и задачу, а воркер увидит её только
+после коммита. Задача — функция модуля, которая вызывается с
+аргументами из JSON. Выполняет задачи команда runworker.
+
+Воркер занимает задачу на JOB_VISIBILITY_TIMEOUT секунд: если он упал,
+по истечении срока задачу возьмёт другой. Ошибка откладывает повтор
+на растущую паузу, после max_attempts попыток задача остаётся в
+таблице с текстом ошибки.
+"""
+import json
+import logging
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import OperationalError, transaction
+from django.db.models import F, Q, Subquery
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+from .sqlite import backoff, is_locked
+
+logger = logging.getLogger(__name__)
+
+# Письма ждут люди, рейтинги подождут
+PRIORITY_HIGH = 10
+PRIORITY_NORMAL = 0
+PRIORITY_LOW = -10
+
+
+def task_name(func):
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def enqueue(func, *, priority=PRIORITY_NORMAL, delay=0, key=None,
+            **kwargs):
+    """Ставит вызов func(**kwargs) в очередь.
+
+    Аргументы должны сериализоваться в JSON; даты приходят в задачу
+    строками ISO 8601. Пока задача с тем же key ждёт, вторая не ставится,
+    а ждущая выполнится не позже, чем выполнилась бы новая.
+    """
+    job = Job(task=task_name(func),
+              payload=json.dumps(kwargs, cls=DjangoJSONEncoder,
+                                 ensure_ascii=False),
+              priority=priority, key=key,
+              run_at=timezone.now() + timedelta(seconds=delay),
+              max_attempts=settings.JOB_MAX_ATTEMPTS)
+    Job.objects.bulk_create([job], ignore_conflicts=key is not None)
+    if key is not None:
+        # Иначе отложенный повтор задержал бы и новую работу
+        Job.objects.filter(key=key, run_at__gt=job.run_at).update(
+            run_at=job.run_at)
+
+
+@transaction.atomic
+def claim():
+    """Занимает самую важную из готовых задач или возвращает None.
+
+    UPDATE и чтение задачи — одна транзакция: если чтение не удалось,
+    задача не останется занятой до истечения срока.
+    """
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    free = Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+    ready = (Job.objects.filter(free, run_at__lte=now,
+                                attempts__lt=F('max_attempts'))
+             .order_by('-priority', 'run_at', 'pk').values('pk')[:1])
+    # Условие free проверяется ещё раз в самом UPDATE: из двух воркеров
+    # задача достанется одному. Ключ снимается, чтобы новая такая же
+    # задача могла встать в очередь, пока эта выполняется
+    claimed = Job.objects.filter(free, pk__in=Subquery(ready)).update(
+        locked_until=now + timedelta(
+            seconds=settings.JOB_VISIBILITY_TIMEOUT),
+        claimed_by=token, attempts=F('attempts') + 1, key=None)
+    if not claimed:
+        return None
+    return Job.objects.get(claimed_by=token)
+
+
+def _finish(action):
+    """Записывает итог задачи, пережидая блокировку базы.
+
+    Иначе выполненная задача осталась бы занятой и повторилась бы по
+    истечении JOB_VISIBILITY_TIMEOUT.
+    """
+    retries = settings.SQLITE_LOCK_RETRIES
+    for attempt in range(retries + 1):
+        try:
+            return action()
+        except OperationalError as error:
+            if attempt == retries or not is_locked(error):
+                raise
+        time.sleep(backoff(attempt, settings.SQLITE_LOCK_RETRY_DELAY))
+
+
+def run(job):
+    """Выполняет занятую задачу. Возвращает True при успехе."""
+    jobs = Job.objects.filter(pk=job.pk)
+    try:
+        func = import_string(job.task)
+        func(**json.loads(job.payload))
+    except Exception as error:
+        logger.exception('Задача %s %s не выполнена', job.pk, job.task)
+        message = f'{type(error).__name__}: {error}'
+        delay = backoff(job.attempts - 1, settings.JOB_RETRY_DELAY)
+        _finish(lambda: jobs.update(
+            error=message, locked_until=None,
+            run_at=timezone.now() + timedelta(seconds=delay)))
+        return False
+    _finish(jobs.delete)
+    return True
+
+
+def work_once():
+    """Выполняет одну готовую задачу. False — готовых задач нет."""
+    job = claim()
+    if job is None:
+        return False
+    run(job)
+    return True
+
+
+def run_pending():
+    """Выполняет в текущем потоке все готовые задачи.
+
+    Для тестов и разовых запусков: отложенные повторы не ждёт.
+    """
+    done = 0
+    while work_once():
+        done += 1
+    return done
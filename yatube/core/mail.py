@@ -0,0 +1,129 @@
+"""Очередь исходящей почты.
+
+QueuedEmailBackend не отправляет письма, а сохраняет их в таблицу
+OutgoingEmail одним INSERT на пачку, поэтому запрос (например, сброс
+пароля) не ждёт почтовый сервер. Вместе с письмами ставится задача
+flush очереди core.jobs, которую выполняет runworker; команда
+send_mail_queue делает то же самое отдельно от воркеров. Письма уходят
+пачками через одно соединение настоящего бэкенда EMAIL_DELIVERY_BACKEND.
+"""
+import json
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db.models import F, Q, Subquery
+from django.utils import timezone
+
+from .jobs import PRIORITY_HIGH, enqueue
+from .models import OutgoingEmail
+from .sqlite import backoff
+
+# После стольких неудачных попыток письмо больше не отправляется
+MAX_ATTEMPTS = 5
+FLUSH_KEY = 'core.mail.flush'
+
+
+def dump(message):
+    """Письмо в JSON для хранения в очереди."""
+    if message.attachments:
+        raise ValueError('Письма с вложениями в очередь не ставятся')
+    return json.dumps({
+        'subject': message.subject,
+        'body': message.body,
+        'from_email': message.from_email,
+        'to': message.to,
+        'cc': message.cc,
+        'bcc': message.bcc,
+        'reply_to': message.reply_to,
+        'headers': message.extra_headers,
+        'alternatives': getattr(message, 'alternatives', []),
+    }, ensure_ascii=False)
+
+
+def load(raw, connection=None):
+    """Письмо из JSON очереди."""
+    data = json.loads(raw)
+    alternatives = [tuple(item) for item in data.pop('alternatives')]
+    return EmailMultiAlternatives(connection=connection,
+                                  alternatives=alternatives, **data)
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """Ставит письма в очередь вместо отправки."""
+
+    def send_messages(self, email_messages):
+        emails = [OutgoingEmail(message=dump(message))
+                  for message in email_messages if message.recipients()]
+        OutgoingEmail.objects.bulk_create(emails, batch_size=500)
+        if emails:
+            # Одна задача на всю очередь: письма, поставленные до её
+            # запуска, уйдут той же пачкой
+            enqueue(flush, priority=PRIORITY_HIGH, key=FLUSH_KEY)
+        return len(emails)
+
+
+def claim(batch_size):
+    """Занимает пачку писем, чтобы их не отправил другой обработчик.
+
+    Письмо занято до locked_until: если обработчик упал, по истечении
+    EMAIL_LOCK_SECONDS письмо заберёт следующий.
+    """
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    free = Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+    ids = (OutgoingEmail.objects.filter(free, attempts__lt=MAX_ATTEMPTS)
+           .order_by('pk').values('pk')[:batch_size])
+    # Условие free проверяется ещё раз в самом UPDATE: из двух
+    # обработчиков письмо достанется одному
+    OutgoingEmail.objects.filter(free, pk__in=Subquery(ids)).update(
+        locked_until=now + timedelta(seconds=settings.EMAIL_LOCK_SECONDS),
+        claimed_by=token)
+    return list(OutgoingEmail.objects.filter(claimed_by=token)
+                .order_by('pk'))
+
+
+def send_batch(connection, batch_size=None):
+    """Отправляет пачку из очереди. Возвращает (отправлено, с ошибкой)."""
+    emails = claim(batch_size or settings.EMAIL_BATCH_SIZE)
+    sent, failed = [], []
+    for email in emails:
+        # По одному письму через общее соединение: так известно,
+        # какое именно не ушло
+        try:
+            connection.send_messages([load(email.message, connection)])
+        except Exception as error:
+            failed.append(email.pk)
+            OutgoingEmail.objects.filter(pk=email.pk).update(
+                attempts=F('attempts') + 1, error=str(error),
+                locked_until=timezone.now() + timedelta(
+                    seconds=backoff(email.attempts, 60)))
+        else:
+            sent.append(email.pk)
+    OutgoingEmail.objects.filter(pk__in=sent).delete()
+    return len(sent), len(failed)
+
+
+def delivery_connection():
+    """Соединение бэкенда, который действительно отправляет почту."""
+    return get_connection(settings.EMAIL_DELIVERY_BACKEND)
+
+
+def flush():
+    """Задача очереди: отправляет все готовые письма.
+
+    Если какие-то письма не ушли, задача ставится снова к моменту, когда
+    освободится первое из них.
+    """
+    with delivery_connection() as connection:
+        while any(send_batch(connection)):
+            pass
+    retry = (OutgoingEmail.objects.filter(attempts__lt=MAX_ATTEMPTS,
+                                          locked_until__isnull=False)
+             .order_by('locked_until')
+             .values_list('locked_until', flat=True).first())
+    if retry is not None:
+        delay = max((retry - timezone.now()).total_seconds(), 0)
+        enqueue(flush, priority=PRIORITY_HIGH, delay=delay, key=FLUSH_KEY)
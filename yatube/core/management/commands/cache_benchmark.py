@@ -0,0 +1,79 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache_backend import SQLiteCache
+
+PAYLOAD = 'x' * 2000
+
+
+def make_backends(directory):
+    params = {'OPTIONS': {'MAX_ENTRIES': 100000}}
+    return {
+        'locmem': lambda: LocMemCache('benchmark', params),
+        'filebased': lambda: FileBasedCache(
+            os.path.join(directory, 'filebased'), params),
+        'sqlite': lambda: SQLiteCache(
+            os.path.join(directory, 'cache.sqlite3'), params),
+    }
+
+
+def run_ops(cache, operations, keys):
+    """Прогоняет операции по кругу и возвращает затраченное время."""
+    timings = {}
+    names = [f'key-{i}' for i in range(keys)]
+    cache.set('counter', 0)
+    for operation in operations:
+        started = time.perf_counter()
+        for i in range(keys):
+            name = names[i]
+            if operation == 'set':
+                cache.set(name, PAYLOAD)
+            elif operation == 'get':
+                cache.get(name)
+            elif operation == 'get_many':
+                cache.get_many(names[i:i + 10])
+            elif operation == 'incr':
+                cache.incr('counter')
+        timings[operation] = time.perf_counter() - started
+    return timings
+
+
+def _worker(args):
+    directory, backend, operations, keys = args
+    return run_ops(make_backends(directory)[backend](), operations, keys)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает SQLiteCache с LocMemCache и FileBasedCache '
+            'в одном и нескольких процессах')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keys', type=int, default=2000)
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--backends', nargs='+',
+                            default=['locmem', 'filebased', 'sqlite'])
+
+    def handle(self, *args, keys, processes, backends, **options):
+        operations = ('set', 'get', 'get_many', 'incr')
+        with tempfile.TemporaryDirectory() as directory:
+            for backend in backends:
+                timings = _worker((directory, backend, operations, keys))
+                self.report(backend, 1, timings, keys)
+                with multiprocessing.Pool(processes) as pool:
+                    results = pool.map(
+                        _worker,
+                        [(directory, backend, operations, keys)] * processes)
+                wall = {op: max(result[op] for result in results)
+                        for op in operations}
+                self.report(backend, processes, wall, keys * processes)
+
+    def report(self, backend, processes, timings, total):
+        line = '  '.join(f'{op}: {total / seconds:>9.0f} оп/с'
+                         for op, seconds in timings.items())
+        self.stdout.write(f'{backend:<10} x{processes}  {line}')
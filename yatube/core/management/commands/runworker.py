@@ -0,0 +1,112 @@
+import multiprocessing
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import (OperationalError, connection, connections,
+                       reset_queries)
+
+from core.jobs import work_once
+from core.sqlite import backoff, is_locked
+
+
+def work(stop, once, interval):
+    """Цикл одного воркера. Возвращает число выполненных задач."""
+    done = 0
+    try:
+        while not stop.is_set():
+            try:
+                worked = work_once()
+            except OperationalError as error:
+                # База занята другим воркером: задача останется в очереди
+                # или вернётся в неё по истечении JOB_VISIBILITY_TIMEOUT
+                if not is_locked(error):
+                    raise
+                stop.wait(backoff(0, settings.SQLITE_LOCK_RETRY_DELAY))
+                continue
+            if worked:
+                done += 1
+            elif once:
+                break
+            else:
+                stop.wait(interval)
+            # При DEBUG журнал запросов иначе растёт без предела
+            reset_queries()
+    finally:
+        # Соединение с базой у каждого потока своё
+        connection.close()
+    return done
+
+
+def _process(stop, once, interval, results):
+    # Ctrl-C получает вся группа процессов: воркер останавливает родитель
+    # через stop, когда текущая задача доделана
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    done = 0
+    try:
+        done = work(stop, once, interval)
+    finally:
+        # Родитель ждёт ответа от каждого воркера, даже упавшего
+        results.put(done)
+
+
+class Command(BaseCommand):
+    help = 'Выполняет задачи из очереди core.jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Число воркеров')
+        parser.add_argument('--processes', action='store_true',
+                            help='Воркеры — процессы, а не потоки')
+        parser.add_argument('--once', action='store_true',
+                            help='Завершиться, когда готовых задач нет')
+        parser.add_argument('--interval', type=float, default=1,
+                            help='Пауза в секундах, когда очередь пуста')
+
+    def handle(self, *args, workers, processes, once, interval, **options):
+        if processes:
+            done = self.run_processes(workers, once, interval)
+        else:
+            done = self.run_threads(workers, once, interval)
+        self.stdout.write(f'Выполнено задач: {done}')
+
+    def run_threads(self, workers, once, interval):
+        stop = threading.Event()
+        results = []
+
+        def target():
+            results.append(work(stop, once, interval))
+
+        threads = [threading.Thread(target=target, name=f'worker-{i}')
+                   for i in range(workers)]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            # Текущие задачи доделываются, новые не берутся
+            stop.set()
+            for thread in threads:
+                thread.join()
+        return sum(results)
+
+    def run_processes(self, workers, once, interval):
+        # Открытые соединения не должны достаться дочерним процессам
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        stop, results = context.Event(), context.Queue()
+        children = [context.Process(target=_process,
+                                    args=(stop, once, interval, results))
+                    for _ in range(workers)]
+        for child in children:
+            child.start()
+        try:
+            done = sum(results.get() for _ in children)
+        except KeyboardInterrupt:
+            stop.set()
+            done = sum(results.get() for _ in children)
+        for child in children:
+            child.join()
+        return done
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import reset_queries
+
+from core.mail import delivery_connection, send_batch
+
+
+class Command(BaseCommand):
+    help = ('Отправляет письма из очереди пачками через одно соединение '
+            'с почтовым сервером')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Писем в пачке, по умолчанию '
+                                 'EMAIL_BATCH_SIZE')
+        parser.add_argument('--loop', action='store_true',
+                            help='Не завершаться, а ждать новые письма')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Пауза в секундах, когда очередь пуста')
+
+    def handle(self, *args, batch_size, loop, interval, **options):
+        total_sent = total_failed = 0
+        with delivery_connection() as connection:
+            while True:
+                sent, failed = send_batch(connection, batch_size)
+                total_sent += sent
+                total_failed += failed
+                # При DEBUG журнал запросов иначе растёт без предела
+                reset_queries()
+                if sent or failed:
+                    continue
+                if not loop:
+                    break
+                time.sleep(interval)
+        self.stdout.write(f'Отправлено: {total_sent}, '
+                          f'с ошибкой: {total_failed}')
@@ -0,0 +1,167 @@
+import math
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.sqlite import backoff, is_locked, pragma_statements
+
+USERS = 200
+POSTS = 1000
+SCHEMA = (
+    'CREATE TABLE post (id INTEGER PRIMARY KEY, author_id INTEGER, '
+    'pub_date REAL, text TEXT)',
+    'CREATE INDEX post_date ON post (pub_date)',
+    'CREATE TABLE comment (id INTEGER PRIMARY KEY, post_id INTEGER, '
+    'author_id INTEGER, pub_date REAL, text TEXT)',
+    'CREATE INDEX comment_post ON comment (post_id, pub_date)',
+    'CREATE TABLE follow (user_id INTEGER, author_id INTEGER, '
+    'UNIQUE (user_id, author_id))',
+    'CREATE TABLE stats (user_id INTEGER PRIMARY KEY, '
+    'followers INTEGER DEFAULT 0)',
+)
+
+
+def profiles():
+    """До: настройки SQLite по умолчанию, после: прагмы и повторы."""
+    return {
+        'default': ({}, 0),
+        'configured': (settings.SQLITE_PRAGMAS, settings.SQLITE_LOCK_RETRIES),
+    }
+
+
+def connect(path, pragmas):
+    # Транзакции открываются явным BEGIN, как это делает Django
+    database = sqlite3.connect(path, isolation_level=None)
+    for statement in pragma_statements(pragmas):
+        database.execute(statement)
+    return database
+
+
+def prepare(path, pragmas):
+    database = connect(path, pragmas)
+    for statement in SCHEMA:
+        database.execute(statement)
+    database.execute('BEGIN')
+    database.executemany('INSERT INTO post (author_id, pub_date, text) '
+                         'VALUES (?, ?, ?)',
+                         [(i % USERS + 1, i, 'Пост') for i in range(POSTS)])
+    database.executemany('INSERT INTO stats (user_id) VALUES (?)',
+                         [(i,) for i in range(1, USERS + 1)])
+    database.execute('COMMIT')
+    database.close()
+
+
+def read(database, rnd):
+    """Чтение как у главной и страницы поста."""
+    database.execute('SELECT * FROM post ORDER BY pub_date DESC '
+                     'LIMIT 10').fetchall()
+    database.execute('SELECT * FROM comment WHERE post_id = ? '
+                     'ORDER BY pub_date LIMIT 20',
+                     (rnd.randint(1, POSTS),)).fetchall()
+
+
+def write(database, rnd):
+    """Транзакция как у add_comment или profile_follow: чтение, затем
+    запись."""
+    database.execute('BEGIN')
+    try:
+        if rnd.random() < 0.5:
+            post = rnd.randint(1, POSTS)
+            database.execute('SELECT id FROM post WHERE id = ?',
+                             (post,)).fetchone()
+            database.execute('INSERT INTO comment (post_id, author_id, '
+                             'pub_date, text) VALUES (?, ?, ?, ?)',
+                             (post, rnd.randint(1, USERS), time.time(),
+                              'Комментарий'))
+        else:
+            user, author = rnd.sample(range(1, USERS + 1), 2)
+            database.execute('SELECT 1 FROM follow WHERE user_id = ? '
+                             'AND author_id = ?', (user, author)).fetchone()
+            database.execute('INSERT OR IGNORE INTO follow VALUES (?, ?)',
+                             (user, author))
+            database.execute('UPDATE stats SET followers = followers + 1 '
+                             'WHERE user_id = ?', (author,))
+        database.execute('COMMIT')
+    except sqlite3.OperationalError:
+        if database.in_transaction:
+            database.execute('ROLLBACK')
+        raise
+
+
+def _worker(args):
+    path, pragmas, retries, writes, reads, seed = args
+    rnd = random.Random(seed)
+    database = connect(path, pragmas)
+    latencies, errors, retried = [], 0, 0
+    for _ in range(writes):
+        for _ in range(reads):
+            read(database, rnd)
+        started = time.perf_counter()
+        for attempt in range(retries + 1):
+            try:
+                write(database, rnd)
+                break
+            except sqlite3.OperationalError as error:
+                if not is_locked(error):
+                    raise
+                if attempt == retries:
+                    errors += 1
+                    break
+                retried += 1
+                time.sleep(backoff(attempt,
+                                   settings.SQLITE_LOCK_RETRY_DELAY))
+        latencies.append(time.perf_counter() - started)
+    database.close()
+    return latencies, errors, retried
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность записи SQLite под '
+            'конкурентной нагрузкой с прагмами по умолчанию и из '
+            'SQLITE_PRAGMAS')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=8)
+        parser.add_argument('--writes', type=int, default=200,
+                            help='Пишущих транзакций на процесс')
+        parser.add_argument('--reads', type=int, default=4,
+                            help='Чтений перед каждой записью')
+        parser.add_argument('--profiles', nargs='+',
+                            choices=list(profiles()),
+                            default=list(profiles()))
+
+    def handle(self, *args, processes, writes, reads, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            for name in options['profiles']:
+                pragmas, retries = profiles()[name]
+                path = os.path.join(directory, f'{name}.sqlite3')
+                prepare(path, pragmas)
+                started = time.perf_counter()
+                with multiprocessing.Pool(processes) as pool:
+                    results = pool.map(
+                        _worker,
+                        [(path, pragmas, retries, writes, reads, seed)
+                         for seed in range(processes)])
+                wall = time.perf_counter() - started
+                self.report(name, results, wall, reads)
+
+    def report(self, name, results, wall, reads):
+        latencies = [value * 1000 for result in results
+                     for value in result[0]]
+        errors = sum(result[1] for result in results)
+        retried = sum(result[2] for result in results)
+        done = len(latencies) - errors
+        # Ближайший ранг: statistics.quantiles нет в Python 3.7
+        ordered = sorted(latencies)
+        p95 = ordered[max(math.ceil(len(ordered) * 0.95) - 1, 0)]
+        self.stdout.write(
+            f'{name:<11} записей {done / wall:>7.0f}/с  '
+            f'чтений {len(latencies) * reads / wall:>7.0f}/с  '
+            f'p95 записи {p95:>8.2f} мс  '
+            f'ошибок блокировки {errors:>4}  повторов {retried:>4}')
@@ -0,0 +1,30 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.replicas import PRIMARY
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в реплики: локальная замена '
+            'репликации для проверки чтения с реплик')
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не настроены: задайте '
+                               'YATUBE_REPLICA')
+        primary = connections[PRIMARY]
+        if primary.vendor != 'sqlite':
+            raise CommandError(f'Реплики {primary.vendor} обновляет '
+                               f'репликация самой базы')
+        primary.ensure_connection()
+        for alias in settings.DATABASE_REPLICAS:
+            target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+            try:
+                # Онлайн-копия: запись в основную базу не останавливается
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(f'{alias}: скопирована')
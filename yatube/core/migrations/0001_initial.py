@@ -0,0 +1,30 @@
+# Generated by Django 2.2.16 on 2026-10-18 08:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutgoingEmail',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message', models.TextField(verbose_name='Письмо в JSON')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Поставлено в очередь')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('locked_until', models.DateTimeField(blank=True, null=True, verbose_name='Занято до')),
+                ('claimed_by', models.CharField(blank=True, max_length=32, verbose_name='Обработчик')),
+                ('error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+            ],
+            options={
+                'verbose_name': 'Исходящее письмо',
+                'verbose_name_plural': 'Исходящие письма',
+            },
+        ),
+    ]
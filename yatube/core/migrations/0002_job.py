@@ -0,0 +1,38 @@
+# Generated by Django 2.2.16 on 2026-10-18 08:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task', models.CharField(max_length=200, verbose_name='Функция')),
+                ('payload', models.TextField(verbose_name='Аргументы в JSON')),
+                ('priority', models.SmallIntegerField(default=0, verbose_name='Приоритет')),
+                ('run_at', models.DateTimeField(verbose_name='Выполнить после')),
+                ('key', models.CharField(blank=True, max_length=200, null=True, unique=True, verbose_name='Ключ')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('max_attempts', models.PositiveSmallIntegerField(verbose_name='Предел попыток')),
+                ('locked_until', models.DateTimeField(blank=True, null=True, verbose_name='Занята до')),
+                ('claimed_by', models.CharField(blank=True, max_length=32, verbose_name='Обработчик')),
+                ('error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Поставлена в очередь')),
+            ],
+            options={
+                'verbose_name': 'Фоновая задача',
+                'verbose_name_plural': 'Фоновые задачи',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['-priority', 'run_at'], name='job_ready_idx'),
+        ),
+    ]
@@ -1,13 +1,143 @@
 from django.db import models
 
+# Строк в одном UPDATE при записи дат
+DATES_BATCH_SIZE = 500
+
 
 class CreatedModel(models.Model):
-    """Абстрактная модель. Добавляет дату создания."""
+    """Абстрактная модель. Добавляет даты создания и изменения."""
     pub_date = models.DateTimeField(
         'Дата создания',
         auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
 
     class Meta:
         # Это абстрактная модель:
         abstract = True
+
+
+def _content_key(model, value, field):
+    """Значения полей строки без id и дат: по ним ищется вставленное."""
+    return tuple(value(f) for f in model._meta.concrete_fields
+                 if not (f.primary_key or f.attname == field
+                         or getattr(f, 'auto_now', False)
+                         or getattr(f, 'auto_now_add', False)))
+
+
+def bulk_create_dated(model, objects, field='pub_date'):
+    """bulk_create, который сохраняет заданные объектам даты.
+
+    auto_now_add ставит при вставке текущее время, поэтому даты
+    пишутся следом через bulk_update. Объекты с уже занятым id
+    пропускаются. Если база не вернула id новых строк (SQLite),
+    они ищутся среди строк новее последней по значениям полей, а не
+    по порядку вставки: между строками импорта могут попасть чужие.
+    Чужая строка, во всём совпавшая с импортируемой, может получить
+    её дату; объекты, которые не нашлись, остаются без id.
+    Возвращает вставленные объекты с их id.
+    """
+    dates = [getattr(obj, field) for obj in objects]
+    last = (model.objects.order_by('-pk').values_list('pk', flat=True)
+            .first() or 0)
+    if all(obj.pk is None for obj in objects):
+        model.objects.bulk_create(objects)
+        missing = [obj for obj in objects if obj.pk is None]
+        if missing:
+            found = {}
+            new = (model.objects.filter(pk__gt=last).order_by('pk')
+                   .values(*[f.attname
+                             for f in model._meta.concrete_fields]))
+            for values in new:
+                key = _content_key(
+                    model, lambda f: values[f.attname], field)
+                found.setdefault(key, []).append(
+                    values[model._meta.pk.attname])
+            for obj in missing:
+                # Значение в том виде, в каком оно уходит в базу
+                pks = found.get(_content_key(
+                    model,
+                    lambda f: f.get_prep_value(getattr(obj, f.attname)),
+                    field))
+                if pks:
+                    obj.pk = pks.pop(0)
+            kept = [(obj, date) for obj, date in zip(objects, dates)
+                    if obj.pk is not None]
+            objects = [obj for obj, _ in kept]
+            dates = [date for _, date in kept]
+    else:
+        taken = set(model.objects.filter(pk__in=[obj.pk for obj in objects])
+                    .values_list('pk', flat=True))
+        kept = []
+        for obj, date in zip(objects, dates):
+            if obj.pk not in taken:
+                taken.add(obj.pk)
+                kept.append((obj, date))
+        objects = [obj for obj, _ in kept]
+        dates = [date for _, date in kept]
+        model.objects.bulk_create(objects)
+    dated = []
+    for obj, date in zip(objects, dates):
+        # Без заданной даты остаётся время вставки
+        if date is not None:
+            setattr(obj, field, date)
+            dated.append(obj)
+    model.objects.bulk_update(dated, [field], batch_size=DATES_BATCH_SIZE)
+    return objects
+
+
+class OutgoingEmail(models.Model):
+    """Письмо в очереди на отправку (см. core/mail.py).
+
+    Отправленные письма удаляются. Письмо, которое не удалось отправить
+    за MAX_ATTEMPTS попыток, остаётся в таблице с текстом ошибки.
+    """
+    message = models.TextField('Письмо в JSON')
+    created = models.DateTimeField('Поставлено в очередь', auto_now_add=True)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    locked_until = models.DateTimeField('Занято до', null=True, blank=True)
+    claimed_by = models.CharField('Обработчик', max_length=32, blank=True)
+    error = models.TextField('Последняя ошибка', blank=True)
+
+    class Meta:
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+
+    def __str__(self):
+        return f'Письмо {self.pk}'
+
+
+class Job(models.Model):
+    """Фоновая задача (см. core/jobs.py).
+
+    Выполненные задачи удаляются. Задача, не выполненная за
+    max_attempts попыток, остаётся в таблице с текстом ошибки.
+    """
+    task = models.CharField('Функция', max_length=200)
+    payload = models.TextField('Аргументы в JSON')
+    priority = models.SmallIntegerField('Приоритет', default=0)
+    run_at = models.DateTimeField('Выполнить после')
+    # Пока задача ждёт, повторная с тем же ключом не ставится
+    key = models.CharField('Ключ', max_length=200, null=True, blank=True,
+                           unique=True)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField('Предел попыток')
+    locked_until = models.DateTimeField('Занята до', null=True, blank=True)
+    claimed_by = models.CharField('Обработчик', max_length=32, blank=True)
+    error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Поставлена в очередь', auto_now_add=True)
+
+    class Meta:
+        # Порядок выборки: сначала важные, затем старые
+        indexes = [
+            models.Index(fields=['-priority', 'run_at'],
+                         name='job_ready_idx'),
+        ]
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+
+    def __str__(self):
+        return self.task
@@ -0,0 +1,90 @@
+"""Кеш целых страниц для анонимных посетителей.
+
+Вьюха объявляет, от поколений каких данных зависит страница
+(depends_on), а AnonymousPageCacheMiddleware сохраняет ответ вместе
+со значениями этих поколений. Запись отдаётся, пока ни одно из них не
+сдвинулось, — без сессий, ORM и шаблонов.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from .cache import generations
+
+PREFIX = 'page'
+# Ответ с этими куками уже не анонимный
+BYPASS_COOKIES = ('messages',)
+
+
+def depends_on(request, names, versions):
+    """Помечает страницу кешируемой и задаёт её зависимости.
+
+    versions — поколения names, прочитанные до отрисовки страницы.
+    """
+    request._page_dependencies = list(names), list(versions)
+
+
+def _key(request):
+    url = request.get_host() + request.get_full_path()
+    return f'{PREFIX}:{hashlib.md5(url.encode()).hexdigest()}'
+
+
+def _anonymous(request):
+    cookies = (settings.SESSION_COOKIE_NAME, *BYPASS_COOKIES)
+    return (request.method == 'GET'
+            and 'HTTP_AUTHORIZATION' not in request.META
+            and not any(name in request.COOKIES for name in cookies))
+
+
+def _cacheable(request, response):
+    cache_control = response.get('Cache-Control', '')
+    return (response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and not request.META.get('CSRF_COOKIE_USED')
+            and 'private' not in cache_control
+            and 'no-store' not in cache_control)
+
+
+class AnonymousPageCacheMiddleware:
+    """Отдаёт анонимным GET-запросам сохранённые страницы.
+
+    Стоит первой в MIDDLEWARE, чтобы попадание в кеш не проходило
+    остальные слои. Запросы с кукой сессии идут мимо кеша.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.PAGE_CACHE_TIMEOUT or not _anonymous(request):
+            return self.get_response(request)
+        key = _key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            names, versions, status, headers, content = entry
+            if generations(*names) == versions:
+                return self.hit(request, status, headers, content)
+        response = self.get_response(request)
+        dependencies = getattr(request, '_page_dependencies', None)
+        if dependencies and _cacheable(request, response):
+            names, versions = dependencies
+            cache.set(key, (names, versions, response.status_code,
+                            list(response.items()), response.content),
+                      settings.PAGE_CACHE_TIMEOUT)
+        return response
+
+    def hit(self, request, status, headers, content):
+        response = HttpResponse(content, status=status)
+        for header, value in headers:
+            response[header] = value
+        response['X-Page-Cache'] = 'hit'
+        return get_conditional_response(
+            request, etag=response.get('ETag'),
+            last_modified=parse_http_date_safe(
+                response.get('Last-Modified', '')),
+            response=response)
@@ -0,0 +1,126 @@
+"""Подсчёт SQL-запросов на запрос к сайту и поиск N+1.
+
+Представление объявляет свой бюджет декоратором query_budget, а
+QueryBudgetMiddleware проверяет его в режиме отладки и в тестах.
+"""
+import logging
+import re
+import sys
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+# Запрос одной формы, повторённый столько раз, считается N+1
+N_PLUS_ONE_THRESHOLD = 3
+# Служебные команды транзакций в формах запросов не учитываются
+SERVICE_STATEMENTS = ('BEGIN', 'SAVEPOINT', 'RELEASE SAVEPOINT',
+                      'ROLLBACK TO')
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'\((?:\s*(?:%s|\?)\s*,?)+\)')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Представление выполнило больше запросов, чем объявило."""
+
+
+def query_budget(limit):
+    """Объявляет, сколько SQL-запросов может выполнить представление."""
+    def decorator(view_func):
+        view_func.query_budget = limit
+        return view_func
+    return decorator
+
+
+def query_shape(sql):
+    """Текст запроса без значений: одинаков для всех строк цикла."""
+    return _IN_LISTS.sub('(...)', _LITERALS.sub('?', sql))
+
+
+def _template_line():
+    """Шаблон и строка, при отрисовке которой выполнен запрос."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        if frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            token = getattr(node, 'token', None)
+            origin = getattr(node, 'origin', None)
+            if token is not None and origin is not None:
+                return f'{origin.template_name}:{token.lineno}'
+        frame = frame.f_back
+    return None
+
+
+class QueryLog:
+    """Запросы, выполненные внутри count_queries()."""
+
+    def __init__(self):
+        self.count = 0
+        self.shapes = Counter()
+        self.places = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.lstrip().upper().startswith(SERVICE_STATEMENTS):
+            self.count += 1
+            shape = query_shape(sql)
+            self.shapes[shape] += 1
+            if shape not in self.places:
+                self.places[shape] = _template_line()
+        return execute(sql, params, many, context)
+
+    def repeated(self, threshold=N_PLUS_ONE_THRESHOLD):
+        """Формы запросов, похожие на N+1: [(форма, раз, место)]."""
+        return [(shape, times, self.places[shape])
+                for shape, times in self.shapes.most_common()
+                if times >= threshold]
+
+    def problems(self, budget=None):
+        """Описание нарушений для сообщения об ошибке."""
+        problems = []
+        if budget is not None and self.count > budget:
+            problems.append(f'{self.count} запросов при бюджете {budget}')
+        for shape, times, place in self.repeated():
+            problems.append(f'N+1: {times} раз из {place or "кода"}: {shape}')
+        return problems
+
+
+@contextmanager
+def count_queries():
+    """Считает запросы к базе по умолчанию внутри блока."""
+    log = QueryLog()
+    with connection.execute_wrapper(log):
+        yield log
+
+
+class QueryBudgetMiddleware:
+    """Проверяет бюджет запросов и ищет N+1 на каждом запросе.
+
+    Работает только при DEBUG или QUERY_BUDGET_STRICT. В строгом режиме
+    (его включают тесты) нарушение — исключение, иначе — предупреждение
+    в журнале.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        strict = getattr(settings, 'QUERY_BUDGET_STRICT', False)
+        if not (settings.DEBUG or strict):
+            return self.get_response(request)
+        with count_queries() as log:
+            response = self.get_response(request)
+        problems = log.problems(getattr(request, '_query_budget', None))
+        if problems:
+            message = '%s %s: %s' % (request.method, request.path,
+                                     '; '.join(problems))
+            if strict:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = getattr(view_func, 'query_budget', None)
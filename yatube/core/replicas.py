@@ -0,0 +1,99 @@
+"""Чтение с реплик базы и запись в основную.
+
+Представление, которому можно читать с реплики, помечается декоратором
+use_replica, остальные работают с основной базой. После записи сессия
+на REPLICA_PIN_SECONDS закрепляется за основной базой кукой: так автор
+сразу видит свой пост, даже если реплика ещё не догнала основную базу.
+Чтение данных, изменённых в последние REPLICA_LAG_SECONDS, тоже уходит
+в основную базу: иначе старые строки реплики закешируют под новым
+поколением (см. core.cache).
+"""
+import random
+import threading
+import time
+
+from django.conf import settings
+
+PRIMARY = 'default'
+PIN_COOKIE = 'primary_pin'
+
+_state = threading.local()
+
+
+def use_replica(view_func):
+    """Разрешает представлению читать с реплики."""
+    view_func.use_replica = True
+    return view_func
+
+
+def read_primary_if_changed(changed):
+    """Переводит чтение запроса на основную базу после свежей записи.
+
+    changed — время последнего изменения читаемых данных, None —
+    неизвестно.
+    """
+    if getattr(_state, 'replica', False) and (
+            changed is None
+            or time.time() - changed < settings.REPLICA_LAG_SECONDS):
+        _state.replica = False
+
+
+def _reset():
+    _state.replica = False
+    _state.wrote = False
+
+
+class ReplicaRouter:
+    """Чтение в помеченных представлениях — со случайной реплики.
+
+    Вне запросов (команды, фоновые потоки) и после первой записи в
+    запросе всё идёт в основную базу.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (replicas and getattr(_state, 'replica', False)
+                and not getattr(_state, 'wrote', False)):
+            return random.choice(replicas)
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема реплик приходит вместе с данными основной базы
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaMiddleware:
+    """Выбирает базу для запроса и закрепляет пишущую сессию.
+
+    Стоит перед SessionMiddleware, чтобы запись сессии тоже считалась.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _reset()
+        try:
+            response = self.get_response(request)
+            if _state.wrote:
+                response.set_cookie(PIN_COOKIE, '1',
+                                    max_age=settings.REPLICA_PIN_SECONDS,
+                                    httponly=True, samesite='Lax')
+        finally:
+            _reset()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _state.replica = (getattr(view_func, 'use_replica', False)
+                          and request.method in ('GET', 'HEAD')
+                          and PIN_COOKIE not in request.COOKIES)
@@ -0,0 +1,21 @@
+"""Сессии в кеше с записью в базу только при изменении данных.
+
+SessionStore читает сессию из кеша и обращается к базе лишь при
+промахе (см. django.contrib.sessions.backends.cached_db). Кеш должен
+быть общим для всех процессов сайта, иначе выход в одном процессе
+не завершит сессию в остальных.
+"""
+from django.contrib.sessions.backends import cached_db
+
+
+class SessionStore(cached_db.SessionStore):
+    """Сессия cached_db, не помечающая себя изменённой без причины.
+
+    SessionMiddleware сохраняет только изменённые сессии, но
+    присваивание того же значения тоже считается изменением.
+    """
+
+    def __setitem__(self, key, value):
+        if key in self._session and self._session[key] == value:
+            return
+        super().__setitem__(key, value)
@@ -0,0 +1,64 @@
+"""Настройка SQLite для одновременной записи из нескольких потоков.
+
+Каждое новое соединение получает прагмы из SQLITE_PRAGMAS: WAL позволяет
+читать во время записи, synchronous=NORMAL убирает fsync с каждого
+коммита, busy_timeout заставляет ждать чужую блокировку, а не падать.
+Блокировку, которую ожиданием не дождаться (транзакция начала с чтения
+и не может стать пишущей), переживает retry_on_lock: он повторяет
+представление целиком.
+"""
+import functools
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connection
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+LOCK_ERRORS = ('database is locked', 'database table is locked')
+
+
+def pragma_statements(pragmas):
+    return [f'PRAGMA {name} = {value}' for name, value in pragmas.items()]
+
+
+@receiver(connection_created)
+def apply_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    # Мимо курсора Django: прагмы не попадают в подсчёт запросов
+    for statement in pragma_statements(settings.SQLITE_PRAGMAS):
+        connection.connection.execute(statement)
+
+
+def is_locked(error):
+    return any(text in str(error) for text in LOCK_ERRORS)
+
+
+def backoff(attempt, delay):
+    """Пауза перед повтором: растёт вдвое, с разбросом против толпы."""
+    return delay * 2 ** attempt * random.uniform(0.5, 1.5)
+
+
+def retry_on_lock(view_func):
+    """Повторяет представление, если база занята другой записью.
+
+    Повторяется всё представление, поэтому его запись должна быть одной
+    транзакцией. Внутри внешней транзакции повтор невозможен.
+    """
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        retries = settings.SQLITE_LOCK_RETRIES
+        for attempt in range(retries + 1):
+            try:
+                return view_func(request, *args, **kwargs)
+            except OperationalError as error:
+                if (attempt == retries or connection.in_atomic_block
+                        or not is_locked(error)):
+                    raise
+            time.sleep(backoff(attempt, settings.SQLITE_LOCK_RETRY_DELAY))
+            # Форма прочитает загруженные файлы заново
+            for upload in request.FILES.values():
+                upload.seek(0)
+    return wrapper
@@ -0,0 +1,10 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class QueryBudgetRunner(DiscoverRunner):
+    """Запуск тестов, в котором бюджеты запросов проверяются строго."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.QUERY_BUDGET_STRICT = True
@@ -0,0 +1,64 @@
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.sessions import SessionStore
+from posts.models import User
+
+
+@override_settings(SESSION_ENGINE='core.sessions', USER_CACHE_TIMEOUT=60)
+class CachedSessionTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NoName',
+                                            password='old-password')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.url = reverse('posts:follow_index')
+
+    def auth_queries(self):
+        """Запросы к сессиям и пользователям при открытии страницы."""
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in context.captured_queries
+                if 'django_session' in query['sql']
+                or 'FROM "auth_user" WHERE' in query['sql']]
+
+    def test_session_and_user_from_cache(self):
+        """Повторный запрос не читает сессию и пользователя из базы"""
+        self.auth_queries()
+        self.assertEqual(self.auth_queries(), [])
+
+    def test_password_change_ends_session(self):
+        """После смены пароля закешированный пользователь не пускает"""
+        self.auth_queries()
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password('new-password')
+        user.save()
+        response = self.client.get(self.url)
+        self.assertRedirects(
+            response, reverse('users:login') + f'?next={self.url}')
+
+    def test_logout_forgets_user(self):
+        """Выход сбрасывает пользователя и сессию"""
+        self.auth_queries()
+        self.client.get(reverse('users:logout'))
+        self.assertIsNone(cache.get(f'user:{self.user.pk}'))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_unchanged_session_not_modified(self):
+        """Присваивание прежнего значения не вызывает записи сессии"""
+        session = SessionStore(self.client.session.session_key)
+        session[SESSION_KEY] = session[SESSION_KEY]
+        self.assertFalse(session.modified)
+        session['theme'] = 'dark'
+        self.assertTrue(session.modified)
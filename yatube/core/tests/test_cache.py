@@ -0,0 +1,32 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TransactionTestCase
+
+from core.cache import bump, generation
+
+
+class BumpTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_outside_transaction(self):
+        """Вне транзакции поколение сдвигается сразу и один раз"""
+        before = generation('feed')
+        bump('feed')
+        self.assertEqual(generation('feed'), before + 1)
+
+    def test_bump_again_after_commit(self):
+        """Поколение, прочитанное до коммита, устаревает после него"""
+        with transaction.atomic():
+            bump('feed')
+            # Так его увидел бы параллельный читатель старых строк
+            seen = generation('feed')
+        self.assertGreater(generation('feed'), seen)
+
+    def test_rollback(self):
+        """Откат не сдвигает поколение второй раз"""
+        with self.assertRaises(ValueError), transaction.atomic():
+            bump('feed')
+            seen = generation('feed')
+            raise ValueError
+        self.assertEqual(generation('feed'), seen)
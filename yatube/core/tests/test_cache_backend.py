@@ -0,0 +1,63 @@
+import os
+import tempfile
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from core import cache_backend
+from core.cache_backend import SQLiteCache
+
+
+class TestSQLiteCache(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.path, {})
+
+    def test_set_get_delete(self):
+        """Значения сохраняются, читаются и удаляются"""
+        self.cache.set('key', {'a': 1})
+        self.cache.set_many({'one': 1, 'two': 'два'})
+        self.assertEqual(self.cache.get('key'), {'a': 1})
+        self.assertEqual(self.cache.get_many(['one', 'two', 'nope']),
+                         {'one': 1, 'two': 'два'})
+        self.assertFalse(self.cache.add('one', 5))
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_shared_between_instances(self):
+        """Запись одного процесса видна другому"""
+        other = SQLiteCache(self.path, {})
+        self.cache.set('key', 'value')
+        self.assertEqual(other.get('key'), 'value')
+        other.delete('key')
+        self.assertFalse(self.cache.has_key('key'))
+
+    def test_timeout(self):
+        """Просроченный ключ не отдаётся и может быть добавлен заново"""
+        self.cache.set('key', 'value', timeout=1)
+        with mock.patch('time.time', return_value=time.time() + 2):
+            self.assertIsNone(self.cache.get('key'))
+            self.assertTrue(self.cache.add('key', 'new'))
+
+    def test_incr(self):
+        """incr атомарно меняет целое значение"""
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 5), 6)
+        self.assertEqual(self.cache.decr('counter'), 5)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_lru_cull(self):
+        """При переполнении вытесняются давно не читавшиеся ключи"""
+        cache = SQLiteCache(self.path, {'OPTIONS': {'MAX_ENTRIES': 3}})
+        with mock.patch.object(cache_backend, 'TOUCH_INTERVAL', 0):
+            for i in range(4):
+                cache.set(f'key{i}', i)
+            cache.get('key0')
+            cache._cull()
+        self.assertTrue(cache.has_key('key0'))
+        self.assertFalse(cache.has_key('key1'))
+        self.assertTrue(cache.has_key('key3'))
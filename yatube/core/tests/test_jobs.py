@@ -0,0 +1,123 @@
+import queue
+import signal
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core import jobs
+from core.management.commands import runworker
+from core.models import Job
+
+calls = []
+
+
+def record(value):
+    calls.append(value)
+
+
+def fail():
+    raise ValueError('Сбой')
+
+
+@override_settings(JOB_MAX_ATTEMPTS=3, JOB_RETRY_DELAY=10)
+class JobsTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_priority_order(self):
+        """Важные задачи выполняются раньше, равные — по очереди"""
+        jobs.enqueue(record, value='low', priority=jobs.PRIORITY_LOW)
+        jobs.enqueue(record, value='first')
+        jobs.enqueue(record, value='high', priority=jobs.PRIORITY_HIGH)
+        jobs.enqueue(record, value='second')
+        self.assertEqual(jobs.run_pending(), 4)
+        self.assertEqual(calls, ['high', 'first', 'second', 'low'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_delay(self):
+        """Отложенная задача не берётся раньше срока"""
+        jobs.enqueue(record, value='later', delay=60)
+        self.assertEqual(jobs.run_pending(), 0)
+        Job.objects.update(run_at=timezone.now())
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertEqual(calls, ['later'])
+
+    def test_retry_with_backoff(self):
+        """Ошибка откладывает повтор, после max_attempts задача остаётся"""
+        jobs.enqueue(fail)
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.assertEqual(jobs.run_pending(), 1)
+        job = Job.objects.get()
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.error, 'ValueError: Сбой')
+        self.assertIsNone(job.locked_until)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=4))
+        for attempt in (2, 3):
+            Job.objects.update(run_at=timezone.now())
+            with self.assertLogs('core.jobs', 'ERROR'):
+                self.assertEqual(jobs.run_pending(), 1)
+        Job.objects.update(run_at=timezone.now())
+        # Попытки исчерпаны: задача ждёт разбора, но не выполняется
+        self.assertEqual(jobs.run_pending(), 0)
+        self.assertEqual(Job.objects.get().attempts, 3)
+
+    def test_visibility_timeout(self):
+        """Задачу упавшего воркера берёт другой по истечении срока"""
+        jobs.enqueue(record, value='lost')
+        job = jobs.claim()
+        self.assertIsNotNone(job)
+        self.assertIsNone(jobs.claim())
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertEqual(calls, ['lost'])
+
+    def test_key_deduplicates(self):
+        """Пока задача с ключом ждёт, вторая такая же не ставится"""
+        jobs.enqueue(record, value='once', key='record')
+        jobs.enqueue(record, value='twice', key='record')
+        self.assertEqual(Job.objects.count(), 1)
+        job = jobs.claim()
+        # Выполняющаяся задача не мешает поставить следующую
+        jobs.enqueue(record, value='next', key='record')
+        jobs.run(job)
+        jobs.run_pending()
+        self.assertEqual(calls, ['once', 'next'])
+
+    def test_key_brings_delayed_job_forward(self):
+        """Новая задача с ключом ускоряет ждущую отложенную"""
+        jobs.enqueue(record, value='retry', key='record', delay=60)
+        jobs.enqueue(record, value='now', key='record')
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertEqual(calls, ['retry'])
+
+
+class RunWorkerTest(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_threads(self):
+        """runworker --once выполняет очередь несколькими потоками"""
+        for i in range(10):
+            jobs.enqueue(record, value=i)
+        out = StringIO()
+        call_command('runworker', workers=3, once=True, stdout=out)
+        self.assertEqual(sorted(calls), list(range(10)))
+        self.assertFalse(Job.objects.exists())
+        self.assertIn('Выполнено задач: 10', out.getvalue())
+
+    def test_process_ignores_interrupt_and_reports(self):
+        """Процесс-воркер не прерывается Ctrl-C и отвечает даже при сбое"""
+        self.addCleanup(signal.signal, signal.SIGINT,
+                        signal.getsignal(signal.SIGINT))
+        results = queue.Queue()
+        with mock.patch.object(runworker, 'work',
+                               side_effect=RuntimeError('сбой')):
+            with self.assertRaises(RuntimeError):
+                runworker._process(threading.Event(), True, 0, results)
+        self.assertEqual(signal.getsignal(signal.SIGINT), signal.SIG_IGN)
+        self.assertEqual(results.get_nowait(), 0)
@@ -0,0 +1,105 @@
+from io import StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.jobs import run_pending
+from core.mail import (FLUSH_KEY, MAX_ATTEMPTS, claim, delivery_connection,
+                       send_batch)
+from core.models import Job, OutgoingEmail
+from posts.models import User
+
+
+@override_settings(
+    EMAIL_BACKEND='core.mail.QueuedEmailBackend',
+    EMAIL_DELIVERY_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class MailQueueTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NoName',
+                                            email='noname@example.com',
+                                            password='password')
+
+    def test_password_reset_queued(self):
+        """Сброс пароля ставит письмо в очередь, а не отправляет его"""
+        self.client.post(reverse('users:password_reset_form'),
+                         {'email': self.user.email})
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(OutgoingEmail.objects.count(), 1)
+        call_command('send_mail_queue', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.user.email])
+        self.assertFalse(OutgoingEmail.objects.exists())
+
+    def test_flush_job(self):
+        """Письма отправляет одна задача очереди, неудачные — повторная"""
+        for i in range(3):
+            mail.send_mail(f'Письмо {i}', 'Текст', None, ['a@example.com'])
+        self.assertEqual(Job.objects.get().key, FLUSH_KEY)
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.'
+                        'send_messages', side_effect=OSError('Нет связи')):
+            self.assertEqual(run_pending(), 1)
+        # Задача встала снова к сроку повтора писем
+        job = Job.objects.get()
+        self.assertGreater(job.run_at, timezone.now())
+        Job.objects.update(run_at=timezone.now())
+        OutgoingEmail.objects.update(locked_until=timezone.now())
+        run_pending()
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(OutgoingEmail.objects.exists())
+        self.assertFalse(Job.objects.exists())
+
+    def test_new_email_not_held_by_retry(self):
+        """Отложенный повтор не задерживает новые письма"""
+        mail.send_mail('Первое', 'Текст', None, ['a@example.com'])
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.'
+                        'send_messages', side_effect=OSError('Нет связи')):
+            run_pending()
+        mail.send_mail('Второе', 'Текст', None, ['a@example.com'])
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual([message.subject for message in mail.outbox],
+                         ['Второе'])
+        # Первое письмо ждёт своего повтора
+        self.assertGreater(Job.objects.get().run_at, timezone.now())
+
+    def test_batches_over_one_connection(self):
+        """Пачки писем уходят через одно открытое соединение"""
+        messages = [mail.EmailMultiAlternatives(f'Письмо {i}', 'Текст',
+                                                to=['a@example.com'])
+                    for i in range(5)]
+        messages[0].attach_alternative('<p>Текст</p>', 'text/html')
+        mail.get_connection().send_messages(messages)
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.open',
+                        autospec=True) as open_connection:
+            call_command('send_mail_queue', batch_size=2, stdout=StringIO())
+        open_connection.assert_called_once()
+        self.assertEqual([message.subject for message in mail.outbox],
+                         [f'Письмо {i}' for i in range(5)])
+        self.assertEqual(mail.outbox[0].alternatives,
+                         [('<p>Текст</p>', 'text/html')])
+
+    def test_failed_email_retried_later(self):
+        """Неотправленное письмо остаётся в очереди с ошибкой"""
+        mail.send_mail('Тема', 'Текст', None, ['a@example.com'])
+        with delivery_connection() as connection:
+            with mock.patch.object(connection, 'send_messages',
+                                   side_effect=OSError('нет связи')):
+                self.assertEqual(send_batch(connection), (0, 1))
+            # Повтор — после паузы, а не сразу
+            self.assertEqual(send_batch(connection), (0, 0))
+        email = OutgoingEmail.objects.get()
+        self.assertEqual((email.attempts, email.error), (1, 'нет связи'))
+        OutgoingEmail.objects.update(locked_until=None,
+                                     attempts=MAX_ATTEMPTS)
+        self.assertEqual(claim(10), [])
+
+    def test_claim_is_exclusive(self):
+        """Занятые письма не достаются второму обработчику"""
+        mail.send_mail('Тема', 'Текст', None, ['a@example.com'])
+        self.assertEqual(len(claim(10)), 1)
+        self.assertEqual(claim(10), [])
@@ -0,0 +1,112 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='NoName')
+        cls.group = Group.objects.create(title='Группа', slug='cached',
+                                         description='Описание')
+        cls.post = Post.objects.create(author=cls.user, group=cls.group,
+                                       text='Пост')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_hit_without_queries(self):
+        """Повторный анонимный запрос отдаётся из кеша без базы"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.user.username,)),
+            reverse('posts:post_detail', args=(self.post.id,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.client.get(url)
+                self.assertEqual(second['X-Page-Cache'], 'hit')
+                self.assertEqual(second.content, first.content)
+
+    def test_change_invalidates(self):
+        """Новый пост сбрасывает закешированную страницу"""
+        url = reverse('posts:group_list', args=(self.group.slug,))
+        self.client.get(url)
+        Post.objects.create(author=self.user, group=self.group,
+                            text='Свежий пост')
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('X-Page-Cache'))
+        self.assertContains(response, 'Свежий пост')
+
+    def test_author_and_group_edits_invalidate(self):
+        """Правка автора или группы сбрасывает страницы с их постами"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', args=(self.user.username,)),
+            reverse('posts:post_detail', args=(self.post.id,)),
+        )
+        for url in urls:
+            self.client.get(url)
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'Лев'
+        user.last_name = 'Толстой'
+        user.save()
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'moved'
+        group.save()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertFalse(response.has_header('X-Page-Cache'))
+                self.assertContains(response, 'Лев Толстой')
+                self.assertContains(
+                    response, reverse('posts:group_list', args=('moved',)))
+
+    def test_query_string_is_part_of_key(self):
+        """Разные страницы пагинатора кешируются отдельно"""
+        url = reverse('posts:index')
+        self.client.get(url)
+        self.assertFalse(self.client.get(url + '?page=2')
+                         .has_header('X-Page-Cache'))
+
+    def test_session_cookie_bypasses(self):
+        """Запрос с кукой сессии идёт мимо кеша"""
+        url = reverse('posts:index')
+        self.client.get(url)
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(url)
+        self.assertFalse(response.has_header('X-Page-Cache'))
+        self.assertContains(response, self.user.username)
+
+    @override_settings(PAGE_CACHE_TIMEOUT=0)
+    def test_disabled(self):
+        """Нулевой срок выключает кеш страниц"""
+        url = reverse('posts:index')
+        self.client.get(url)
+        self.assertFalse(self.client.get(url).has_header('X-Page-Cache'))
+
+
+class PageCacheCommitTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='NoName')
+
+    def test_page_cached_before_commit_is_dropped(self):
+        """Страница, сохранённая до коммита записи, после него не отдаётся"""
+        url = reverse('posts:index')
+        with transaction.atomic():
+            Post.objects.create(author=self.user, text='Пост')
+            # Так страницу сохранил бы параллельный запрос, прочитавший
+            # новое поколение, но ещё старые строки
+            self.client.get(url)
+            self.assertEqual(self.client.get(url)['X-Page-Cache'], 'hit')
+        self.assertFalse(self.client.get(url).has_header('X-Page-Cache'))
@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from ..queries import (QueryBudgetExceeded, QueryBudgetMiddleware,
+                       query_budget, query_shape)
+
+User = get_user_model()
+
+
+@query_budget(1)
+def one_query_view(request):
+    list(User.objects.all())
+    return HttpResponse()
+
+
+def n_plus_one_view(request):
+    for pk in range(1, 5):
+        User.objects.filter(pk=pk).exists()
+    return HttpResponse()
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetMiddlewareTest(TestCase):
+    def call(self, view):
+        request = RequestFactory().get('/')
+        middleware = QueryBudgetMiddleware(lambda request: (
+            middleware.process_view(request, view, (), {}) or view(request)))
+        return middleware(request)
+
+    def test_within_budget(self):
+        """Представление в пределах бюджета отвечает как обычно"""
+        self.assertEqual(self.call(one_query_view).status_code, 200)
+
+    def test_budget_exceeded(self):
+        """Лишние запросы сверх объявленного бюджета — ошибка"""
+        view = query_budget(0)(lambda request: one_query_view(request))
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'бюджете 0'):
+            self.call(view)
+
+    def test_n_plus_one_detected(self):
+        """Повторяющиеся запросы одной формы распознаются как N+1"""
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'N+1: 4 раз'):
+            self.call(n_plus_one_view)
+
+    def test_query_shape(self):
+        """Форма запроса не зависит от значений"""
+        self.assertEqual(
+            query_shape("SELECT 1 FROM t WHERE id = 12 AND s = 'a''b'"),
+            query_shape("SELECT 1 FROM t WHERE id = 7 AND s = 'c'"))
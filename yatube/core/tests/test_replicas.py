@@ -0,0 +1,110 @@
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import resolve, reverse
+
+from core.cache import bump, generations
+from posts.models import Post, User
+from ..replicas import (PIN_COOKIE, ReplicaMiddleware, ReplicaRouter,
+                        use_replica)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTest(TestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def call(self, view, request, write=False, names=()):
+        """Прогоняет view через middleware и запоминает базы чтения.
+
+        names — поколения кеша, которые вьюха читает до запросов.
+        """
+        used = []
+
+        def wrapped(request):
+            if names:
+                generations(*names)
+            used.append(self.router.db_for_read(Post))
+            if write:
+                self.router.db_for_write(Post)
+                used.append(self.router.db_for_read(Post))
+            return HttpResponse()
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return wrapped(request)
+
+        middleware = ReplicaMiddleware(get_response)
+        return middleware(request), used
+
+    def test_marked_view_reads_replica(self):
+        """Помеченная вьюха читает с реплики до первой записи"""
+        response, used = self.call(use_replica(lambda request: None),
+                                   self.factory.get('/'), write=True)
+        self.assertEqual(used, ['replica', 'default'])
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_primary_cases(self):
+        """Без пометки, для POST и после записи читаем основную базу"""
+        marked = use_replica(lambda request: None)
+        pinned = self.factory.get('/')
+        pinned.COOKIES[PIN_COOKIE] = '1'
+        cases = (
+            ('без пометки', lambda request: None, self.factory.get('/')),
+            ('POST', marked, self.factory.post('/')),
+            ('закреплённая сессия', marked, pinned),
+        )
+        for name, view, request in cases:
+            with self.subTest(name):
+                response, used = self.call(view, request)
+                self.assertEqual(used, ['default'])
+                self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_recent_change_reads_primary(self):
+        """Недавно изменённые данные читаются с основной базы"""
+        cache.clear()
+        marked = use_replica(lambda request: None)
+        bump('feed')
+        cases = (
+            ('давно', 'feed', 0, 'replica'),
+            ('только что', 'feed', 60, 'default'),
+            ('неизвестно когда', 'other', 0, 'default'),
+        )
+        for name, feed, lag, database in cases:
+            with self.subTest(name), \
+                    override_settings(REPLICA_LAG_SECONDS=lag):
+                response, used = self.call(marked, self.factory.get('/'),
+                                           names=(feed,))
+                self.assertEqual(used, [database])
+
+    def test_outside_requests(self):
+        """Команды и фоновые потоки работают с основной базой"""
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+        self.assertFalse(self.router.allow_migrate('replica', 'posts'))
+
+    def test_views_marked(self):
+        """Страницы чтения помечены, страницы записи — нет"""
+        user = User.objects.create(username='NoName')
+        post = Post.objects.create(author=user, text='Пост')
+        readers = (reverse('posts:index'),
+                   reverse('posts:profile', args=(user.username,)),
+                   reverse('posts:post_detail', args=(post.pk,)),
+                   reverse('posts:follow_index'),
+                   reverse('about:author'))
+        writers = (reverse('posts:post_create'),
+                   reverse('posts:add_comment', args=(post.pk,)),
+                   reverse('posts:profile_follow', args=(user.username,)),
+                   reverse('users:signup'))
+        for url in readers:
+            self.assertTrue(getattr(resolve(url).func, 'use_replica', False),
+                            url)
+        for url in writers:
+            self.assertFalse(getattr(resolve(url).func, 'use_replica', False),
+                             url)
+        client = Client()
+        client.force_login(user)
+        response = client.post(reverse('posts:post_create'),
+                               {'text': 'Новый пост'})
+        self.assertIn(PIN_COOKIE, response.cookies)
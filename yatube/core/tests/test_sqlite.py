@@ -0,0 +1,62 @@
+import io
+
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test import override_settings
+
+from ..sqlite import retry_on_lock
+
+
+class PragmaTest(TestCase):
+    def test_pragmas_applied(self):
+        """Новое соединение получает прагмы из настроек"""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA temp_store')
+            # 2 — временные таблицы в памяти
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+
+@override_settings(SQLITE_LOCK_RETRIES=2, SQLITE_LOCK_RETRY_DELAY=0)
+class RetryOnLockTest(SimpleTestCase):
+    def view(self, *errors):
+        """Представление, которое сначала падает с errors."""
+        calls = []
+        errors = list(errors)
+
+        @retry_on_lock
+        def view(request):
+            calls.append(request)
+            if errors:
+                raise errors.pop(0)
+            return 'ok'
+        return view, calls
+
+    def test_retries_lock(self):
+        """Занятая база — повод повторить представление"""
+        view, calls = self.view(OperationalError('database is locked'),
+                                OperationalError('database is locked'))
+        self.assertEqual(view(RequestFactory().post('/')), 'ok')
+        self.assertEqual(len(calls), 3)
+
+    def test_gives_up(self):
+        """Повторы ограничены, другие ошибки не повторяются"""
+        view, calls = self.view(*[OperationalError('database is locked')]
+                                * 3)
+        with self.assertRaises(OperationalError):
+            view(RequestFactory().post('/'))
+        self.assertEqual(len(calls), 3)
+        view, calls = self.view(OperationalError('no such table: x'))
+        with self.assertRaises(OperationalError):
+            view(RequestFactory().post('/'))
+        self.assertEqual(len(calls), 1)
+
+    def test_benchmark(self):
+        """Замер печатает строку на каждый профиль"""
+        out = io.StringIO()
+        call_command('sqlite_benchmark', processes=2, writes=5, reads=1,
+                     stdout=out)
+        self.assertIn('default', out.getvalue())
+        self.assertIn('configured', out.getvalue())
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Post, Group, Comment
+from .search import matching_ids
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -8,6 +9,23 @@ class PostAdmin(admin.ModelAdmin):
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
+    list_select_related = ('author', 'group')
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        field = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name == 'group':
+            # list_editable строит форму на каждую строку списка:
+            # варианты групп выбираем из базы один раз на запрос
+            if not hasattr(request, '_group_choices'):
+                request._group_choices = list(field.choices)
+            field.choices = request._group_choices
+        return field
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по индексу вместо LIKE '%term%' по всей таблице
+        if not search_term:
+            return queryset, False
+        return queryset.filter(pk__in=matching_ids(search_term)), False
 
 
 admin.site.register(Post, PostAdmin)
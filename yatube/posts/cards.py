@@ -0,0 +1,61 @@
+"""Кеш отрисованных карточек постов в лентах.
+
+Карточка зависит от самого поста (его updated_at входит в ключ), от
+автора и от группы (их поколения хранятся вместе с записью). Страница
+ленты достаёт все свои карточки одним get_many и отрисовывает только
+недостающие.
+"""
+from django.conf import settings
+from django.template.loader import render_to_string
+
+from core.cache import get_current, set_current
+from .thumbnails import cached_thumbnail, prefetch
+from .utils import author_name, group_name
+
+TEMPLATE = 'posts/includes/post_card.html'
+PREFIX = 'card'
+
+
+def card_key(post):
+    return f'{PREFIX}:{post.pk}:{post.updated_at.timestamp()}'
+
+
+def card_names(post):
+    """Имена поколений, от которых зависит карточка поста."""
+    names = [author_name(post.author_id)]
+    if post.group_id:
+        names.append(group_name(post.group_id))
+    return names
+
+
+def render_cards(posts):
+    """HTML карточек постов в порядке posts."""
+    posts = list(posts)
+    timeout = settings.POST_CARD_CACHE_TIMEOUT
+    if not timeout:
+        prefetch(posts)
+        return [render_card(post)[0] for post in posts]
+    entries = {card_key(post): card_names(post) for post in posts}
+    cards, versions = get_current(entries)
+    missing = [post for post in posts if card_key(post) not in cards]
+    prefetch(missing)
+    rendered = {}
+    for post in missing:
+        html, complete = render_card(post)
+        if complete:
+            rendered[card_key(post)] = html
+        cards[card_key(post)] = html
+    set_current(entries, rendered, versions, timeout)
+    return [cards[card_key(post)] for post in posts]
+
+
+def render_card(post):
+    """HTML карточки и признак того, что её можно кешировать.
+
+    Заглушку вместо миниатюры не кешируем: миниатюра готовится в фоне
+    и не меняет updated_at поста.
+    """
+    thumbnail = cached_thumbnail(post.image)
+    html = render_to_string(TEMPLATE, {'post': post,
+                                       'thumbnail': thumbnail})
+    return html, thumbnail is not None or not post.image
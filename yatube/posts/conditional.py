@@ -0,0 +1,113 @@
+"""Валидаторы условных GET-запросов для лент и страницы поста.
+
+ETag и Last-Modified собираются из поколений кеша (см. core.cache):
+они меняются при любом изменении показанных на странице данных и
+читаются без запросов к базе. Поэтому на повторный запрос 304
+отдаётся до запроса постов и отрисовки шаблона. Те же поколения
+служат зависимостями кеша страниц для анонимов (core.page_cache).
+"""
+import hashlib
+from datetime import datetime, timezone
+
+from django.contrib.auth import get_user_model
+from django.views.decorators.http import condition
+
+from core.cache import changed_at, generations
+from core.page_cache import depends_on
+from .models import Group, Post
+from .utils import (author_name, feed_name, follows_name, group_name,
+                    groups_name, popular_name, post_name)
+
+User = get_user_model()
+
+
+# Имя и группа в карточках лент меняются вместе с поколениями самих
+# лент: правка автора или группы сдвигает ленты с их постами
+def _index_names(request):
+    return [feed_name()]
+
+
+def _popular_names(request):
+    return [popular_name()]
+
+
+def _directory_names(request):
+    return [groups_name()]
+
+
+def _group_names(request, slug):
+    pk = Group.objects.filter(slug=slug).values_list('pk', flat=True).first()
+    return pk and [feed_name(group=pk)]
+
+
+def _profile_names(request, username):
+    pk = (User.objects.filter(username=username)
+          .values_list('pk', flat=True).first())
+    return pk and [feed_name(author=pk), follows_name(pk), author_name(pk)]
+
+
+def _post_names(request, post_id):
+    found = (Post.objects.filter(pk=post_id)
+             .values_list('author', 'group').first())
+    if not found:
+        return None
+    author, group = found
+    # Число постов автора на странице меняется вместе с его лентой
+    names = [post_name(post_id), feed_name(author=author),
+             author_name(author)]
+    if group:
+        # Название группы показано на странице поста
+        names.append(group_name(group))
+    return names
+
+
+def _validators(names_func, forms=False):
+    """Пара функций etag/last_modified для декоратора condition.
+
+    forms — страница показывает пользователю формы с CSRF-токеном.
+    """
+    def compute(request, *args, **kwargs):
+        # condition вызывает обе функции: считаем один раз на запрос
+        if not hasattr(request, '_validators'):
+            names = names_func(request, *args, **kwargs)
+            csrf = (forms and request.user.is_authenticated
+                    and request.META.get('CSRF_COOKIE'))
+            # Объекта нет — вьюха сама ответит 404. Без CSRF-куки ответ
+            # задаст новую, и токен форм не совпадёт ни с одним ETag
+            if not names or (forms and request.user.is_authenticated
+                             and not csrf):
+                request._validators = None, None
+            else:
+                versions = generations(*names)
+                # Те же зависимости сбрасывают кеш страниц для анонимов
+                depends_on(request, names, versions)
+                # Шапка и кнопки зависят от того, кто смотрит, а токен
+                # форм — от CSRF-куки, которую вход в систему меняет
+                state = '|'.join(map(str, [
+                    *versions, request.user.pk, csrf,
+                    request.GET.urlencode()]))
+                # Без ETag смену пользователя видно только по нему,
+                # поэтому дату изменения отдаём лишь анонимам
+                modified = (not request.user.is_authenticated
+                            and changed_at(*names))
+                request._validators = (
+                    hashlib.md5(state.encode()).hexdigest(),
+                    modified and datetime.fromtimestamp(modified,
+                                                        timezone.utc))
+        return request._validators
+
+    return (lambda *args, **kwargs: compute(*args, **kwargs)[0],
+            lambda *args, **kwargs: compute(*args, **kwargs)[1])
+
+
+def _conditional(names_func, forms=False):
+    etag, last_modified = _validators(names_func, forms)
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+index_condition = _conditional(_index_names)
+popular_condition = _conditional(_popular_names)
+directory_condition = _conditional(_directory_names)
+group_condition = _conditional(_group_names)
+profile_condition = _conditional(_profile_names)
+post_condition = _conditional(_post_names, forms=True)
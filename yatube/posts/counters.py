@@ -0,0 +1,112 @@
+from django.db.models import (Count, DateTimeField, F, OuterRef, Subquery,
+                              Value)
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import AuthorStats, Follow, Group, Post
+
+
+def _shift(queryset, delta, field):
+    if delta < 0:
+        # Рассинхронизированный счётчик не уводим ниже нуля,
+        # его поправит команда recount_stats
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def _last_post_date():
+    """Подзапрос с датой последнего поста группы: один шаг по индексу."""
+    return Subquery(Post.objects.filter(group=OuterRef('pk'))
+                    .order_by('-pub_date').values('pub_date')[:1])
+
+
+def _group_post_added(group_id, pub_date):
+    date = Value(pub_date, output_field=DateTimeField())
+    Group.objects.filter(pk=group_id).update(
+        posts_count=F('posts_count') + 1,
+        last_post_date=Greatest(Coalesce('last_post_date', date), date))
+
+
+def _group_post_removed(group_id):
+    # Пост уже удалён или перенесён: дату берём у оставшихся постов
+    Group.objects.filter(pk=group_id).update(
+        posts_count=Greatest(F('posts_count') - 1, 0),
+        last_post_date=_last_post_date())
+
+
+def post_added(post, delta=1):
+    _shift(AuthorStats.objects.filter(user=post.author_id),
+           delta, 'posts_count')
+    if post.group_id and delta > 0:
+        _group_post_added(post.group_id, post.pub_date)
+    elif post.group_id:
+        _group_post_removed(post.group_id)
+
+
+def post_moved(post, old_group_id):
+    if old_group_id:
+        _group_post_removed(old_group_id)
+    if post.group_id:
+        _group_post_added(post.group_id, post.pub_date)
+
+
+def follow_added(follow, delta=1):
+    _shift(AuthorStats.objects.filter(user=follow.author_id),
+           delta, 'followers_count')
+    _shift(AuthorStats.objects.filter(user=follow.user_id),
+           delta, 'following_count')
+
+
+def author_stats(author):
+    """Счётчики автора, загруженные через select_related('stats').
+
+    Строку создают сигналы, но пользователи из bulk_create остаются без
+    неё до recount_stats: для них счётчики считаются на месте. Ответ
+    также подставляется в author.stats для шаблонов.
+    """
+    try:
+        return author.stats
+    except AuthorStats.DoesNotExist:
+        counts = (type(author).objects.filter(pk=author.pk)
+                  .values(**real_author_counts('pk')).get())
+        author.stats = AuthorStats(**counts)
+        return author.stats
+
+
+def _count(queryset, field):
+    """Подзапрос с числом строк queryset, сгруппированных по field."""
+    return Coalesce(Subquery(queryset.order_by().values(field)
+                             .annotate(total=Count('pk'))
+                             .values('total')), 0)
+
+
+def real_author_counts(user='user'):
+    """Подзапросы счётчиков автора; user — поле внешнего запроса."""
+    return {
+        'posts_count': _count(Post.objects.filter(author=OuterRef(user)),
+                              'author'),
+        'followers_count': _count(
+            Follow.objects.filter(author=OuterRef(user)), 'author'),
+        'following_count': _count(
+            Follow.objects.filter(user=OuterRef(user)), 'user'),
+    }
+
+
+def real_group_counts():
+    return {
+        'posts_count': _count(Post.objects.filter(group=OuterRef('pk')),
+                              'group'),
+        'last_post_date': _last_post_date(),
+    }
+
+
+def recount(authors=(), groups=()):
+    """Пересчитывает счётчики только указанных авторов и групп.
+
+    Для записей в обход сигналов: полный проход recount_stats по всем
+    строкам здесь не нужен.
+    """
+    if authors:
+        AuthorStats.objects.filter(user__in=authors).update(
+            **real_author_counts())
+    if groups:
+        Group.objects.filter(pk__in=groups).update(**real_group_counts())
@@ -0,0 +1,115 @@
+"""Сводка новых постов от авторов из подписок.
+
+Подписчики обходятся пачками по возрастанию id. Для пачки читаются
+только её подписки и посты её авторов за период, поэтому память не
+растёт с числом пользователей и подписок.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMessage
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Substr
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from .models import Follow, Post
+
+User = get_user_model()
+
+CHUNK_SIZE = 500
+# Размер списков id в одном запросе: SQLite ограничивает число параметров
+BATCH_SIZE = 500
+# Сколько последних постов каждого автора показать в сводке
+POSTS_PER_AUTHOR = 3
+# До скольких символов сокращать текст поста
+TEXT_LENGTH = 100
+SUBJECT = 'Новые посты авторов, на которых вы подписаны'
+TEMPLATE = 'posts/email/digest.txt'
+
+
+def digests(since, chunk_size=CHUNK_SIZE):
+    """Сводки [(подписчик, [(автор, число постов, посты)])] по пачкам.
+
+    Подписчики без почты пропускаются. Посты — последние
+    POSTS_PER_AUTHOR за период, новые сверху.
+    """
+    recent = Post.objects.filter(pub_date__gte=since).values('author_id')
+    last = 0
+    while True:
+        ids = list(Follow.objects.filter(user_id__gt=last,
+                                         author_id__in=recent)
+                   .order_by('user_id')
+                   .values_list('user_id', flat=True)
+                   .distinct()[:chunk_size])
+        if not ids:
+            return
+        last = ids[-1]
+        edges = Follow.objects.filter(user_id__in=ids, author_id__in=recent)
+        yield _chunk(ids, edges, since)
+
+
+def _batches(ids, size=BATCH_SIZE):
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _chunk(ids, edges, since):
+    follows = defaultdict(list)
+    for user_id, author_id in edges.values_list('user_id', 'author_id'):
+        follows[user_id].append(author_id)
+    author_ids = sorted({author_id for authors in follows.values()
+                         for author_id in authors})
+    # Последние посты авторов — коррелированными подзапросами по индексу
+    # (author, pub_date), как превью в каталоге групп
+    latest = (Post.objects.filter(author=OuterRef('pk'), pub_date__gte=since)
+              .order_by('-pub_date', '-pk').values('pk'))
+    names = [f'latest_{i}' for i in range(POSTS_PER_AUTHOR)]
+    counts, authors = {}, {}
+    for batch in _batches(author_ids):
+        counts.update(Post.objects.filter(pub_date__gte=since,
+                                          author_id__in=batch)
+                      .order_by().values('author_id')
+                      .annotate(count=Count('pk'))
+                      .values_list('author_id', 'count'))
+        authors.update((author.pk, author) for author in (
+            User.objects.filter(pk__in=batch)
+            .only('username', 'first_name', 'last_name')
+            .annotate(**{name: Subquery(latest[i:i + 1])
+                         for i, name in enumerate(names)})))
+    # Текст и ссылка готовятся один раз на пост, а не на каждое письмо
+    posts = {}
+    post_ids = [getattr(author, name) for author in authors.values()
+                for name in names if getattr(author, name)]
+    short = Substr('text', 1, TEXT_LENGTH + 1)
+    for batch in _batches(post_ids):
+        for pk, text in (Post.objects.filter(pk__in=batch)
+                         .values_list('pk', short)):
+            if len(text) > TEXT_LENGTH:
+                text = text[:TEXT_LENGTH - 1] + '…'
+            posts[pk] = {'text': text,
+                         'url': reverse('posts:post_detail', args=(pk,))}
+    subscribers = (User.objects.filter(pk__in=ids).exclude(email='')
+                   .only('username', 'first_name', 'last_name', 'email')
+                   .order_by('pk'))
+    chunk = []
+    for user in subscribers:
+        entries = []
+        for author_id in follows[user.pk]:
+            author = authors[author_id]
+            entries.append((author, counts.get(author_id, 0),
+                            [posts[pk] for pk in (getattr(author, name)
+                                                  for name in names)
+                             if pk in posts]))
+        entries.sort(key=lambda entry: -entry[1])
+        chunk.append((user, entries))
+    return chunk
+
+
+def digest_message(user, entries):
+    """Письмо со сводкой для подписчика."""
+    body = render_to_string(TEMPLATE, {'user': user, 'entries': entries,
+                                       'site_url': settings.SITE_URL})
+    return EmailMessage(SUBJECT, body, to=[user.email])
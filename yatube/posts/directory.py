@@ -0,0 +1,37 @@
+"""Каталог групп.
+
+Число постов и дату последнего поста counters поддерживает при записи,
+а последние посты групп страницы выбираются коррелированными
+подзапросами — по шагу индекса (group, pub_date) на пост. Страница
+каталога — постоянное число запросов при любом числе групп и постов.
+"""
+from django.db.models import F, OuterRef, Subquery
+
+from .models import Group, Post
+
+# Сколько последних постов показывать у группы
+PREVIEW_SIZE = 3
+
+
+def directory():
+    """Группы, недавно писавшие — сверху, пустые — в конце."""
+    return Group.objects.order_by(F('last_post_date').desc(nulls_last=True),
+                                  'title')
+
+
+def attach_previews(groups):
+    """Кладёт в group.preview последние посты: два запроса на страницу."""
+    latest = (Post.objects.filter(group=OuterRef('pk'))
+              .order_by('-pub_date', '-pk').values('pk'))
+    names = [f'preview_{i}' for i in range(PREVIEW_SIZE)]
+    rows = (Group.objects.filter(pk__in=[group.pk for group in groups])
+            .annotate(**{name: Subquery(latest[i:i + 1])
+                         for i, name in enumerate(names)})
+            .values_list('pk', *names))
+    previews = {pk: [post for post in ids if post] for pk, *ids in rows}
+    posts = (Post.objects.only('pk', 'text', 'pub_date', 'group')
+             .in_bulk([pk for ids in previews.values() for pk in ids]))
+    for group in groups:
+        group.preview = [posts[pk] for pk in previews.get(group.pk, ())
+                         if pk in posts]
+    return groups
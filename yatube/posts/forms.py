@@ -1,4 +1,8 @@
+from django import forms
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm
+from .export import FILTERS, FORMATS
+from .images import ingest
 from .models import Post, Comment
 
 
@@ -8,8 +12,50 @@ class PostForm(ModelForm):
         fields = ('text', 'group', 'image')
         error_messages = {'text': {'required': 'Текст поста обязателен!'}}
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # Обрабатываем только новую загрузку, а не уже сохранённый файл
+        if isinstance(image, UploadedFile):
+            image, width, height = ingest(image)
+            self.instance.image_width = width
+            self.instance.image_height = height
+        elif not image:
+            self.instance.image_width = self.instance.image_height = None
+        return image
+
 
 class CommentForm(ModelForm):
     class Meta:
         model = Comment
         fields = ['text']
+
+
+class ExportForm(forms.Form):
+    """Параметры выгрузки: формат и фильтры."""
+    format = forms.ChoiceField(choices=[(name, name) for name in FORMATS],
+                               required=False)
+    group = forms.SlugField(required=False)
+    author = forms.CharField(max_length=150, required=False)
+    since = forms.DateField(required=False)
+    until = forms.DateField(required=False)
+
+    def __init__(self, *args, kind, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.kind = kind
+
+    def clean_format(self):
+        return self.cleaned_data['format'] or FORMATS[0]
+
+    def clean(self):
+        cleaned_data = super().clean()
+        # Неподдерживаемый фильтр — ошибка, а не молча полная выгрузка
+        for name in ('group', 'since', 'until'):
+            if cleaned_data.get(name) and name not in FILTERS[self.kind]:
+                self.add_error(name, f'Выгрузка {self.kind} не фильтруется '
+                                     f'по этому полю')
+        return cleaned_data
+
+    def filters(self):
+        """Фильтры для export.rows()."""
+        return {name: self.cleaned_data[name]
+                for name in FILTERS[self.kind]}
@@ -0,0 +1,89 @@
+"""Приём загруженных картинок: проверка, уменьшение, перекодирование."""
+import os
+import tempfile
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from PIL import Image, ImageOps, features
+
+# Больше точек не декодируем вовсе: защита от «декомпрессионных бомб».
+# Предел тот же, что у самого Pillow: выше него Image.open предупреждает,
+# а выше удвоенного — бросает DecompressionBombError
+MAX_SOURCE_PIXELS = Image.MAX_IMAGE_PIXELS
+# Длинная сторона сохранённой картинки
+MAX_SIDE = 2048
+JPEG_QUALITY = 85
+# Картинки в этих форматах без метаданных и в пределах размера храним
+# как есть, чтобы не терять качество на повторном сжатии
+KEEP_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+# Служебные поля image.info, которые ничего не говорят об авторе
+# и съёмке. Любое другое (EXIF, XMP, ICC, комментарии, текст PNG,
+# расширения GIF) — метаданные: такой файл перекодируется
+TECHNICAL_INFO = frozenset((
+    'jfif', 'jfif_version', 'jfif_unit', 'jfif_density', 'dpi',
+    'progressive', 'progression', 'adobe', 'adobe_transform',
+    'version', 'background', 'duration', 'loop', 'transparency',
+    'interlace', 'gamma', 'srgb', 'chromaticity', 'aspect',
+))
+# Файл результата держим в памяти, пока он меньше этого размера
+SPOOL_SIZE = 2 * 1024 * 1024
+
+
+def _has_metadata(image):
+    if image.format == 'PNG' and image.text:
+        # Текстовые блоки после данных PNG видны только после загрузки
+        return True
+    return bool(set(image.info) - TECHNICAL_INFO) or bool(image.getexif())
+
+
+def _target_format(image):
+    if features.check('webp'):
+        return 'WEBP', '.webp'
+    if image.mode in ('RGBA', 'LA', 'P') and 'transparency' in image.info \
+            or image.mode in ('RGBA', 'LA'):
+        return 'PNG', '.png'
+    return 'JPEG', '.jpg'
+
+
+def ingest(upload):
+    """Готовит загруженную картинку к хранению.
+
+    Возвращает (файл, ширина, высота). Файл — исходный, если картинка
+    уже подходит, иначе уменьшенная копия без метаданных.
+    """
+    upload.seek(0)
+    too_large = ValidationError(
+        'Картинка слишком большая: не больше %(limit)d Мп',
+        code='too_many_pixels',
+        params={'limit': MAX_SOURCE_PIXELS // 1_000_000})
+    try:
+        # open() читает только заголовок, точки ещё не декодированы
+        image = Image.open(upload)
+    except Image.DecompressionBombError:
+        raise too_large
+    width, height = image.size
+    if width * height > MAX_SOURCE_PIXELS:
+        raise too_large
+    if (image.format in KEEP_FORMATS and max(width, height) <= MAX_SIDE
+            and not _has_metadata(image)):
+        upload.seek(0)
+        return upload, width, height
+    if image.format == 'JPEG':
+        # Декодер JPEG сразу уменьшает картинку в 2-8 раз
+        image.draft('RGB', (MAX_SIDE, MAX_SIDE))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((MAX_SIDE, MAX_SIDE), Image.LANCZOS)
+    image_format, extension = _target_format(image)
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    elif image_format != 'JPEG' and image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    # PNG берёт ICC и EXIF из image.info, если их не передать явно:
+    # оставляем только прозрачность
+    image.info = {key: value for key, value in image.info.items()
+                  if key == 'transparency'}
+    image.save(output, image_format, quality=JPEG_QUALITY, optimize=True)
+    output.seek(0)
+    name = os.path.splitext(os.path.basename(upload.name))[0] + extension
+    return File(output, name=name), image.width, image.height
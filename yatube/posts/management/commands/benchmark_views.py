@@ -0,0 +1,209 @@
+import json
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max, Min
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from core.queries import count_queries
+from posts.models import AuthorStats, Group, Post
+
+# Вьюхи, которые меняют данные: их запросы откатываются
+WRITE_VIEWS = ('post_create', 'post_edit', 'add_comment', 'profile_follow')
+VIEWS = ('index', 'popular', 'group_list', 'profile', 'post_detail',
+         'follow_index', *WRITE_VIEWS)
+
+
+def percentile(values, share):
+    """Значение, меньше которого share процентов замеров.
+
+    Линейная интерполяция между соседними замерами; statistics.quantiles
+    нет в Python 3.7.
+    """
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * share / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Замеряет задержку, число запросов и пиковую память '
+            'вьюх постов через тестовый клиент на текущей базе')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Сколько запросов на каждую вьюху')
+        parser.add_argument('--views', nargs='+', choices=VIEWS,
+                            default=list(VIEWS))
+        parser.add_argument('--cold', action='store_true',
+                            help='Очищать кеш перед каждым запросом')
+        parser.add_argument('--output', help='Куда сохранить JSON')
+        parser.add_argument('--compare',
+                            help='JSON прошлого прогона для сравнения')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.cold = options['cold']
+        self.clients = {}
+        self.sample_data()
+        results = {}
+        for view in options['views']:
+            results[view] = self.measure(view, options['requests'])
+            self.report(view, results[view])
+        report = {'revision': git_revision(),
+                  'created': timezone.now().isoformat(),
+                  'requests': options['requests'],
+                  'cold': self.cold,
+                  'views': results}
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+        if options['compare']:
+            with open(options['compare']) as baseline:
+                self.compare(json.load(baseline)['views'], results)
+
+    def sample_data(self):
+        bounds = Post.objects.aggregate(first=Min('pk'), last=Max('pk'))
+        if bounds['first'] is None:
+            raise CommandError('В базе нет постов: запустите seed_data')
+        self.post_bounds = bounds['first'], bounds['last']
+        self.groups = list(Group.objects.values_list('slug', flat=True)
+                           [:1000])
+        # Читатели с подписками, чтобы лента не была пустой
+        self.readers = list(AuthorStats.objects.order_by('-following_count')
+                            .select_related('user')[:100])
+        self.authors = list(AuthorStats.objects.order_by('-posts_count')
+                            .select_related('user')[:100])
+
+    def random_post(self):
+        pk = self.random.randint(*self.post_bounds)
+        return (Post.objects.filter(pk__gte=pk).order_by('pk')
+                .select_related('author').first())
+
+    def client_for(self, user):
+        """Клиент с сессией пользователя: вход один раз, как на сайте."""
+        if user.pk not in self.clients:
+            client = Client(HTTP_HOST='localhost')
+            client.force_login(user)
+            self.clients[user.pk] = client
+        return self.clients[user.pk]
+
+    def prepare(self, view):
+        """Клиент и запрос для очередного замера вьюхи."""
+        client = self.client_for(self.random.choice(self.readers).user)
+        if view == 'index':
+            return client, 'get', reverse('posts:index'), None
+        if view == 'popular':
+            return client, 'get', reverse('posts:popular'), None
+        if view == 'group_list':
+            slug = self.random.choice(self.groups)
+            return client, 'get', reverse('posts:group_list',
+                                          args=(slug,)), None
+        if view == 'profile':
+            author = self.random.choice(self.authors).user
+            return client, 'get', reverse('posts:profile',
+                                          args=(author.username,)), None
+        if view == 'post_detail':
+            return client, 'get', reverse('posts:post_detail',
+                                          args=(self.random_post().pk,)), None
+        if view == 'follow_index':
+            return client, 'get', reverse('posts:follow_index'), None
+        if view == 'post_create':
+            return client, 'post', reverse('posts:post_create'), {
+                'text': 'Замер', 'group': ''}
+        if view == 'post_edit':
+            post = self.random_post()
+            client = self.client_for(post.author)
+            return client, 'post', reverse('posts:post_edit',
+                                           args=(post.pk,)), {
+                'text': post.text, 'group': post.group_id or ''}
+        if view == 'add_comment':
+            return client, 'post', reverse('posts:add_comment',
+                                           args=(self.random_post().pk,)), {
+                'text': 'Замер'}
+        author = self.random.choice(self.authors).user
+        return client, 'get', reverse('posts:profile_follow',
+                                      args=(author.username,)), None
+
+    def request(self, view):
+        client, method, url, data = self.prepare(view)
+        if self.cold:
+            cache.clear()
+        with transaction.atomic():
+            with count_queries() as log:
+                started = time.perf_counter()
+                response = getattr(client, method)(url, data)
+                elapsed = time.perf_counter() - started
+            if view in WRITE_VIEWS:
+                # База после замера остаётся прежней
+                transaction.set_rollback(True)
+        if response.status_code >= 400:
+            raise CommandError(f'{url}: ответ {response.status_code}')
+        return elapsed, log.count
+
+    def measure(self, view, requests):
+        timings, queries = [], []
+        for _ in range(requests):
+            elapsed, count = self.request(view)
+            timings.append(elapsed * 1000)
+            queries.append(count)
+        # Память меряем отдельно: tracemalloc замедляет каждый запрос.
+        # Пик сбрасывается перезапуском: reset_peak() нет до Python 3.9
+        peak = 0
+        for _ in range(min(requests, 5)):
+            tracemalloc.start()
+            self.request(view)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        return {'p50_ms': round(percentile(timings, 50), 2),
+                'p95_ms': round(percentile(timings, 95), 2),
+                'p99_ms': round(percentile(timings, 99), 2),
+                'queries': max(queries),
+                'queries_avg': round(statistics.mean(queries), 2),
+                'peak_kb': peak // 1024}
+
+    def report(self, view, result):
+        self.stdout.write(
+            f'{view:<15} p50 {result["p50_ms"]:>8.2f} мс  '
+            f'p95 {result["p95_ms"]:>8.2f} мс  '
+            f'p99 {result["p99_ms"]:>8.2f} мс  '
+            f'запросов {result["queries"]:>3} '
+            f'(в среднем {result["queries_avg"]:>5.2f})  '
+            f'память {result["peak_kb"]:>6} КБ')
+
+    def compare(self, baseline, results):
+        self.stdout.write('Сравнение с базовым прогоном:')
+        for view, result in results.items():
+            if view not in baseline:
+                continue
+            before = baseline[view]
+            changes = []
+            for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'peak_kb'):
+                if before[metric]:
+                    change = (result[metric] / before[metric] - 1) * 100
+                    changes.append(f'{metric} {change:+.0f}%')
+            queries = result['queries'] - before['queries']
+            changes.append(f'queries {queries:+d}')
+            if 'queries_avg' in before:
+                average = result['queries_avg'] - before['queries_avg']
+                changes.append(f'queries_avg {average:+.2f}')
+            self.stdout.write(f'{view:<15} ' + '  '.join(changes))
@@ -0,0 +1,137 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import reverse
+
+from posts.models import AuthorStats, Group, Post
+
+User = get_user_model()
+
+# Признаки плохого плана: полный проход таблицы и сортировка в памяти
+PROBLEMS = {
+    # Проход по индексу в нужном порядке с LIMIT — это не полный проход
+    'sqlite': ((re.compile(r'^SCAN \S+$'), 'полный проход'),
+               (re.compile(r'^SCAN .*COVERING INDEX'), 'проход индекса'),
+               (re.compile(r'TEMP B-TREE'), 'сортировка во временном '
+                                            'B-дереве')),
+    'postgresql': ((re.compile(r'Seq Scan'), 'полный проход'),
+                   (re.compile(r'\bSort\b'), 'сортировка')),
+}
+_TABLE = re.compile(r'\bFROM "(\w+)"')
+_EQUALS = r'"{table}"\."(\w+)" = %s'
+_ORDER = re.compile(r'ORDER BY (.*?)(?: LIMIT| OFFSET|$)')
+EXPLAIN = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'postgresql': 'EXPLAIN ',
+}
+
+
+class QueryCollector:
+    """Запоминает SELECT-запросы вместе с параметрами."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith('SELECT'):
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+def suggest_index(sql):
+    """Индекс для основной таблицы: поля равенства, затем сортировки."""
+    table = _TABLE.search(sql)
+    if table is None:
+        return None
+    table = table.group(1)
+    fields = re.findall(_EQUALS.format(table=table), sql)
+    order = _ORDER.search(sql)
+    if order is not None:
+        for column in order.group(1).split(','):
+            match = re.match(rf'\s*"{table}"\."(\w+)"( DESC)?', column)
+            if match is None:
+                break
+            if match.group(1) != 'id':
+                fields.append(('-' if match.group(2) else '')
+                              + match.group(1))
+    if not fields:
+        return None
+    return f'{table}: Index(fields={fields!r})'
+
+
+def plan(sql, params):
+    """Строки плана запроса в текстовом виде."""
+    with connection.cursor() as cursor:
+        cursor.execute(EXPLAIN[connection.vendor] + sql, params)
+        # В SQLite текст плана — последняя колонка, в PostgreSQL — первая
+        return [row[-1] for row in cursor.fetchall()]
+
+
+class Command(BaseCommand):
+    help = ('Выполняет EXPLAIN для запросов вьюх постов и отмечает '
+            'полные проходы таблиц и сортировки без индекса')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help='Печатать план каждого запроса')
+
+    def handle(self, *args, verbose_plans, **options):
+        if connection.vendor not in EXPLAIN:
+            raise CommandError(f'EXPLAIN для {connection.vendor} '
+                               f'не поддерживается')
+        problems = 0
+        # Вход пишет строку сессии и last_login читателя:
+        # после прогона база остаётся прежней
+        with transaction.atomic():
+            for name, client, url in self.pages():
+                collector = QueryCollector()
+                with connection.execute_wrapper(collector):
+                    client.get(url)
+                self.stdout.write(f'{name} {url}: '
+                                  f'{len(collector.queries)} SELECT')
+                for sql, params in collector.queries:
+                    lines = plan(sql, params)
+                    found = [(label, line) for line in lines
+                             for pattern, label in PROBLEMS[connection.vendor]
+                             if pattern.search(line.strip())]
+                    if found or verbose_plans:
+                        self.stdout.write(f'  {sql[:200]}')
+                        for line in lines:
+                            self.stdout.write(f'    {line}')
+                    for label, line in found:
+                        problems += 1
+                        self.stdout.write(self.style.WARNING(
+                            f'    ! {label}: {line.strip()}'))
+                    suggestion = found and suggest_index(sql)
+                    if suggestion:
+                        self.stdout.write(f'    > {suggestion}')
+            transaction.set_rollback(True)
+        self.stdout.write(f'Проблем в планах: {problems}')
+
+    def pages(self):
+        """Страницы постов на типичных данных текущей базы."""
+        post = Post.objects.order_by('-pk').first()
+        reader = (AuthorStats.objects.order_by('-following_count')
+                  .select_related('user').first())
+        author = (AuthorStats.objects.order_by('-posts_count')
+                  .select_related('user').first())
+        group = Group.objects.order_by('-posts_count').first()
+        if not (post and reader and author):
+            raise CommandError('В базе нет постов: запустите seed_data')
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(reader.user)
+        yield 'index', client, reverse('posts:index')
+        yield 'index', client, reverse('posts:index') + '?page=50'
+        if group is not None:
+            yield 'group_list', client, reverse('posts:group_list',
+                                                args=(group.slug,))
+        yield 'profile', client, reverse('posts:profile',
+                                         args=(author.user.username,))
+        yield 'post_detail', client, reverse('posts:post_detail',
+                                             args=(post.pk,))
+        yield 'post_comments', client, reverse('posts:post_comments',
+                                               args=(post.pk,))
+        yield 'follow_index', client, reverse('posts:follow_index')
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+from posts.forms import ExportForm
+
+
+class Command(BaseCommand):
+    help = ('Выгружает посты, комментарии или подписки в NDJSON или CSV '
+            'потоком, не держа строки в памяти')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=export.KINDS)
+        parser.add_argument('--format', choices=export.FORMATS,
+                            default=export.FORMATS[0])
+        parser.add_argument('--group', help='slug группы')
+        parser.add_argument('--author', help='username автора')
+        parser.add_argument('--since', help='Начальная дата, ГГГГ-ММ-ДД')
+        parser.add_argument('--until', help='Конечная дата, ГГГГ-ММ-ДД')
+        parser.add_argument('--output', help='Файл; по умолчанию stdout')
+
+    def handle(self, *args, kind, output, **options):
+        # Те же правила проверки фильтров, что и у выгрузки через сайт
+        form = ExportForm({name: options[name] for name in
+                           ('format', 'group', 'author', 'since', 'until')
+                           if options[name]}, kind=kind)
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+        columns, values = export.rows(kind, **form.filters())
+        lines = export.lines(form.cleaned_data['format'], columns, values)
+        if output is None:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(output, 'w', encoding='utf-8', newline='') as file:
+            file.writelines(lines)
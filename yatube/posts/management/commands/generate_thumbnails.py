@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import get_thumbnail
+
+from core.cache import bump
+from posts.models import Post
+from posts.thumbnails import GEOMETRY, OPTIONS, cached_thumbnail
+from posts.utils import post_feeds
+
+
+class Command(BaseCommand):
+    help = ('Создаёт недостающие миниатюры постов: для картинок, '
+            'загруженных до фоновой генерации или пропущенных очередью')
+
+    def handle(self, *args, **options):
+        created = 0
+        posts = (Post.objects.exclude(image='')
+                 .only('pk', 'image', 'author', 'group'))
+        for post in posts.iterator():
+            if cached_thumbnail(post.image) is not None:
+                continue
+            get_thumbnail(post.image.name, GEOMETRY, **OPTIONS)
+            bump(*post_feeds(post))
+            created += 1
+        self.stdout.write(f'Создано миниатюр: {created}')
@@ -0,0 +1,99 @@
+import os
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from posts import importer
+from posts.models import ImportProgress
+
+
+class Command(BaseCommand):
+    help = ('Импортирует пользователей, посты, комментарии или подписки '
+            'из NDJSON пачками; прерванный импорт продолжается с места '
+            'остановки')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=importer.KINDS)
+        parser.add_argument('path', help='Файл NDJSON')
+        parser.add_argument('--batch-size', type=int,
+                            default=importer.BATCH_SIZE,
+                            help='Сколько строк писать в одной транзакции')
+        parser.add_argument('--keep-ids', action='store_true',
+                            help='Сохранить id постов и комментариев '
+                                 'из файла')
+        parser.add_argument('--restart', action='store_true',
+                            help='Начать файл сначала, а не с места '
+                                 'остановки')
+
+    def handle(self, *args, kind, path, batch_size, keep_ids, restart,
+               **options):
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+        try:
+            file = open(path, 'rb')
+        except OSError as error:
+            raise CommandError(error)
+        progress, _ = ImportProgress.objects.get_or_create(
+            source=f'{kind}:{os.path.abspath(path)}')
+        if restart:
+            progress.offset = progress.lines = 0
+            progress.imported = progress.skipped = 0
+        elif progress.offset:
+            self.stdout.write(f'Продолжаем со строки {progress.lines + 1}')
+        rows = importer.Importer(kind, keep_ids)
+        started = time.monotonic()
+        imported = 0
+        # Строки, прочитанные прошлыми запусками
+        previous_lines = progress.lines
+        with file:
+            file.seek(progress.offset)
+            for batch, offset in importer.batches(file, batch_size):
+                imported += self.import_batch(rows, progress, batch, offset,
+                                              previous_lines)
+                self.report(kind, progress, imported, started)
+        if keep_ids:
+            self.reset_sequence(rows.model)
+        self.stdout.write(f'Готово: принято {progress.imported}, '
+                          f'пропущено {progress.skipped}')
+
+    def import_batch(self, rows, progress, batch, offset, previous_lines):
+        """Проверяет и пишет пачку; возвращает число принятых строк."""
+        objects, errors = [], []
+        for number, raw in batch:
+            if not raw.strip():
+                continue
+            try:
+                objects.append((previous_lines + number,
+                                rows.build(importer.parse(raw))))
+            except ValidationError as error:
+                errors.append((previous_lines + number,
+                               '; '.join(error.messages)))
+        # Пачка и позиция в файле сохраняются вместе
+        with transaction.atomic():
+            accepted, rejected = rows.write(objects)
+            progress.offset = offset
+            progress.lines = previous_lines + batch[-1][0]
+            progress.imported += accepted
+            progress.skipped += len(errors) + len(rejected)
+            progress.save()
+        for number, message in sorted(errors + rejected):
+            self.stderr.write(f'Строка {number}: {message}')
+        return accepted
+
+    def report(self, kind, progress, imported, started):
+        elapsed = time.monotonic() - started
+        rate = imported / elapsed if elapsed else 0
+        self.stdout.write(f'{kind}: прочитано строк {progress.lines}, '
+                          f'принято {progress.imported}, '
+                          f'пропущено {progress.skipped}, '
+                          f'{rate:.0f} строк/с')
+
+    def reset_sequence(self, model):
+        """После вставки с явными id счётчик id в PostgreSQL отстаёт."""
+        statements = connection.ops.sequence_reset_sql(no_style(), [model])
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts import popular
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает рейтинги популярных постов по комментариям, '
+            'например после массовой загрузки')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=14,
+                            help='За сколько дней учитывать комментарии')
+
+    def handle(self, *args, days, **options):
+        scored = popular.rebuild(timezone.now() - timedelta(days=days))
+        self.stdout.write(f'Рейтинги постов: {scored}')
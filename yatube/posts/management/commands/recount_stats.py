@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+
+from posts.counters import real_author_counts, real_group_counts
+from posts.models import AuthorStats, Group
+
+User = get_user_model()
+
+
+def _broken(queryset, real_counts):
+    """Строки, в которых хотя бы один счётчик расходится с данными."""
+    annotations = {f'real_{field}': value
+                   for field, value in real_counts.items()}
+    mismatch = Q()
+    for field in real_counts:
+        # Сравнение с NULL не истинно и не ложно: пустоты проверяем отдельно
+        mismatch |= (~Q(**{field: F(f'real_{field}')})
+                     | Q(**{f'{field}__isnull': True,
+                            f'real_{field}__isnull': False})
+                     | Q(**{f'{field}__isnull': False,
+                            f'real_{field}__isnull': True}))
+    return (queryset.annotate(**annotations).filter(mismatch)
+            .values_list('pk', flat=True))
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает и чинит счётчики постов и подписок и даты '
+            'последних постов групп')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Сколько строк чинить за одно обновление')
+
+    def handle(self, *args, batch_size, **options):
+        missing = (User.objects.filter(stats__isnull=True)
+                   .values_list('pk', flat=True))
+        # Размер пачки вставки Django подбирает сам под лимиты базы
+        created = AuthorStats.objects.bulk_create(
+            [AuthorStats(user_id=pk) for pk in missing.iterator()])
+        self.stdout.write(f'Создано счётчиков авторов: {len(created)}')
+        for model, real_counts in ((AuthorStats, real_author_counts()),
+                                   (Group, real_group_counts())):
+            broken = list(_broken(model.objects.all(), real_counts))
+            for start in range(0, len(broken), batch_size):
+                with transaction.atomic():
+                    (model.objects
+                     .filter(pk__in=broken[start:start + batch_size])
+                     .update(**real_counts))
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: '
+                f'исправлено {len(broken)}')
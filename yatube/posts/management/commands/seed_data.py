@@ -0,0 +1,175 @@
+import random
+from array import array
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+
+from core.models import bulk_create_dated
+from posts import search, timeline
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Сколько разных текстов генерировать: Faker слишком медленный,
+# чтобы писать им каждый из миллионов постов
+TEXT_POOL = 500
+
+
+class Command(BaseCommand):
+    help = ('Наполняет базу синтетическими данными: пользователями, '
+            'группами, постами, подписками со степенным распределением '
+            'и комментариями')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Среднее число подписок пользователя')
+        parser.add_argument('--skew', type=float, default=3.0,
+                            help='Крутизна степенного распределения: '
+                                 'чем больше, тем сильнее выделяются '
+                                 'популярные авторы')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней разбросать даты')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.validate(options)
+        self.random = random.Random(options['seed'])
+        self.faker = Faker('ru_RU')
+        self.faker.seed_instance(options['seed'])
+        self.skew = options['skew']
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.period = timedelta(days=options['days']).total_seconds()
+        self.texts = [self.faker.paragraph(nb_sentences=5)
+                      for _ in range(TEXT_POOL)]
+
+        users = self.create_users(options['users'])
+        groups = self.create_groups(options['groups'])
+        posts = self.create_posts(options['posts'], users, groups)
+        self.create_comments(options['comments'], users, posts)
+        self.create_follows(options['follows'], users)
+        self.fill_timelines()
+        if posts and not search.uses_fts():
+            self.stdout.write('Строим запасной поисковый индекс')
+            for post in Post.objects.filter(pk__gte=posts[0]).iterator():
+                search.index_post(post)
+        # bulk_create не шлёт сигналы: счётчики считаем за один проход
+        call_command('recount_stats', stdout=self.stdout)
+        call_command('recount_popular', stdout=self.stdout)
+
+    def validate(self, options):
+        for name in ('users', 'groups', 'posts', 'comments', 'follows',
+                     'days'):
+            if options[name] < 0:
+                raise CommandError(f'--{name} не может быть отрицательным')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным')
+        # Авторы постов и комментариев выбираются из новых пользователей
+        if not options['users'] and (options['posts']
+                                     or options['comments']):
+            raise CommandError('Для постов и комментариев нужен хотя бы '
+                               'один пользователь: задайте --users')
+
+    def skewed(self, items):
+        """Элемент из начала списка вероятнее, чем из конца."""
+        return items[int(len(items) * self.random.random() ** self.skew)]
+
+    def date(self):
+        return self.now - timedelta(seconds=self.random.random()
+                                    * self.period)
+
+    def insert(self, model, rows):
+        """Пишет строки пачками и возвращает id новых строк."""
+        last = model.objects.order_by('-pk').values_list('pk', flat=True)
+        start = last.first() or 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == self.batch_size:
+                self.flush(model, batch)
+                batch = []
+        self.flush(model, batch)
+        # Массив целых вместо списка: миллионы id занимают мегабайты
+        ids = array('q', model.objects.filter(pk__gt=start)
+                    .order_by('pk').values_list('pk', flat=True)
+                    .iterator())
+        self.stdout.write(f'{model._meta.verbose_name_plural}: {len(ids)}')
+        return ids
+
+    def flush(self, model, batch):
+        if not batch:
+            return
+        with transaction.atomic():
+            if model in (Post, Comment):
+                bulk_create_dated(model, batch)
+            else:
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+
+    def create_users(self, total):
+        password = make_password(None)
+        prefix = self.faker.user_name()
+        offset = User.objects.count()
+        rows = (User(username=f'{prefix}{offset + i}',
+                     first_name=self.faker.first_name(),
+                     last_name=self.faker.last_name(),
+                     password=password)
+                for i in range(total))
+        return self.insert(User, rows)
+
+    def create_groups(self, total):
+        offset = Group.objects.count()
+        rows = (Group(title=self.faker.catch_phrase()[:200],
+                      slug=f'group-{offset + i}',
+                      description=self.random.choice(self.texts))
+                for i in range(total))
+        return self.insert(Group, rows)
+
+    def create_posts(self, total, users, groups):
+        # Часть постов публикуется без группы
+        rows = (Post(author_id=self.skewed(users),
+                     group_id=(self.skewed(groups)
+                               if groups and self.random.random() < 0.7
+                               else None),
+                     text=self.random.choice(self.texts),
+                     pub_date=self.date())
+                for _ in range(total))
+        return self.insert(Post, rows)
+
+    def create_comments(self, total, users, posts):
+        if not posts:
+            return
+        rows = (Comment(post_id=self.skewed(posts),
+                        author_id=self.random.choice(users),
+                        text=self.faker.sentence(),
+                        pub_date=self.date())
+                for _ in range(total))
+        self.insert(Comment, rows)
+
+    def create_follows(self, average, users):
+        def rows():
+            for user in users:
+                authors = {self.skewed(users)
+                           for _ in range(self.random.randint(0,
+                                                              2 * average))}
+                authors.discard(user)
+                for author in authors:
+                    yield Follow(user_id=user, author_id=author)
+        self.insert(Follow, rows())
+
+    def fill_timelines(self):
+        """Раскладывает посты по лентам подписчиков, как это делают
+        сигналы при обычной работе сайта."""
+        with transaction.atomic():
+            timeline.fill()
+        self.stdout.write('Ленты подписок заполнены')
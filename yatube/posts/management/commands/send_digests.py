@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from django.db import reset_queries
+from django.utils import timezone
+
+from posts.digest import CHUNK_SIZE, digest_message, digests
+
+
+class Command(BaseCommand):
+    help = ('Рассылает подписчикам сводку новых постов авторов, '
+            'на которых они подписаны')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24,
+                            help='За сколько часов собирать посты')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help='Подписчиков в одной пачке')
+
+    def handle(self, *args, hours, chunk_size, **options):
+        since = timezone.now() - timedelta(hours=hours)
+        connection = get_connection()
+        total = 0
+        for chunk in digests(since, chunk_size):
+            # Очередь почты принимает пачку одним INSERT
+            total += connection.send_messages(
+                [digest_message(user, entries) for user, entries in chunk])
+            # При DEBUG журнал запросов иначе копит текст каждого письма
+            reset_queries()
+        self.stdout.write(f'Сводок отправлено: {total}')
@@ -0,0 +1,70 @@
+# Generated by Django 2.2.16 on 2026-10-18 07:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_timelines(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    for follow in Follow.objects.iterator():
+        posts = (Post.objects.filter(author=follow.author_id)
+                 .order_by('-pub_date')[:500])
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user_id=follow.user_id, post_id=post.pk,
+                           author_id=post.author_id, pub_date=post.pub_date)
+             for post in posts],
+            ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0009_auto_20230216_1209'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации поста')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи ленты',
+                'ordering': ['-pub_date'],
+            },
+        ),
+        migrations.AddField(
+            model_name='timelineentry',
+            name='author',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='timelineentry',
+            name='post',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='posts.Post'),
+        ),
+        migrations.AddField(
+            model_name='timelineentry',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-pub_date'], name='timeline_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', 'author'], name='timeline_user_author_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='timeline_unique'),
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
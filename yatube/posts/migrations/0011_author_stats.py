@@ -0,0 +1,65 @@
+# Generated by Django 2.2.16 on 2026-10-18 07:12
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def _count(queryset, field):
+    return Coalesce(Subquery(queryset.order_by().values(field)
+                             .annotate(total=Count('pk'))
+                             .values('total')), 0)
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    Follow = apps.get_model('posts', 'Follow')
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(user_id=pk)
+         for pk in User.objects.values_list('pk', flat=True).iterator()],
+        batch_size=1000)
+    AuthorStats.objects.update(
+        posts_count=_count(Post.objects.filter(author=OuterRef('user')),
+                           'author'),
+        followers_count=_count(Follow.objects.filter(author=OuterRef('user')),
+                               'author'),
+        following_count=_count(Follow.objects.filter(user=OuterRef('user')),
+                               'user'))
+    Group.objects.update(
+        posts_count=_count(Post.objects.filter(group=OuterRef('pk')),
+                           'group'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0010_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Число постов')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Число подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Число подписок')),
+            ],
+            options={
+                'verbose_name': 'Счётчики автора',
+                'verbose_name_plural': 'Счётчики авторов',
+            },
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число постов'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
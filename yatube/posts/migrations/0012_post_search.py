@@ -0,0 +1,88 @@
+# Generated by Django 2.2.16 on 2026-10-18 07:16
+
+import re
+from collections import Counter
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+FTS_SQL = (
+    "CREATE VIRTUAL TABLE posts_post_fts USING fts5("
+    "text, content='posts_post', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text); "
+    "END",
+    "CREATE TRIGGER posts_post_fts_delete AFTER DELETE ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts(posts_post_fts, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    "END",
+    "CREATE TRIGGER posts_post_fts_update AFTER UPDATE OF text ON posts_post "
+    "BEGIN "
+    "INSERT INTO posts_post_fts(posts_post_fts, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    "INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text); "
+    "END",
+    "INSERT INTO posts_post_fts(posts_post_fts) VALUES ('rebuild')",
+)
+
+
+def _fts5_supported(schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return False
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def create_fts(apps, schema_editor):
+    # На SQLite с FTS5 поиск идёт по виртуальной таблице, которую
+    # поддерживают триггеры; на остальных базах — по SearchTerm
+    if _fts5_supported(schema_editor):
+        for statement in FTS_SQL:
+            schema_editor.execute(statement)
+        return
+    Post = apps.get_model('posts', 'Post')
+    SearchTerm = apps.get_model('posts', 'SearchTerm')
+    for post in Post.objects.only('pk', 'text').iterator():
+        words = Counter(word[:64] for word in re.findall(r'\w+',
+                                                         post.text.lower()))
+        SearchTerm.objects.bulk_create(
+            [SearchTerm(term=term, post_id=post.pk, weight=weight)
+             for term, weight in words.items()])
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_post_fts')
+        for action in ('insert', 'delete', 'update'):
+            schema_editor.execute(
+                f'DROP TRIGGER IF EXISTS posts_post_fts_{action}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_author_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Слово')),
+                ('weight', models.PositiveIntegerField(default=1, verbose_name='Число вхождений')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='posts.Post')),
+            ],
+            options={
+                'verbose_name': 'Слово поиска',
+                'verbose_name_plural': 'Слова поиска',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='searchterm',
+            index=models.Index(fields=['term', 'post'], name='search_term_idx'),
+        ),
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 2.2.16 on 2026-10-18 07:22
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+# SQLite пересоздаёт таблицу при добавлении поля и теряет триггеры
+# полнотекстового индекса, поэтому индекс строится заново
+post_search = import_module('posts.migrations.0012_post_search')
+
+
+def drop_fts(apps, schema_editor):
+    if post_search._fts5_supported(schema_editor):
+        post_search.drop_fts(apps, schema_editor)
+
+
+def create_fts(apps, schema_editor):
+    # Таблица SearchTerm на других базах не затрагивается
+    if post_search._fts5_supported(schema_editor):
+        post_search.create_fts(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_fts, create_fts),
+        migrations.AddField(
+            model_name='post',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина картинки'),
+        ),
+        migrations.RunPython(create_fts, drop_fts),
+    ]
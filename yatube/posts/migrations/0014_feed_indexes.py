@@ -0,0 +1,76 @@
+# Generated by Django 2.2.16 on 2026-10-18 07:37
+
+from importlib import import_module
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+import django.db.models.deletion
+
+# Смена индексов внешних ключей пересоздаёт posts_post на SQLite,
+# вместе с таблицей пропадают триггеры полнотекстового индекса
+post_image_size = import_module('posts.migrations.0013_post_image_size')
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    # Ограничение уникальности раньше не действовало
+    Follow = apps.get_model('posts', 'Follow')
+    keep = (Follow.objects.values('user', 'author')
+            .annotate(first=Min('pk')).values('first'))
+    Follow.objects.exclude(pk__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_image_size'),
+    ]
+
+    operations = [
+        migrations.RunPython(post_image_size.drop_fts,
+                             post_image_size.create_fts),
+        migrations.AlterField(
+            model_name='comment',
+            name='post',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='comments', to='posts.Post'),
+        ),
+        migrations.AlterField(
+            model_name='follow',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='follower', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='author',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='posts', to=settings.AUTH_USER_MODEL, verbose_name='Автор поста'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='group',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Группа, к которой относится пост', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='posts', to='posts.Group', verbose_name='Группа'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'pub_date'], name='comment_post_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['pub_date'], name='post_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'pub_date'], name='post_author_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', 'pub_date'], name='post_group_date_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_follows,
+                             migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='subscribe_unique'),
+        ),
+        migrations.RunPython(post_image_size.create_fts,
+                             post_image_size.drop_fts),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-18 07:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportProgress',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255, unique=True, verbose_name='Источник')),
+                ('offset', models.BigIntegerField(default=0, verbose_name='Позиция в файле')),
+                ('lines', models.PositiveIntegerField(default=0, verbose_name='Прочитано строк')),
+                ('imported', models.PositiveIntegerField(default=0, verbose_name='Принято строк')),
+                ('skipped', models.PositiveIntegerField(default=0, verbose_name='Пропущено строк')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Прогресс импорта',
+                'verbose_name_plural': 'Прогресс импорта',
+            },
+        ),
+    ]
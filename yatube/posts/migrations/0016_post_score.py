@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-18 07:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_import_progress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostScore',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='posts.Post')),
+                ('rank', models.FloatField(verbose_name='Рейтинг')),
+            ],
+            options={
+                'verbose_name': 'Рейтинг поста',
+                'verbose_name_plural': 'Рейтинги постов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='postscore',
+            index=models.Index(fields=['rank'], name='post_score_rank_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-18 07:57
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_last_post_date(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    Group.objects.update(
+        last_post_date=Subquery(Post.objects.filter(group=OuterRef('pk'))
+                                .order_by('-pub_date')
+                                .values('pub_date')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='last_post_date',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Последняя публикация'),
+        ),
+        migrations.RunPython(fill_last_post_date, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 2.2.16 on 2026-10-18 08:00
+
+from importlib import import_module
+
+from django.db import migrations, models
+from django.db.models import F
+
+post_image_size = import_module('posts.migrations.0013_post_image_size')
+
+
+def fill_updated_at(apps, schema_editor):
+    # До миграции изменения не отслеживались: считаем датой изменения
+    # дату создания
+    for name in ('Post', 'Comment'):
+        apps.get_model('posts', name).objects.update(
+            updated_at=F('pub_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_group_last_post_date'),
+    ]
+
+    operations = [
+        migrations.RunPython(post_image_size.drop_fts,
+                             post_image_size.create_fts),
+        migrations.AddField(
+            model_name='comment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.RunPython(fill_updated_at, migrations.RunPython.noop),
+        migrations.RunPython(post_image_size.create_fts,
+                             post_image_size.drop_fts),
+    ]
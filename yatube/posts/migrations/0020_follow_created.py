@@ -0,0 +1,25 @@
+# Generated by Django 2.2.16 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_comment_ordering'),
+    ]
+
+    operations = [
+        # Сначала без auto_now_add: иначе существующим подпискам
+        # досталась бы дата миграции, которой они в рейтинге не засчитаны
+        migrations.AddField(
+            model_name='follow',
+            name='created',
+            field=models.DateTimeField(null=True, verbose_name='Дата подписки'),
+        ),
+        migrations.AlterField(
+            model_name='follow',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, null=True, verbose_name='Дата подписки'),
+        ),
+    ]
@@ -11,11 +11,13 @@ class Group(models.Model):
     slug = models.SlugField(unique=True,
                             verbose_name='Короткая ссылка')
     description = models.TextField(verbose_name='Описание группы')
+    posts_count = models.PositiveIntegerField('Число постов', default=0,
+                                              editable=False)
+    last_post_date = models.DateTimeField('Последняя публикация',
+                                          null=True, blank=True,
+                                          editable=False)
 
     class Meta:
-        indexes = [
-            models.Index(fields=['slug'], name='slug_idx'),
-        ]
         verbose_name = 'Группа'
         verbose_name_plural = 'Группы'
 
@@ -26,11 +28,13 @@ class Group(models.Model):
 class Post(CreatedModel):
     text = models.TextField(verbose_name='Текст поста',
                             help_text='Напишите ваш пост в этом окне')
+    # Одиночные индексы по автору и группе покрыты составными из Meta
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='posts',
-        verbose_name='Автор поста'
+        verbose_name='Автор поста',
+        db_index=False
     )
     group = models.ForeignKey(
         Group,
@@ -38,6 +42,7 @@ class Post(CreatedModel):
         on_delete=models.SET_NULL,
         blank=True,
         null=True,
+        db_index=False,
         verbose_name='Группа',
         help_text='Группа, к которой относится пост'
     )
@@ -46,11 +51,28 @@ class Post(CreatedModel):
         upload_to='posts/',
         blank=True
     )
+    # Размеры записываются при загрузке через форму,
+    # чтобы не открывать файл картинки при каждом показе
+    image_width = models.PositiveIntegerField('Ширина картинки', null=True,
+                                              blank=True, editable=False)
+    image_height = models.PositiveIntegerField('Высота картинки', null=True,
+                                               blank=True, editable=False)
     # Аргумент upload_to указывает директорию,
     # в которую будут загружаться пользовательские файлы.
 
     class Meta:
         ordering = ['-pub_date']
+        # Ленты фильтруют по автору или группе и сортируют по дате:
+        # каждая страница — проход по диапазону индекса без сортировки.
+        # Индекс по возрастанию, читаемый с конца, даёт и порядок
+        # (-pub_date, -id) курсорной пагинации
+        indexes = [
+            models.Index(fields=['pub_date'], name='post_date_idx'),
+            models.Index(fields=['author', 'pub_date'],
+                         name='post_author_date_idx'),
+            models.Index(fields=['group', 'pub_date'],
+                         name='post_group_date_idx'),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -64,7 +86,8 @@ class Comment(CreatedModel):
         related_name='comments',
         on_delete=models.SET_NULL,
         null=True,
-        blank=True
+        blank=True,
+        db_index=False
     )
     author = models.ForeignKey(
         User,
@@ -76,6 +99,10 @@ class Comment(CreatedModel):
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['post', 'pub_date'],
+                         name='comment_post_date_idx'),
+        ]
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
@@ -86,14 +113,136 @@ class Comment(CreatedModel):
 class Follow(models.Model):
     """Модель подписчиков
     """
+    # Индекс по подписчику покрыт уникальным (user, author)
     user = models.ForeignKey(User,
                              on_delete=models.CASCADE,
-                             related_name='follower')
+                             related_name='follower',
+                             db_index=False)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='following')
+    # По дате отписка снимает вклад подписки в рейтинг популярных постов;
+    # у подписок, созданных до появления поля, её нет
+    created = models.DateTimeField('Дата подписки', auto_now_add=True,
+                                   null=True)
 
     class Meta:
-        models.UniqueConstraint(fields=['user', 'author'],
-                                name='subscribe_unique')
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='subscribe_unique'),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Счётчики автора, чтобы не считать COUNT(*) на каждой странице."""
+    user = models.OneToOneField(User,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='stats')
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField('Число подписчиков',
+                                                  default=0)
+    following_count = models.PositiveIntegerField('Число подписок',
+                                                  default=0)
+
+    class Meta:
+        verbose_name = 'Счётчики автора'
+        verbose_name_plural = 'Счётчики авторов'
+
+    def __str__(self):
+        return str(self.user)
+
+
+class SearchTerm(models.Model):
+    """Обратный индекс по тексту постов для баз без полнотекстового поиска.
+
+    На SQLite вместо него работает виртуальная таблица FTS5.
+    """
+    term = models.CharField('Слово', max_length=64)
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='search_terms')
+    weight = models.PositiveIntegerField('Число вхождений', default=1)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['term', 'post'], name='search_term_idx'),
+        ]
+        verbose_name = 'Слово поиска'
+        verbose_name_plural = 'Слова поиска'
+
+
+class TimelineEntry(models.Model):
+    """Материализованная лента подписок пользователя.
+
+    Заполняется при публикации поста (fan-out on write), поэтому
+    лента читается одним проходом по индексу (user, pub_date).
+    """
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='timeline')
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='timeline_entries')
+    author = models.ForeignKey(User,
+                               on_delete=models.CASCADE,
+                               related_name='+')
+    pub_date = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        ordering = ['-pub_date']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='timeline_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date'],
+                         name='timeline_user_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='timeline_user_author_idx'),
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+
+
+class PostScore(models.Model):
+    """Популярность поста с затуханием во времени (см. posts/popular.py).
+
+    Хранится как log2 суммы весов событий, поэтому порядок по rank со
+    временем не меняется и пересчитывать его не нужно.
+    """
+    post = models.OneToOneField(Post,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='score')
+    rank = models.FloatField('Рейтинг')
+
+    class Meta:
+        # По возрастанию: обратный проход по нему отдаёт rank DESC, pk DESC
+        indexes = [
+            models.Index(fields=['rank'], name='post_score_rank_idx'),
+        ]
+        verbose_name = 'Рейтинг поста'
+        verbose_name_plural = 'Рейтинги постов'
+
+
+class ImportProgress(models.Model):
+    """Докуда дочитан файл импорта.
+
+    Обновляется в одной транзакции с пачкой строк, поэтому прерванный
+    импорт продолжается с первой незаписанной строки.
+    """
+    source = models.CharField('Источник', max_length=255, unique=True)
+    offset = models.BigIntegerField('Позиция в файле', default=0)
+    lines = models.PositiveIntegerField('Прочитано строк', default=0)
+    imported = models.PositiveIntegerField('Принято строк', default=0)
+    skipped = models.PositiveIntegerField('Пропущено строк', default=0)
+    updated = models.DateTimeField('Обновлено', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Прогресс импорта'
+        verbose_name_plural = 'Прогресс импорта'
+
+    def __str__(self):
+        return self.source
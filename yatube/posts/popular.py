@@ -0,0 +1,137 @@
+"""Популярные посты: рейтинг по комментариям и подпискам с затуханием.
+
+Событие в момент t добавляет к сумме поста вес 2^(t / HALF_LIFE): чем
+свежее событие, тем больше вклад, а доли старых событий тают вдвое за
+HALF_LIFE. Все суммы «стареют» одинаково, поэтому порядок постов со
+временем не меняется и событие обновляет одну строку PostScore, без
+GROUP BY по комментариям. Сумма хранится как log2, иначе float
+переполнился бы через тысячу периодов.
+
+Комментарии и подписки засчитываются сразу: событие — чтение и запись
+одной строки PostScore, так что рейтинг не зависит от того, запущен ли
+воркер. Полный пересчёт выполняет команда recount_popular.
+"""
+import math
+from datetime import timedelta
+
+from django.db import transaction
+
+from core.cache import bump
+from .models import Comment, Post, PostScore
+from .utils import popular_name
+
+HALF_LIFE = timedelta(hours=24).total_seconds()
+COMMENT_WEIGHT = 1
+# Подписка на автора засчитывается его последнему посту
+FOLLOW_WEIGHT = 3
+
+
+def event_rank(moment, weight):
+    """log2 вклада события."""
+    return moment.timestamp() / HALF_LIFE + math.log2(weight)
+
+
+def _add(rank, other):
+    """log2(2^rank + 2^other) без переполнения."""
+    high, low = max(rank, other), min(rank, other)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def _subtract(rank, other):
+    """log2(2^rank - 2^other) или None, если от суммы ничего не осталось."""
+    if other >= rank - 1e-9:
+        return None
+    return rank + math.log2(1 - 2 ** (other - rank))
+
+
+@transaction.atomic
+def add_events(events):
+    """Засчитывает события [(id поста, момент, вес)] одной пачкой.
+
+    Отрицательный вес отменяет засчитанное ранее событие.
+    """
+    changes = {}
+    for post_id, moment, weight in events:
+        changes.setdefault(post_id, []).append((moment, weight))
+    if not changes:
+        return
+    scores = PostScore.objects.select_for_update().in_bulk(list(changes))
+    created, updated, emptied = [], [], []
+    for post_id, post_events in changes.items():
+        score = scores.get(post_id)
+        rank = score and score.rank
+        for moment, weight in post_events:
+            if weight > 0:
+                other = event_rank(moment, weight)
+                rank = other if rank is None else _add(rank, other)
+            elif rank is not None:
+                rank = _subtract(rank, event_rank(moment, -weight))
+        if score is None:
+            if rank is not None:
+                created.append(PostScore(post_id=post_id, rank=rank))
+        elif rank is None:
+            emptied.append(post_id)
+        else:
+            score.rank = rank
+            updated.append(score)
+    # Гонка двух первых событий поста теряет одно: для рейтинга не страшно
+    PostScore.objects.bulk_create(created, ignore_conflicts=True)
+    PostScore.objects.bulk_update(updated, ['rank'])
+    PostScore.objects.filter(pk__in=emptied).delete()
+    bump(popular_name())
+
+
+def comment_added(comment, delta=1):
+    # Комментарий удалённого поста уже не в рейтинге: строка PostScore
+    # удалена вместе с постом
+    if comment.post_id:
+        add_events([(comment.post_id, comment.pub_date,
+                     COMMENT_WEIGHT * delta)])
+
+
+def follow_added(follow, delta=1):
+    """Засчитывает подписку последнему посту автора на момент подписки.
+
+    Отписка с той же датой и отрицательным весом снимает вклад с того
+    же поста.
+    """
+    if follow.created is None:
+        # Подписка старше поля created: её вклад давно затух
+        return
+    post_id = (Post.objects.filter(author=follow.author_id,
+                                   pub_date__lte=follow.created)
+               .order_by('-pub_date').values_list('pk', flat=True).first())
+    if post_id:
+        add_events([(post_id, follow.created, FOLLOW_WEIGHT * delta)])
+
+
+def popular_posts():
+    """Посты с рейтингом, самые популярные сверху."""
+    return (Post.objects.select_related('author', 'group')
+            .filter(score__rank__isnull=False)
+            # -score — это posts_postscore.post_id: весь порядок берётся
+            # из индекса по rank без сортировки
+            .order_by('-score__rank', '-score'))
+
+
+@transaction.atomic
+def rebuild(since):
+    """Пересчитывает рейтинги по комментариям начиная с since.
+
+    Подписки в пересчёт не попадают: их вклад всё равно затухает за
+    несколько периодов. Комментарии удалённых постов пропускаются.
+    """
+    ranks = {}
+    comments = (Comment.objects.filter(pub_date__gte=since,
+                                       post__isnull=False)
+                .values_list('post', 'pub_date').iterator())
+    for post_id, pub_date in comments:
+        rank = event_rank(pub_date, COMMENT_WEIGHT)
+        ranks[post_id] = (_add(ranks[post_id], rank) if post_id in ranks
+                          else rank)
+    PostScore.objects.all().delete()
+    PostScore.objects.bulk_create(
+        [PostScore(post_id=post_id, rank=rank)
+         for post_id, rank in ranks.items()])
+    bump(popular_name())
+    return len(ranks)
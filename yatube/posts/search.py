@@ -0,0 +1,84 @@
+import re
+from collections import Counter
+from functools import lru_cache
+
+from django.db import connection
+from django.db.models import Count, Sum
+from django.db.models.expressions import RawSQL
+
+from .models import Post, SearchTerm
+
+FTS_TABLE = 'posts_post_fts'
+MAX_TERMS = 10
+WORD_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Слова текста в нижнем регистре, как их режет unicode61 в FTS5."""
+    return [word[:SearchTerm._meta.get_field('term').max_length]
+            for word in WORD_RE.findall(text.lower())]
+
+
+@lru_cache(maxsize=None)
+def _has_fts_table(vendor, name):
+    return (vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names())
+
+
+def uses_fts():
+    return _has_fts_table(connection.vendor,
+                          connection.settings_dict['NAME'])
+
+
+def _fts_query(terms):
+    # Каждое слово в кавычках — пользовательский ввод не станет
+    # синтаксисом FTS5
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def _terms(query):
+    return list(dict.fromkeys(tokenize(query)))[:MAX_TERMS]
+
+
+def search_posts(query):
+    """Посты со всеми словами запроса, самые релевантные сверху."""
+    terms = _terms(query)
+    posts = Post.objects.select_related('author', 'group')
+    if not terms:
+        return posts.none()
+    if uses_fts():
+        return posts.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = posts_post.id',
+                   f'{FTS_TABLE} MATCH %s'],
+            params=[_fts_query(terms)],
+            select={'rank': f'bm25({FTS_TABLE})'},
+            order_by=['rank', '-pub_date'])
+    return (posts.filter(search_terms__term__in=terms)
+            .annotate(matched=Count('search_terms'),
+                      rank=Sum('search_terms__weight'))
+            .filter(matched=len(terms))
+            .order_by('-rank', '-pub_date'))
+
+
+def matching_ids(query):
+    """Подзапрос с id подходящих постов — для фильтра в админке."""
+    terms = _terms(query)
+    if not terms:
+        return Post.objects.none().values('pk')
+    if uses_fts():
+        return RawSQL(f'SELECT rowid FROM {FTS_TABLE} '
+                      f'WHERE {FTS_TABLE} MATCH %s', (_fts_query(terms),))
+    return (SearchTerm.objects.filter(term__in=terms)
+            .values('post').annotate(matched=Count('term'))
+            .filter(matched=len(terms)).values('post'))
+
+
+def index_post(post):
+    """Перестраивает слова поста в запасном индексе."""
+    if uses_fts():
+        return
+    SearchTerm.objects.filter(post=post).delete()
+    SearchTerm.objects.bulk_create(
+        [SearchTerm(term=term, post=post, weight=weight)
+         for term, weight in Counter(tokenize(post.text)).items()])
@@ -0,0 +1,158 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from core.cache import bump
+from . import counters, popular, search, timeline
+from .models import AuthorStats, Comment, Follow, Group, Post
+from .utils import (author_name, feed_name, follows_name, following_name,
+                    group_name, groups_name, popular_name, post_feeds,
+                    post_name)
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def create_author_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        AuthorStats.objects.create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_group(sender, instance, raw=False, **kwargs):
+    # Группа до сохранения нужна, чтобы перенести счётчик постов
+    if instance.pk and not raw:
+        instance._old_group_id = (Post.objects.filter(pk=instance.pk)
+                                  .values_list('group', flat=True).first())
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.post_added(instance)
+        return
+    old_group_id = getattr(instance, '_old_group_id', instance.group_id)
+    if old_group_id != instance.group_id:
+        counters.post_moved(instance, old_group_id)
+
+
+@receiver(post_save, sender=Post)
+def index_post_text(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.post_added(instance, delta=-1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_feeds(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    feeds = post_feeds(instance)
+    old_group_id = getattr(instance, '_old_group_id', None)
+    if old_group_id and old_group_id != instance.group_id:
+        feeds += [feed_name(group=old_group_id), groups_name()]
+    bump(*feeds)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.follow_added(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    timeline.prune(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    counters.follow_added(instance, delta=-1)
+    timeline.follower_removed(instance.author_id)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_post_page(sender, instance, raw=False, **kwargs):
+    if instance.post_id and not raw:
+        bump(post_name(instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_followers(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump(follows_name(instance.author_id),
+             following_name(instance.user_id))
+
+
+@receiver(post_save, sender=Comment)
+def score_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        popular.comment_added(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def unscore_comment(sender, instance, **kwargs):
+    popular.comment_added(instance, delta=-1)
+
+
+@receiver(post_save, sender=Follow)
+def score_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        popular.follow_added(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def unscore_follow(sender, instance, **kwargs):
+    popular.follow_added(instance, delta=-1)
+
+
+def _feeds_showing(posts):
+    """Имена поколений лент, где показаны карточки постов posts."""
+    shown = set(posts.values_list('author', 'group').distinct())
+    return [feed_name(), popular_name(),
+            *{feed_name(author=author) for author, _ in shown},
+            *{feed_name(group=group) for _, group in shown if group}]
+
+
+@receiver(post_save, sender=Group)
+# До удаления: потом у постов группы уже не будет
+@receiver(pre_delete, sender=Group)
+def invalidate_group_feed(sender, instance, raw=False, **kwargs):
+    # Название и описание группы показываются на её странице, а число
+    # групп — в страницах каталога. Ссылка на группу есть в карточках
+    # её постов на всех лентах
+    if not raw:
+        bump(groups_name(), group_name(instance.pk),
+             *_feeds_showing(Post.objects.filter(group=instance.pk)))
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_cards(sender, instance, created, raw=False,
+                            update_fields=None, **kwargs):
+    # Вход обновляет только last_login, которого в карточках нет
+    if created or raw or update_fields == frozenset({'last_login'}):
+        return
+    bump(author_name(instance.pk),
+         *_feeds_showing(Post.objects.filter(author=instance.pk)))
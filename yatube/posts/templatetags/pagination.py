@@ -0,0 +1,11 @@
+from django import template
+
+from posts import utils
+
+register = template.Library()
+
+
+@register.simple_tag
+def page_window(page):
+    """Номера страниц для ссылок; None — место пропуска."""
+    return utils.page_window(page)
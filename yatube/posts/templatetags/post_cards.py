@@ -0,0 +1,12 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts.cards import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts):
+    """Карточки страницы постов из кеша, недостающие — отрисовкой."""
+    return [mark_safe(card) for card in render_cards(posts)]
@@ -0,0 +1,12 @@
+from django import template
+
+from posts.thumbnails import cached_thumbnail
+
+register = template.Library()
+
+
+@register.inclusion_tag('posts/includes/thumbnail.html')
+def post_thumbnail(post):
+    """Миниатюра поста, если она готова, иначе заглушка."""
+    return {'post': post,
+            'thumbnail': cached_thumbnail(post.image)}
@@ -0,0 +1,87 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.sessions.models import Session
+from django.core.management import CommandError, call_command
+from django.db.models import Max, Min
+from django.test import TestCase
+
+from ..models import (AuthorStats, Comment, Follow, Group, Post,
+                      TimelineEntry, User)
+
+
+class SeedAndBenchmarkTest(TestCase):
+    def test_seed_data(self):
+        """seed_data создаёт данные и приводит в порядок производные"""
+        call_command('seed_data', users=30, groups=3, posts=200,
+                     comments=50, follows=4, seed=1, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Comment.objects.count(), 50)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(TimelineEntry.objects.exists())
+        top = AuthorStats.objects.order_by('-posts_count').first()
+        self.assertEqual(top.posts_count,
+                         Post.objects.filter(author=top.user).count())
+
+    def test_seed_data_validates_arguments(self):
+        """Посты без пользователей и отрицательные числа — ошибка"""
+        for options in ({'users': 0, 'posts': 5}, {'comments': -1}):
+            with self.subTest(options=options), \
+                    self.assertRaises(CommandError):
+                call_command('seed_data', stdout=StringIO(), **options)
+        self.assertFalse(User.objects.exists())
+
+    def test_seed_data_keeps_dates(self):
+        """Даты постов разбросаны по периоду, а не равны времени вставки"""
+        call_command('seed_data', users=5, groups=0, posts=30, comments=10,
+                     follows=1, days=30, seed=3, stdout=StringIO())
+        for model in (Post, Comment):
+            with self.subTest(model=model.__name__):
+                dates = model.objects.aggregate(first=Min('pub_date'),
+                                                last=Max('pub_date'))
+                self.assertGreater(dates['last'] - dates['first'],
+                                   timedelta(days=1))
+        field = Post._meta.get_field('pub_date')
+        self.assertTrue(field.auto_now_add)
+
+    def test_benchmark_saves_and_compares(self):
+        """benchmark_views сохраняет базовый прогон и не меняет данные"""
+        call_command('seed_data', users=20, groups=2, posts=50,
+                     comments=20, follows=3, seed=2, stdout=StringIO())
+        posts = Post.objects.count()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            call_command('benchmark_views', requests=2, output=path,
+                         seed=1, stdout=StringIO())
+            with open(path) as baseline:
+                views = json.load(baseline)['views']
+            out = StringIO()
+            call_command('benchmark_views', requests=2, compare=path,
+                         views=['index'], stdout=out)
+        self.assertEqual(set(views['index']),
+                         {'p50_ms', 'p95_ms', 'p99_ms', 'queries',
+                          'queries_avg', 'peak_kb'})
+        self.assertIn('Сравнение', out.getvalue())
+        self.assertEqual(Post.objects.count(), posts)
+
+    def test_feeds_use_indexes(self):
+        """Запросы лент идут по индексам без полных проходов и сортировок"""
+        call_command('seed_data', users=20, groups=2, posts=100,
+                     comments=50, follows=3, seed=3, stdout=StringIO())
+        out = StringIO()
+        call_command('explain_views', stdout=out)
+        self.assertNotIn('полный проход', out.getvalue())
+        self.assertNotIn('сортировка', out.getvalue())
+
+    def test_explain_leaves_no_login(self):
+        """explain_views не оставляет в базе сессию и время входа"""
+        call_command('seed_data', users=5, groups=1, posts=10, comments=5,
+                     follows=2, seed=4, stdout=StringIO())
+        call_command('explain_views', stdout=StringIO())
+        self.assertFalse(Session.objects.exists())
+        self.assertFalse(User.objects.filter(
+            last_login__isnull=False).exists())
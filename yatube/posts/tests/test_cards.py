@@ -0,0 +1,121 @@
+from io import StringIO
+
+from django.contrib.auth.models import update_last_login
+from django.core.cache import cache
+from django.core.management import call_command
+from django.urls import reverse
+
+from core.cache import bump, generations
+from . import TestCaseWithTmpMedia
+from .test_thumbnails import image_file
+from ..cards import render_cards
+from ..models import Group, Post, User
+from ..utils import feed_name, popular_name
+
+
+class PostCardsTest(TestCaseWithTmpMedia):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='NoName',
+                                       first_name='Лев', last_name='Толстой')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        for i in range(3):
+            Post.objects.create(author=cls.user, group=cls.group,
+                                text=f'Пост {i}')
+
+    def setUp(self):
+        cache.clear()
+
+    def posts(self):
+        return list(Post.objects.select_related('author', 'group'))
+
+    def test_cached_cards(self):
+        """Карточки отрисовываются один раз, пока пост не изменится"""
+        first = render_cards(self.posts())
+        self.assertIn('Лев Толстой', first[0])
+        # update() не трогает updated_at: карточка берётся из кеша
+        Post.objects.update(text='Изменено в обход модели')
+        self.assertEqual(render_cards(self.posts()), first)
+        post = Post.objects.latest('pk')
+        post.text = 'Новый текст'
+        post.save()
+        cards = render_cards(self.posts())
+        self.assertIn('Новый текст', cards[0])
+        self.assertEqual(cards[1:], first[1:])
+
+    def test_author_and_group_changes(self):
+        """Правка автора или группы сбрасывает их карточки"""
+        render_cards(self.posts())
+        user = User.objects.get(pk=self.user.pk)
+        update_last_login(None, user)
+        self.assertIn('Лев Толстой', render_cards(self.posts())[0])
+        user.first_name = 'Алексей'
+        user.save()
+        self.assertIn('Алексей Толстой', render_cards(self.posts())[0])
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'renamed'
+        group.save()
+        self.assertIn(reverse('posts:group_list', args=('renamed',)),
+                      render_cards(self.posts())[0])
+
+    def test_pages_show_renamed_author_and_group(self):
+        """Ленты показывают новое имя автора и ссылку группы сразу"""
+        self.client.force_login(self.user)
+        pages = (reverse('posts:index'),
+                 reverse('posts:profile', args=(self.user.username,)),
+                 reverse('posts:group_list', args=(self.group.slug,)))
+        for url in pages:
+            self.client.get(url)
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'Алексей'
+        user.save()
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'renamed'
+        group.save()
+        pages = pages[:2] + (reverse('posts:group_list', args=('renamed',)),)
+        for url in pages:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'Алексей Толстой')
+                self.assertContains(
+                    response, reverse('posts:group_list', args=('renamed',)))
+
+    def test_author_and_group_changes_reset_feeds(self):
+        """Правка автора или группы сдвигает поколения лент с их постами"""
+        names = (feed_name(), popular_name(), feed_name(author=self.user.pk),
+                 feed_name(group=self.group.pk))
+        before = generations(*names)
+        user = User.objects.get(pk=self.user.pk)
+        user.last_name = 'Т.'
+        user.save()
+        after_user = generations(*names)
+        for name, old, new in zip(names, before, after_user):
+            with self.subTest(name=name, change='user'):
+                self.assertNotEqual(old, new)
+        Group.objects.get(pk=self.group.pk).delete()
+        for name, old, new in zip(names, after_user, generations(*names)):
+            with self.subTest(name=name, change='group'):
+                self.assertNotEqual(old, new)
+
+    def test_thumbnail_placeholder_not_cached(self):
+        """Карточка с заглушкой обновляется, когда миниатюра готова"""
+        Post.objects.create(author=self.user, text='С картинкой',
+                            image=image_file())
+        self.assertIn('Изображение обрабатывается',
+                      render_cards(self.posts())[0])
+        call_command('generate_thumbnails', stdout=StringIO())
+        self.assertIn('width="400" height="400"',
+                      render_cards(self.posts())[0])
+
+    def test_page_reads_cards_from_cache(self):
+        """Страница с прогретыми карточками не отрисовывает их заново"""
+        url = reverse('posts:group_list', args=(self.group.slug,))
+        self.client.get(url)
+        Post.objects.update(text='Изменено в обход модели')
+        # Сбрасываем кеш страницы для анонимов, но не карточек
+        bump(feed_name(group=self.group.pk))
+        response = self.client.get(url)
+        self.assertContains(response, 'Пост 0')
+        self.assertTemplateNotUsed(response, 'posts/includes/post_card.html')
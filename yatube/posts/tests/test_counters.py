@@ -0,0 +1,114 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from ..models import AuthorStats, Follow, Group, Post, User
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='NoName')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(title='Группа 1', slug='one',
+                                         description='Первая')
+        cls.other_group = Group.objects.create(title='Группа 2', slug='two',
+                                               description='Вторая')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def assertCounts(self, user, **expected):
+        stats = AuthorStats.objects.get(user=user)
+        for field, value in expected.items():
+            with self.subTest(field=field):
+                self.assertEqual(getattr(stats, field), value)
+
+    def test_post_counters(self):
+        """Счётчики постов следуют за созданием, сменой группы и удалением"""
+        self.authorized_client.post(reverse('posts:post_create'),
+                                    data={'text': 'Пост',
+                                          'group': self.group.id})
+        post = Post.objects.get(text='Пост')
+        self.assertCounts(self.user, posts_count=1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        self.authorized_client.post(
+            reverse('posts:post_edit', args=(post.id,)),
+            data={'text': 'Пост', 'group': self.other_group.id})
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+        post.refresh_from_db()
+        post.delete()
+        self.assertCounts(self.user, posts_count=0)
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.other_group.posts_count, 0)
+
+    def test_follow_counters(self):
+        """Счётчики подписок следуют за подпиской и отпиской"""
+        self.authorized_client.get(
+            reverse('posts:profile_follow', args=(self.reader.username,)))
+        self.assertCounts(self.user, following_count=1)
+        self.assertCounts(self.reader, followers_count=1)
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', args=(self.reader.username,)))
+        self.assertCounts(self.user, following_count=0)
+        self.assertCounts(self.reader, followers_count=0)
+
+    def test_recount_stats_repairs(self):
+        """Команда recount_stats чинит разошедшиеся счётчики"""
+        Post.objects.bulk_create([Post(text='Пост', author=self.user,
+                                       group=self.group)
+                                  for _ in range(3)])
+        Follow.objects.create(user=self.reader, author=self.user)
+        AuthorStats.objects.filter(user=self.reader).delete()
+        AuthorStats.objects.filter(user=self.user).update(followers_count=7)
+        call_command('recount_stats', stdout=StringIO())
+        self.assertCounts(self.user, posts_count=3, followers_count=1)
+        self.assertCounts(self.reader, following_count=1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 3)
+        self.assertIsNotNone(self.group.last_post_date)
+
+    def test_pages_without_stats_row(self):
+        """Автор без строки счётчиков не роняет профиль и страницу поста"""
+        author, = User.objects.bulk_create([User(username='imported')])
+        author = User.objects.get(username='imported')
+        post = Post.objects.create(author=author, text='Пост')
+        AuthorStats.objects.filter(user=author).delete()
+        for url in (reverse('posts:profile', args=(author.username,)),
+                    reverse('posts:post_detail', args=(post.id,))):
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'постов')
+        response = self.authorized_client.get(
+            reverse('posts:profile', args=(author.username,)))
+        self.assertEqual(response.context['author'].stats.posts_count, 1)
+
+    def test_group_last_post_date(self):
+        """Дата последнего поста группы следует за постами"""
+        first = Post.objects.create(text='Первый', author=self.user,
+                                    group=self.group)
+        second = Post.objects.create(text='Второй', author=self.user,
+                                     group=self.group)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.last_post_date, second.pub_date)
+        # Перенос последнего поста возвращает дату предыдущего
+        self.authorized_client.post(
+            reverse('posts:post_edit', args=(second.id,)),
+            data={'text': 'Второй', 'group': self.other_group.id})
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.last_post_date, first.pub_date)
+        self.assertEqual(self.other_group.last_post_date, second.pub_date)
+        first.delete()
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertIsNone(self.group.last_post_date)
@@ -0,0 +1,63 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from ..digest import POSTS_PER_AUTHOR, digests
+from ..models import Follow, Post, User
+
+
+class DigestTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.busy = User.objects.create(username='busy', first_name='Лев',
+                                       last_name='Толстой')
+        cls.quiet = User.objects.create(username='quiet')
+        cls.idle = User.objects.create(username='idle')
+        cls.readers = [User.objects.create(username=f'reader{i}',
+                                           email=f'reader{i}@example.com')
+                       for i in range(3)]
+        cls.no_email = User.objects.create(username='no_email')
+        for reader in (*cls.readers, cls.no_email):
+            for author in (cls.quiet, cls.busy, cls.idle):
+                Follow.objects.create(user=reader, author=author)
+        for i in range(POSTS_PER_AUTHOR + 2):
+            Post.objects.create(author=cls.busy, text=f'Пост {i}')
+        Post.objects.create(author=cls.quiet, text='Единственный пост')
+        old = Post.objects.create(author=cls.idle, text='Старый пост')
+        Post.objects.filter(pk=old.pk).update(
+            pub_date=timezone.now() - timedelta(days=3))
+
+    def setUp(self):
+        self.since = timezone.now() - timedelta(days=1)
+
+    def test_digest_entries(self):
+        """Авторы с новыми постами, самые активные сверху"""
+        chunk, = digests(self.since)
+        self.assertEqual([user for user, _ in chunk], self.readers)
+        user, entries = chunk[0]
+        self.assertEqual([(author, count) for author, count, _ in entries],
+                         [(self.busy, POSTS_PER_AUTHOR + 2), (self.quiet, 1)])
+        self.assertEqual([post['text'] for post in entries[0][2]],
+                         [f'Пост {i}' for i in range(POSTS_PER_AUTHOR + 1,
+                                                     1, -1)])
+
+    def test_chunks(self):
+        """Подписчики обходятся пачками без повторов"""
+        chunks = list(digests(self.since, chunk_size=2))
+        self.assertEqual([[user for user, _ in chunk] for chunk in chunks],
+                         [self.readers[:2], self.readers[2:]])
+
+    def test_command_sends_digests(self):
+        """Команда отправляет по письму каждому подписчику с почтой"""
+        call_command('send_digests', stdout=StringIO())
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox),
+                         [reader.email for reader in self.readers])
+        body = mail.outbox[0].body
+        self.assertIn('Лев Толстой — новых постов: 5', body)
+        self.assertIn(f'/posts/{Post.objects.get(text="Пост 4").pk}/', body)
+        self.assertNotIn('Старый пост', body)
@@ -0,0 +1,62 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from ..directory import PREVIEW_SIZE
+from ..models import Group, Post, User
+
+
+class GroupDirectoryTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='NoName')
+        cls.groups = [Group.objects.create(title=f'Группа {i}',
+                                           slug=f'group-{i}',
+                                           description='Описание')
+                      for i in range(5)]
+        for group in cls.groups[1:]:
+            for i in range(PREVIEW_SIZE + 2):
+                Post.objects.create(author=cls.user, group=group,
+                                    text=f'Пост {i} в {group.slug}')
+        cls.empty = cls.groups[0]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_directory(self):
+        """Каталог показывает счётчики и последние посты групп"""
+        response = self.client.get(reverse('posts:group_index'))
+        groups = list(response.context['page_obj'])
+        # Недавно писавшие группы сверху, пустая — в конце
+        self.assertEqual(groups[0], self.groups[-1])
+        self.assertEqual(groups[-1], self.empty)
+        latest = groups[0]
+        self.assertEqual(latest.posts_count, PREVIEW_SIZE + 2)
+        self.assertEqual([post.text for post in latest.preview],
+                         [f'Пост {i} в {latest.slug}'
+                          for i in range(PREVIEW_SIZE + 1, 1, -1)])
+        self.assertEqual(groups[-1].preview, [])
+        self.assertContains(response, reverse('posts:group_list',
+                                              args=(latest.slug,)))
+
+    def test_constant_queries(self):
+        """Число запросов не зависит от числа групп и постов"""
+        with self.assertNumQueries(4):
+            self.client.get(reverse('posts:group_index'))
+        for i in range(5, 15):
+            group = Group.objects.create(title=f'Группа {i}',
+                                         slug=f'group-{i}',
+                                         description='Описание')
+            Post.objects.create(author=self.user, group=group, text='Пост')
+        cache.clear()
+        with self.assertNumQueries(4):
+            self.client.get(reverse('posts:group_index'))
+
+    def test_new_post_invalidates(self):
+        """Новый пост в группе сразу виден в каталоге"""
+        self.client.get(reverse('posts:group_index'))
+        Post.objects.create(author=self.user, group=self.empty,
+                            text='Первый пост')
+        response = self.client.get(reverse('posts:group_index'))
+        self.assertEqual(list(response.context['page_obj'])[0], self.empty)
@@ -0,0 +1,84 @@
+import csv
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create(username='admin', is_staff=True)
+        cls.user = User.objects.create(username='NoName')
+        cls.group = Group.objects.create(title='Группа', slug='export',
+                                         description='Описание')
+        cls.post = Post.objects.create(author=cls.user, group=cls.group,
+                                       text='Пост в группе')
+        Post.objects.create(author=cls.user, text='Пост без группы')
+        Comment.objects.create(post=cls.post, author=cls.admin,
+                               text='Ответ')
+        Follow.objects.create(user=cls.admin, author=cls.user)
+
+    def setUp(self):
+        self.staff_client = Client()
+        self.staff_client.force_login(self.admin)
+
+    def fetch(self, kind, **params):
+        response = self.staff_client.get(
+            reverse('posts:export', args=(kind,)), params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_posts_by_group(self):
+        """Посты группы выгружаются построчно в NDJSON"""
+        rows = [json.loads(line) for line in
+                self.fetch('posts', group=self.group.slug).splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['text'], 'Пост в группе')
+        self.assertEqual(rows[0]['author'], self.user.username)
+
+    def test_csv_follows(self):
+        """Граф подписок выгружается в CSV с заголовком"""
+        rows = list(csv.reader(io.StringIO(self.fetch('follows',
+                                                      format='csv'))))
+        self.assertEqual(rows, [['user', 'author'],
+                                [self.admin.username, self.user.username]])
+
+    def test_only_staff(self):
+        """Выгрузка доступна только персоналу"""
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse('posts:export', args=('posts',)))
+        self.assertEqual(response.status_code, 302)
+
+    def test_bad_filters(self):
+        """Неверная дата и лишний фильтр — ошибка 400, неизвестный тип — 404"""
+        response = self.staff_client.get(
+            reverse('posts:export', args=('posts',)), {'since': 'вчера'})
+        self.assertEqual(response.status_code, 400)
+        for name, value in (('since', '2020-01-01'), ('group', 'slug')):
+            with self.subTest(name=name):
+                response = self.staff_client.get(
+                    reverse('posts:export', args=('follows',)),
+                    {name: value})
+                self.assertEqual(response.status_code, 400)
+        response = self.staff_client.get(
+            reverse('posts:export', args=('users',)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_command_writes_file(self):
+        """Команда export_data пишет выгрузку в файл"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'comments.ndjson')
+            call_command('export_data', 'comments', output=path)
+            with open(path, encoding='utf-8') as file:
+                rows = [json.loads(line) for line in file]
+        self.assertEqual([row['text'] for row in rows], ['Ответ'])
+        self.assertEqual(rows[0]['post'], self.post.pk)
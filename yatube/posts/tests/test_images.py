@@ -0,0 +1,91 @@
+import warnings
+from io import BytesIO
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client
+from django.urls import reverse
+from PIL import Image, PngImagePlugin
+
+from . import TestCaseWithTmpMedia
+from .. import images
+from ..models import Post, User
+
+
+def photo(size, exif=True):
+    buffer = BytesIO()
+    image = Image.new('RGB', size, 'green')
+    if exif:
+        data = image.getexif()
+        data[0x010f] = 'Camera'
+        image.save(buffer, 'JPEG', exif=data.tobytes())
+    else:
+        image.save(buffer, 'JPEG')
+    return SimpleUploadedFile('photo.jpg', buffer.getvalue(),
+                              content_type='image/jpeg')
+
+
+class ImageIngestTest(TestCaseWithTmpMedia):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='NoName')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_large_photo_downscaled_and_stripped(self):
+        """Большое фото уменьшается, теряет EXIF, размеры сохраняются"""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Фото', 'image': photo((3000, 1500))})
+        post = Post.objects.get(text='Фото')
+        self.assertEqual((post.image_width, post.image_height),
+                         (images.MAX_SIDE, images.MAX_SIDE // 2))
+        with Image.open(post.image) as stored:
+            self.assertEqual(stored.size, (images.MAX_SIDE,
+                                           images.MAX_SIDE // 2))
+            self.assertFalse(stored.getexif())
+
+    def test_small_clean_image_kept(self):
+        """Небольшая картинка без метаданных сохраняется как есть"""
+        upload = photo((100, 50), exif=False)
+        image, width, height = images.ingest(upload)
+        self.assertIs(image, upload)
+        self.assertEqual((width, height), (100, 50))
+
+    def test_other_metadata_stripped(self):
+        """ICC, XMP и текст PNG не сохраняются вместе с исходником"""
+        text = PngImagePlugin.PngInfo()
+        text.add_text('Author', 'Фотограф', zip=True)
+        text.add_text('XML:com.adobe.xmp', '<x:xmpmeta/>')
+        for name, options in (('icc.png', {'icc_profile': b'profile'}),
+                              ('text.png', {'pnginfo': text})):
+            with self.subTest(name=name):
+                buffer = BytesIO()
+                Image.new('RGBA', (100, 50)).save(buffer, 'PNG', **options)
+                upload = SimpleUploadedFile(name, buffer.getvalue(),
+                                            content_type='image/png')
+                image, width, height = images.ingest(upload)
+                self.assertIsNot(image, upload)
+                with Image.open(image) as stored:
+                    stored.load()
+                    self.assertEqual(set(stored.info)
+                                     - images.TECHNICAL_INFO, set())
+
+    def test_decompression_bomb_rejected(self):
+        """Слишком много точек — ошибка до декодирования"""
+        # Чуть выше предела Pillow предупреждает, вдвое выше — бросает
+        for size in ((12000, 8000), (20000, 10000)):
+            with self.subTest(size=size):
+                buffer = BytesIO()
+                Image.new('1', size).save(buffer, 'PNG')
+                upload = SimpleUploadedFile('bomb.png', buffer.getvalue(),
+                                            content_type='image/png')
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore',
+                                          Image.DecompressionBombWarning)
+                    with self.assertRaises(ValidationError) as error:
+                        images.ingest(upload)
+                self.assertEqual(error.exception.code, 'too_many_pixels')
@@ -0,0 +1,213 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.cache import generation
+from ..importer import Importer
+from ..models import (AuthorStats, Comment, Follow, Group, ImportProgress,
+                      Post, TimelineEntry, User)
+from ..utils import (feed_name, following_name, groups_name,
+                     popular_name)
+
+
+class ImportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='import',
+                                         description='Описание')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory, ignore_errors=True)
+        super().tearDownClass()
+
+    def write(self, name, rows, mode='w'):
+        path = os.path.join(self.directory, name)
+        with open(path, mode, encoding='utf-8') as file:
+            for row in rows:
+                file.write(row if isinstance(row, str)
+                           else json.dumps(row, ensure_ascii=False))
+                file.write('\n')
+        return path
+
+    def run_import(self, kind, path, **options):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_data', kind, path, stdout=out, stderr=err,
+                     **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_users_posts_follows_comments(self):
+        """Импорт создаёт строки и то, что обычно делают сигналы"""
+        self.run_import('users', self.write('users.ndjson', [
+            {'username': 'migrated', 'first_name': 'Мигрант'},
+            {'username': 'reader'},
+        ]))
+        author = User.objects.get(username='migrated')
+        self.assertTrue(AuthorStats.objects.filter(user=author).exists())
+        self.run_import('follows', self.write('follows.ndjson', [
+            {'user': 'reader', 'author': 'migrated'},
+        ]))
+        feed = generation(feed_name(group=self.group.pk))
+        self.run_import('posts', self.write('posts.ndjson', [
+            {'id': 900, 'author': 'migrated', 'group': 'import',
+             'text': 'Старый пост', 'pub_date': '2020-01-02T03:04:05'},
+        ]), keep_ids=True)
+        post = Post.objects.get(pk=900)
+        self.assertEqual((post.author, post.group), (author, self.group))
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertTrue(TimelineEntry.objects.filter(user=self.reader,
+                                                     post=post).exists())
+        self.assertNotEqual(generation(feed_name(group=self.group.pk)),
+                            feed)
+        self.assertEqual(AuthorStats.objects.get(user=author).posts_count,
+                         1)
+        self.run_import('comments', self.write('comments.ndjson', [
+            {'post': 900, 'author': 'reader', 'text': 'Перенесённый ответ'},
+        ]))
+        self.assertTrue(Comment.objects.filter(post=post,
+                                               author=self.reader).exists())
+
+    def test_invalid_rows_are_skipped(self):
+        """Строки с ошибками пропускаются с номером строки"""
+        path = self.write('posts.ndjson', [
+            {'author': 'reader', 'text': 'Годный пост'},
+            {'author': 'reader', 'text': ''},
+            {'author': 'nobody', 'text': 'Чужой пост'},
+            '{сломанный json',
+            '',
+            {'author': 'reader', 'text': 'Ещё пост', 'group': 'missing'},
+        ])
+        out, err = self.run_import('posts', path, batch_size=2)
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertIn('Строка 2: Текст поста обязателен!', err)
+        self.assertIn('Строка 3: Пользователь nobody не найден', err)
+        self.assertIn('Строка 4: Некорректный JSON', err)
+        self.assertIn('Строка 6: Группа missing не найдена', err)
+        self.assertIn('принято 1, пропущено 4', out)
+
+    def test_comment_to_missing_post(self):
+        """Комментарий к несуществующему посту не пишется"""
+        out, err = self.run_import('comments', self.write('comments.ndjson', [
+            {'post': 12345, 'author': 'reader', 'text': 'Ответ в пустоту'},
+        ]))
+        self.assertIn('Строка 1: Пост 12345 не найден', err)
+        self.assertFalse(Comment.objects.exists())
+
+    def test_self_follow(self):
+        """Подписка на самого себя отклоняется"""
+        self.run_import('follows', self.write('follows.ndjson', [
+            {'user': 'reader', 'author': 'reader'},
+        ]))
+        self.assertFalse(Follow.objects.exists())
+
+    def test_duplicates_are_not_counted(self):
+        """Дубли не считаются принятыми и попадают в отчёт"""
+        out, err = self.run_import('users', self.write('users.ndjson', [
+            {'username': 'reader'},
+            {'username': 'twin'},
+            {'username': 'twin'},
+        ]))
+        self.assertIn('принято 1, пропущено 2', out)
+        self.assertIn('Строка 1: Пользователь с таким именем уже есть', err)
+        self.assertIn('Строка 3: Пользователь с таким именем уже есть', err)
+        out, err = self.run_import('follows', self.write('follows.ndjson', [
+            {'user': 'reader', 'author': 'twin'},
+            {'user': 'reader', 'author': 'twin'},
+        ]))
+        self.assertIn('принято 1, пропущено 1', out)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_users_get_stats_in_batch(self):
+        """Счётчики авторов создаются вместе с пачкой пользователей"""
+        importer = Importer('users', keep_ids=False)
+        accepted, rejected = importer.write(
+            [(1, importer.build({'username': 'fresh'}))])
+        self.assertEqual((accepted, rejected), (1, []))
+        self.assertTrue(AuthorStats.objects.filter(
+            user__username='fresh').exists())
+
+    def test_resume_after_interruption(self):
+        """Прерванный импорт продолжается без дублей"""
+        path = self.write('posts.ndjson', [
+            {'author': 'reader', 'text': f'Пост {number}'}
+            for number in range(3)])
+        with mock.patch.object(Importer, 'after_posts',
+                               side_effect=[None, RuntimeError('сбой')]):
+            with self.assertRaises(RuntimeError):
+                self.run_import('posts', path, batch_size=1)
+        # Пачка, на которой случился сбой, откатилась вместе с позицией
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(ImportProgress.objects.get().lines, 1)
+        out, err = self.run_import('posts', path, batch_size=1)
+        self.assertIn('Продолжаем со строки 2', out)
+        self.assertEqual(sorted(Post.objects.values_list('text', flat=True)),
+                         ['Пост 0', 'Пост 1', 'Пост 2'])
+        # Дописанные в файл строки импортируются следующим запуском
+        self.write('posts.ndjson', [{'author': 'reader', 'text': 'Пост 3'}],
+                   mode='a')
+        self.run_import('posts', path)
+        self.assertEqual(Post.objects.count(), 4)
+        self.assertEqual(ImportProgress.objects.get().lines, 4)
+
+    def test_concurrent_rows_keep_their_dates(self):
+        """Чужая строка, вставленная во время импорта, не получает дату"""
+        bulk_create = Post.objects.bulk_create
+
+        def interleaved(objects, **kwargs):
+            # Запись сайта попадает между чтением последнего id и вставкой
+            Post.objects.create(author=self.reader, text='С сайта')
+            return bulk_create(objects, **kwargs)
+
+        with mock.patch.object(Post.objects, 'bulk_create',
+                               side_effect=interleaved):
+            self.run_import('posts', self.write('posts.ndjson', [
+                {'author': 'reader', 'text': 'Из архива',
+                 'pub_date': '2020-01-02T03:04:05'},
+            ]))
+        self.assertEqual(Post.objects.get(text='Из архива').pub_date.year,
+                         2020)
+        self.assertNotEqual(
+            Post.objects.get(text='С сайта').pub_date.year, 2020)
+
+    def test_only_affected_counters_are_recounted(self):
+        """Импорт пересчитывает счётчики своих авторов и групп, не все"""
+        other = User.objects.create(username='other')
+        untouched = User.objects.create(username='untouched')
+        AuthorStats.objects.filter(user=untouched).update(posts_count=7)
+        self.run_import('posts', self.write('posts.ndjson', [
+            {'author': 'reader', 'group': 'import', 'text': 'Пост'},
+        ]))
+        self.run_import('follows', self.write('follows.ndjson', [
+            {'user': 'other', 'author': 'reader'},
+        ]))
+        stats = AuthorStats.objects.get(user=self.reader)
+        self.assertEqual((stats.posts_count, stats.followers_count), (1, 1))
+        self.assertEqual(Group.objects.get(pk=self.group.pk).posts_count, 1)
+        self.assertEqual(
+            AuthorStats.objects.get(user=other).following_count, 1)
+        # Расхождение у постороннего автора чинит recount_stats, не импорт
+        self.assertEqual(
+            AuthorStats.objects.get(user=untouched).posts_count, 7)
+
+    def test_cached_pages_are_reset(self):
+        """Импорт сбрасывает популярное, каталог групп и ленту подписок"""
+        follower = User.objects.create(username='follower')
+        names = [popular_name(), groups_name(), following_name(follower.pk)]
+        before = [generation(name) for name in names]
+        self.run_import('posts', self.write('posts.ndjson', [
+            {'author': 'reader', 'group': 'import', 'text': 'Пост'},
+        ]))
+        self.run_import('follows', self.write('follows.ndjson', [
+            {'user': 'follower', 'author': 'reader'},
+        ]))
+        for name, old in zip(names, before):
+            self.assertNotEqual(generation(name), old, name)
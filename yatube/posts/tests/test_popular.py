@@ -0,0 +1,113 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import popular
+from ..models import Comment, Follow, Post, PostScore, User
+
+
+class PopularTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.old = Post.objects.create(author=cls.author, text='Старый')
+        cls.new = Post.objects.create(author=cls.author, text='Новый')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_recent_activity_wins(self):
+        """Свежий комментарий весит больше трёх позавчерашних"""
+        then = timezone.now() - timedelta(days=3)
+        popular.add_events([(self.old.pk, then, popular.COMMENT_WEIGHT)] * 3
+                           + [(self.new.pk, timezone.now(),
+                               popular.COMMENT_WEIGHT)])
+        self.assertEqual(list(popular.popular_posts()),
+                         [self.new, self.old])
+
+    def test_comments_update_score(self):
+        """Комментарий поднимает пост, удаление — отменяет вклад"""
+        comment = Comment.objects.create(post=self.old, author=self.reader,
+                                         text='Ответ')
+        # Рейтинг меняется сразу, без воркера очереди
+        first = PostScore.objects.get(post=self.old).rank
+        second = Comment.objects.create(post=self.old, author=self.reader,
+                                        text='Ещё ответ')
+        self.assertGreater(PostScore.objects.get(post=self.old).rank, first)
+        second.delete()
+        self.assertAlmostEqual(PostScore.objects.get(post=self.old).rank,
+                               first)
+        comment.delete()
+        self.assertFalse(PostScore.objects.exists())
+
+    def test_deleted_post_skipped(self):
+        """Рейтинг удалённого поста удаляется вместе с ним"""
+        post = Post.objects.create(author=self.author, text='Удалённый')
+        Comment.objects.create(post=post, author=self.reader, text='Ответ')
+        post.delete()
+        self.assertFalse(PostScore.objects.exists())
+
+    def test_follow_scores_latest_post(self):
+        """Подписка засчитывается последнему посту автора"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(list(PostScore.objects.values_list('post',
+                                                            flat=True)),
+                         [self.new.pk])
+
+    def test_unfollow_takes_score_back(self):
+        """Отписка снимает вклад подписки, повторная не копит рейтинг"""
+        for _ in range(2):
+            Follow.objects.create(user=self.reader, author=self.author)
+            self.assertTrue(PostScore.objects.filter(post=self.new).exists())
+            Follow.objects.filter(user=self.reader,
+                                  author=self.author).delete()
+            self.assertFalse(PostScore.objects.exists())
+
+    def test_rebuild_matches_incremental(self):
+        """Пересчёт с нуля даёт те же рейтинги, что и события"""
+        for post in (self.old, self.new, self.new):
+            Comment.objects.create(post=post, author=self.reader,
+                                   text='Ответ')
+        ranks = dict(PostScore.objects.values_list('post', 'rank'))
+        popular.rebuild(timezone.now() - timedelta(days=1))
+        for post, rank in PostScore.objects.values_list('post', 'rank'):
+            self.assertAlmostEqual(rank, ranks[post])
+
+    def test_rebuild_skips_orphaned_comments(self):
+        """Комментарии удалённого поста не попадают в пересчёт"""
+        post = Post.objects.create(author=self.author, text='Удалённый')
+        Comment.objects.create(post=post, author=self.reader, text='Ответ')
+        Comment.objects.create(post=self.new, author=self.reader,
+                               text='Ответ')
+        post.delete()
+        self.assertEqual(popular.rebuild(timezone.now() - timedelta(days=1)),
+                         1)
+        self.assertEqual(list(PostScore.objects.values_list('post',
+                                                            flat=True)),
+                         [self.new.pk])
+
+    def test_page(self):
+        """Лента популярного — шаблон и пагинация главной"""
+        Comment.objects.create(post=self.old, author=self.reader,
+                               text='Ответ')
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(reverse('posts:popular'))
+        self.assertTemplateUsed(response, 'posts/index.html')
+        self.assertEqual(list(response.context['page_obj']), [self.old])
+        # Выполненная задача сразу меняет ленту
+        Comment.objects.create(post=self.new, author=self.reader,
+                               text='Ответ')
+        Comment.objects.create(post=self.new, author=self.reader,
+                               text='Ответ')
+        response = client.get(reverse('posts:popular'))
+        self.assertEqual(list(response.context['page_obj']),
+                         [self.new, self.old])
+        # Подписка на автора с постами укладывается в бюджет запросов
+        client.get(reverse('posts:profile_follow',
+                           args=(self.author.username,)))
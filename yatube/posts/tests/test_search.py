@@ -0,0 +1,65 @@
+from unittest import mock
+
+from django.contrib.admin.sites import site
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Post, SearchTerm, User
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='NoName')
+        cls.weak = Post.objects.create(author=cls.user,
+                                       text='Кошка спит на диване')
+        cls.strong = Post.objects.create(
+            author=cls.user, text='Кошка ловит мышь, кошка довольна')
+        cls.other = Post.objects.create(author=cls.user,
+                                        text='Собака гуляет во дворе')
+
+    def test_search_view_ranks_results(self):
+        """Поиск находит посты со всеми словами, релевантные сверху"""
+        response = self.client.get(reverse('posts:search'), {'q': 'КОШКА'})
+        self.assertTemplateUsed(response, 'posts/search.html')
+        self.assertEqual(list(response.context['page_obj']),
+                         [self.strong, self.weak])
+        response = self.client.get(reverse('posts:search'),
+                                   {'q': 'кошка диване'})
+        self.assertEqual(list(response.context['page_obj']), [self.weak])
+
+    def test_index_follows_edits(self):
+        """Индекс обновляется при правке и удалении поста"""
+        self.other.text = 'Кошка во дворе'
+        self.other.save()
+        self.assertIn(self.other, search.search_posts('кошка'))
+        self.other.delete()
+        self.assertEqual(search.search_posts('собака').count(), 0)
+
+    def test_syntax_is_not_injected(self):
+        """Операторы FTS5 в запросе ищутся как обычные слова"""
+        self.assertEqual(search.search_posts('кошка OR "собака').count(), 0)
+        self.assertEqual(search.search_posts('***').count(), 0)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт по тому же индексу"""
+        admin = site._registry[Post]
+        request = RequestFactory().get('/')
+        result, _ = admin.get_search_results(request, Post.objects.all(),
+                                             'собака')
+        self.assertEqual(list(result), [self.other])
+
+    def test_fallback_index(self):
+        """Без FTS5 работает запасной индекс SearchTerm"""
+        with mock.patch.object(search, 'uses_fts', return_value=False):
+            for post in Post.objects.all():
+                search.index_post(post)
+            self.assertTrue(SearchTerm.objects.filter(term='кошка').exists())
+            self.assertEqual(list(search.search_posts('кошка')),
+                             [self.strong, self.weak])
+            self.assertEqual(
+                list(Post.objects.filter(
+                    pk__in=search.matching_ids('кошка диване'))),
+                [self.weak])
@@ -0,0 +1,61 @@
+import json
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client
+from django.urls import reverse
+from PIL import Image
+
+from core.jobs import run_pending, task_name
+from core.models import Job
+from . import TestCaseWithTmpMedia
+from .. import thumbnails
+from ..models import Post, User
+from ..thumbnails import cached_thumbnail
+
+
+def image_file(name='photo.png'):
+    buffer = BytesIO()
+    Image.new('RGB', (800, 600), 'red').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(),
+                              content_type='image/png')
+
+
+class ThumbnailsTest(TestCaseWithTmpMedia):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='NoName')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_create_schedules_thumbnail(self):
+        """После создания поста миниатюра ставится в очередь задач"""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с картинкой', 'image': image_file()})
+        post = Post.objects.get(text='Пост с картинкой')
+        job = Job.objects.get(task=task_name(thumbnails.generate))
+        self.assertEqual(json.loads(job.payload)['name'], post.image.name)
+        self.assertIsNone(cached_thumbnail(post.image))
+        run_pending()
+        self.assertIsNotNone(cached_thumbnail(post.image))
+        self.assertFalse(Job.objects.exists())
+
+    def test_placeholder_until_ready(self):
+        """Страница не генерирует миниатюру, а показывает заглушку"""
+        post = Post.objects.create(author=self.user, text='Пост',
+                                   image=image_file())
+        url = reverse('posts:post_detail', args=(post.id,))
+        with mock.patch('sorl.thumbnail.get_thumbnail') as generate:
+            response = self.client.get(url)
+        generate.assert_not_called()
+        self.assertContains(response, 'Изображение обрабатывается')
+        call_command('generate_thumbnails', stdout=StringIO())
+        response = self.client.get(url)
+        self.assertNotContains(response, 'Изображение обрабатывается')
+        self.assertContains(response, 'width="400" height="400"')
@@ -0,0 +1,123 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import timeline
+from ..models import AuthorStats, Follow, Post, TimelineEntry, User
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create(username='reader')
+        cls.author = User.objects.create(username='author')
+        cls.old_post = Post.objects.create(author=cls.author,
+                                           text='Старый пост')
+
+    def test_follow_backfills_and_post_fans_out(self):
+        """Подписка заполняет ленту, новый пост раскладывается по ней"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(list(timeline.timeline_posts(self.reader)[0]),
+                         [new_post, self.old_post])
+
+    def test_unfollow_prunes(self):
+        """Отписка убирает посты автора из ленты"""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        follow.delete()
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader)
+                         .exists())
+
+    def test_popular_author_is_pulled(self):
+        """Посты популярных авторов читаются без материализации"""
+        with mock.patch.object(timeline, 'FANOUT_FOLLOWERS_LIMIT', 0):
+            Follow.objects.create(user=self.reader, author=self.author)
+            new_post = Post.objects.create(author=self.author, text='Новый')
+            self.assertFalse(TimelineEntry.objects.filter(post=new_post)
+                             .exists())
+            self.assertIn(new_post, timeline.timeline_posts(self.reader)[0])
+
+    def test_author_back_under_limit_is_pushed(self):
+        """Посты, написанные выше порога, не пропадают после отписки"""
+        other = User.objects.create(username='other')
+        with mock.patch.object(timeline, 'FANOUT_FOLLOWERS_LIMIT', 1):
+            Follow.objects.create(user=self.reader, author=self.author)
+            follow = Follow.objects.create(user=other, author=self.author)
+            new_post = Post.objects.create(author=self.author, text='Новый')
+            self.assertFalse(TimelineEntry.objects.filter(post=new_post)
+                             .exists())
+            follow.delete()
+            self.assertEqual(list(timeline.pulled_authors(self.reader)), [])
+            self.assertIn(new_post, timeline.timeline_posts(self.reader)[0])
+
+    def test_author_without_stats_is_pulled(self):
+        """Без строки счётчиков порог сверяется с числом подписок"""
+        AuthorStats.objects.filter(user=self.author).delete()
+        with mock.patch.object(timeline, 'FANOUT_FOLLOWERS_LIMIT', 0):
+            Follow.objects.create(user=self.reader, author=self.author)
+            new_post = Post.objects.create(author=self.author, text='Новый')
+            self.assertFalse(TimelineEntry.objects.filter(post=new_post)
+                             .exists())
+            self.assertEqual(list(timeline.pulled_authors(self.reader)),
+                             [self.author.pk])
+            self.assertIn(new_post, timeline.timeline_posts(self.reader)[0])
+
+
+class FollowIndexTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create(username='reader')
+        cls.author = User.objects.create(username='author')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for number in range(3):
+            Post.objects.create(author=cls.author, text=f'Пост {number}')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def counted(self, url):
+        """Считал ли запрос к странице число постов ленты."""
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return any(query['sql'].startswith('SELECT COUNT(*)')
+                   for query in context.captured_queries)
+
+    def test_count_cached(self):
+        """Число постов ленты считается заново только после изменений"""
+        url = reverse('posts:follow_index')
+        self.assertTrue(self.counted(url))
+        self.assertFalse(self.counted(url))
+        Post.objects.create(author=self.author, text='Свежий')
+        self.assertTrue(self.counted(url))
+        self.assertFalse(self.counted(url))
+        Follow.objects.create(user=self.reader,
+                              author=User.objects.create(username='new'))
+        self.assertTrue(self.counted(url))
+
+    @override_settings(POSTS_CURSOR_PAGINATION=True)
+    def test_cursor_orders_by_timeline(self):
+        """Курсор ленты идёт по дате строки ленты одним соединением"""
+        with mock.patch('posts.utils.POST_RESTRICTION', 2):
+            response = self.client.get(reverse('posts:follow_index'))
+            page = response.context['page_obj']
+            self.assertEqual([post.text for post in page],
+                             ['Пост 2', 'Пост 1'])
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(
+                    reverse('posts:follow_index'),
+                    {'page': page.next_page_number()})
+        self.assertEqual([post.text for post in response.context['page_obj']],
+                         ['Пост 0'])
+        sql = next(query['sql'] for query in context.captured_queries
+                   if 'ORDER BY' in query['sql'])
+        self.assertIn('"posts_timelineentry"."pub_date" AS "cursor_key"', sql)
+        self.assertIn('ORDER BY "cursor_key" DESC', sql)
+        self.assertEqual(sql.count('JOIN "posts_timelineentry"'), 1)
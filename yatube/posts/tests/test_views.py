@@ -1,11 +1,16 @@
 from . import TestCaseWithTmpMedia
 from django.urls import reverse
 from django import forms
+from django.conf import settings
 from django.core.cache import cache
-from django.test import TestCase, Client
+from django.core.paginator import Paginator
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.core.files.uploadedfile import SimpleUploadedFile
-from ..models import Post, Group, User, Follow
-from ..utils import POST_RESTRICTION
+from ..models import Post, Group, User, Follow, Comment
+from ..utils import (COMMENTS_RESTRICTION, CURSOR_AFTER, POST_RESTRICTION,
+                     CursorPage, encode_cursor, page_window)
 
 COUNT_OF_POST = 13
 # TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -45,6 +50,292 @@ class PaginatorViewsTest(TestCase):
         self.assertEqual(len(response.context['page_obj']),
                          COUNT_OF_POST - POST_RESTRICTION)
 
+    def test_count_cached_until_new_post(self):
+        """Число постов считается заново только после нового поста"""
+        url = reverse('posts:index')
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as context:
+                response = self.authorized_client.get(url)
+            pages = response.context['page_obj'].paginator
+            return pages.count, sum('COUNT(' in query['sql']
+                                    for query in context.captured_queries)
+
+        self.assertEqual(count_queries(), (COUNT_OF_POST, 1))
+        self.assertEqual(count_queries(), (COUNT_OF_POST, 0))
+        Post.objects.create(text='Новый пост', author=self.user)
+        self.assertEqual(count_queries(), (COUNT_OF_POST + 1, 1))
+
+    def test_group_count_from_counter(self):
+        """Страница группы берёт число постов из счётчика группы"""
+        Group.objects.filter(pk=self.group.pk).update(posts_count=25)
+        response = self.client.get(reverse('posts:group_list',
+                                           args=(self.group.slug,)))
+        self.assertEqual(response.context['page_obj'].paginator.num_pages, 3)
+
+    def test_page_window(self):
+        """Ссылки только на страницы рядом с текущей и на крайние"""
+        paginator = Paginator(range(1000), 10)
+        self.assertEqual(page_window(paginator.page(50)),
+                         [1, None, 48, 49, 50, 51, 52, None, 100])
+        self.assertEqual(page_window(paginator.page(2)),
+                         [1, 2, 3, 4, None, 100])
+        self.assertEqual(page_window(Paginator(range(30), 10).page(1)),
+                         [1, 2, 3])
+
+
+@override_settings(POSTS_CURSOR_PAGINATION=True)
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='NoName')
+        posts = list()
+        for i in range(COUNT_OF_POST):
+            posts.append(Post(text=f'Текст с номером {i}', author=cls.user))
+        # bulk_create ставит одинаковый pub_date, порядок задаёт id
+        Post.objects.bulk_create(posts)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_by_cursor(self):
+        """Курсоры ведут на следующую и предыдущую страницы"""
+        url = reverse('posts:profile', args=(self.user.username,))
+        first = self.client.get(url).context['page_obj']
+        self.assertIsInstance(first, CursorPage)
+        self.assertEqual(len(first), POST_RESTRICTION)
+        self.assertFalse(first.has_previous())
+        self.assertTrue(first.has_next())
+        second = self.client.get(
+            url + f'?page={first.next_page_number()}').context['page_obj']
+        self.assertEqual(len(second), COUNT_OF_POST - POST_RESTRICTION)
+        self.assertFalse(second.has_next())
+        self.assertTrue(second.has_previous())
+        self.assertFalse(set(first) & set(second))
+        back = self.client.get(
+            url + f'?page={second.previous_page_number()}'
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+
+    def test_last_page_and_bad_cursor(self):
+        """Последняя страница по курсору, битый курсор ведёт на первую"""
+        url = reverse('posts:profile', args=(self.user.username,))
+        first = self.client.get(url).context['page_obj']
+        last = self.client.get(
+            url + f'?page={first.paginator.num_pages}').context['page_obj']
+        self.assertEqual(len(last), POST_RESTRICTION)
+        self.assertEqual(last[-1], Post.objects.order_by('pk').first())
+        self.assertFalse(last.has_next())
+        broken = self.client.get(url + '?page=1').context['page_obj']
+        self.assertEqual(list(broken), list(first))
+
+    def test_cursor_past_end(self):
+        """Курсор за последним постом ведёт на последнюю страницу"""
+        oldest = Post.objects.order_by('pk').first()
+        cursor = encode_cursor(CURSOR_AFTER, oldest.pub_date, oldest.pk)
+        response = self.client.get(reverse('posts:index') + f'?page={cursor}')
+        self.assertEqual(response.status_code, 200)
+        page = response.context['page_obj']
+        self.assertEqual(page[-1], oldest)
+        self.assertFalse(page.has_next())
+        empty = CursorPage([], 1, page.paginator, has_next=False,
+                           has_previous=True)
+        self.assertIsNone(empty.previous_page_number())
+        self.assertIsNone(empty.next_page_number())
+
+    def test_no_count_query(self):
+        """Курсорная страница не делает COUNT(*)"""
+        url = reverse('posts:index')
+        with self.assertNumQueries(1):
+            self.client.get(url).context['page_obj'].object_list
+
+
+class CommentsViewsTest(TestCase):
+    COUNT_OF_COMMENTS = COMMENTS_RESTRICTION + 5
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.post = Post.objects.create(
+            author=User.objects.create(username='NoName'),
+            text='Пост с обсуждением')
+        authors = [User.objects.create(username=f'user{i}')
+                   for i in range(cls.COUNT_OF_COMMENTS)]
+        Comment.objects.bulk_create(
+            [Comment(post=cls.post, author=author, text=f'Коммент {i}')
+             for i, author in enumerate(authors)])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_bounded_queries(self):
+        """Первая порция комментариев грузится вместе с авторами"""
+        # Автор поста для ETag, сам пост и комментарии с авторами
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                reverse('posts:post_detail', args=(self.post.id,)))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_RESTRICTION)
+        self.assertTrue(comments.has_next())
+
+    def test_comments_fragment(self):
+        """Фрагмент отдаёт следующую порцию комментариев"""
+        first = self.client.get(
+            reverse('posts:post_detail', args=(self.post.id,))
+        ).context['comments']
+        response = self.client.get(
+            reverse('posts:post_comments', args=(self.post.id,))
+            + f'?cursor={first.next_page_number()}')
+        self.assertTemplateUsed(response, 'includes/comment_list.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertEqual(len(response.context['comments']),
+                         self.COUNT_OF_COMMENTS - COMMENTS_RESTRICTION)
+
+
+class QueryBudgetViewsTest(TestCase):
+    """Число запросов страниц не растёт с числом постов на них"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='budget',
+                                         description='Описание')
+        for i in range(POST_RESTRICTION):
+            author = User.objects.create(username=f'author{i}')
+            Follow.objects.create(user=cls.user, author=author)
+            post = Post.objects.create(author=author, group=cls.group,
+                                       text=f'Пост {i}',
+                                       image=f'posts/{i}.jpg')
+            Comment.objects.create(post=post, author=author, text='Ответ')
+        cls.post = post
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def test_pages_within_budget(self):
+        """Полные страницы укладываются в бюджет без N+1"""
+        # В тестах QueryBudgetMiddleware роняет запрос при нарушении
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:popular'),
+            reverse('posts:group_index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.post.author.username,)),
+            reverse('posts:post_detail', args=(self.post.id,)),
+            reverse('posts:follow_index'),
+            reverse('posts:search') + '?q=пост',
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='NoName')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='cond',
+                                         description='Описание')
+        cls.post = Post.objects.create(author=cls.user, group=cls.group,
+                                       text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+        # Форма комментария задаёт CSRF-куку, с которой считается ETag
+        self.authorized_client.get(reverse('posts:post_detail',
+                                           args=(self.post.id,)))
+
+    def revalidate(self, url, client=None):
+        client = client or self.client
+        etag = client.get(url)['ETag']
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_not_modified(self):
+        """Повторный запрос без изменений получает 304 без шаблона"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.user.username,)),
+            reverse('posts:post_detail', args=(self.post.id,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.revalidate(url)
+                self.assertEqual(response.status_code, 304)
+                self.assertFalse(response.templates)
+
+    def test_last_modified_for_anonymous(self):
+        """Анонимы могут перепроверить страницу по дате изменения"""
+        url = reverse('posts:index')
+        modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(self.authorized_client.get(url)
+                         .has_header('Last-Modified'))
+
+    def test_changes_modify_etag(self):
+        """Правка поста, группы, комментарий и подписка меняют ETag"""
+        detail = reverse('posts:post_detail', args=(self.post.id,))
+        profile = reverse('posts:profile', args=(self.user.username,))
+
+        def rename_group():
+            group = Group.objects.get(pk=self.group.pk)
+            group.title = 'Новое название'
+            group.save()
+
+        def rename_author():
+            user = User.objects.get(pk=self.user.pk)
+            user.first_name = 'Лев'
+            user.save()
+
+        changes = (
+            (detail, lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Ответ')),
+            (detail, rename_group),
+            (detail, rename_author),
+            (profile, rename_author),
+            (reverse('posts:index'), rename_author),
+            (reverse('posts:index'), lambda: Post.objects.filter(
+                pk=self.post.pk).first().save()),
+            (profile, lambda: Follow.objects.create(user=self.reader,
+                                                    author=self.user)),
+        )
+        for url, change in changes:
+            with self.subTest(url=url):
+                etag = self.authorized_client.get(url)['ETag']
+                change()
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_csrf_cookie(self):
+        """Без прежней CSRF-куки форма отрисовывается заново"""
+        url = reverse('posts:post_detail', args=(self.post.id,))
+        etag = self.authorized_client.get(url)['ETag']
+        del self.authorized_client.cookies[settings.CSRF_COOKIE_NAME]
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertIn(settings.CSRF_COOKIE_NAME, response.cookies)
+        # С новой кукой страница снова перепроверяется по своему ETag
+        self.assertEqual(self.revalidate(url, self.authorized_client)
+                         .status_code, 304)
+
+    def test_etag_depends_on_viewer(self):
+        """У гостя и пользователя разные ETag одной страницы"""
+        url = reverse('posts:index')
+        self.assertNotEqual(self.client.get(url)['ETag'],
+                            self.authorized_client.get(url)['ETag'])
+
 
 class PostViewsTest(TestCase):
     @classmethod
@@ -164,10 +455,42 @@ class PostViewsTest(TestCase):
         """Проверка кеширования
         """
         page1 = (self.guest_client.get(reverse('posts:index'))).content
-        Post.objects.get(id=1).delete()
+        # update() не шлёт сигналов, поэтому лента остаётся в кеше
+        Post.objects.filter(id=self.post.id).update(text='Changed text')
         page2 = (self.guest_client.get(reverse('posts:index'))).content
         self.assertEqual(page1, page2)
 
+    def test_cache_invalidation(self):
+        """Кеш лент сбрасывается при изменении и удалении поста"""
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        post = Post.objects.create(author=self.user, text='Temporary text',
+                                   group=self.group)
+        for address in pages:
+            with self.subTest(address=address):
+                self.assertContains(self.guest_client.get(address),
+                                    'Temporary text')
+        post.text = 'Edited text'
+        post.save()
+        for address in pages:
+            with self.subTest(address=address):
+                self.assertContains(self.guest_client.get(address),
+                                    'Edited text')
+        post.delete()
+        for address in pages:
+            with self.subTest(address=address):
+                self.assertNotContains(self.guest_client.get(address),
+                                       'Edited text')
+
+    def test_cache_varies_by_audience(self):
+        """Гость и авторизованный пользователь получают разный кеш"""
+        self.guest_client.get(reverse('posts:index'))
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, reverse('posts:follow_index'))
+
     def test_follow(self):
         """Проверка работы подписок на авторов"""
         response = self.authorized_client.get(reverse('posts:follow_index'))
@@ -0,0 +1,93 @@
+"""Фоновая подготовка миниатюр постов.
+
+Миниатюра создаётся задачей очереди core.jobs после сохранения картинки,
+а страницы только читают готовый результат и до тех пор показывают
+заглушку.
+"""
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.models import KVStore
+
+from core.cache import bump
+from core.jobs import enqueue
+from .utils import post_feeds
+
+GEOMETRY = '400x400'
+OPTIONS = {'crop': 'center', 'upscale': True}
+
+
+def _options(source):
+    # Те же опции, что собирает ThumbnailBackend.get_thumbnail,
+    # иначе имя файла миниатюры не совпадёт
+    backend = default.backend
+    options = dict(OPTIONS)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def _thumbnail_file(image):
+    source = ImageFile(image)
+    name = default.backend._get_thumbnail_filename(source, GEOMETRY,
+                                                   _options(source))
+    return source, ImageFile(name, default.storage)
+
+
+def prefetch(posts):
+    """Загружает записи kvstore о миниатюрах страницы одним запросом.
+
+    Без этого cached_thumbnail обращается к базе отдельно для каждого
+    поста, у которого записи ещё нет в кеше.
+    """
+    keys = [add_prefix(_thumbnail_file(post.image)[1].key)
+            for post in posts if post.image]
+    kvstore_cache = default.kvstore.cache
+    missing = set(keys) - set(kvstore_cache.get_many(keys))
+    if not missing:
+        return
+    values = dict(KVStore.objects.filter(key__in=missing)
+                  .values_list('key', 'value'))
+    # Отсутствие записи тоже кешируем, как это делает сам kvstore
+    kvstore_cache.set_many({key: values.get(key, EMPTY_VALUE)
+                            for key in missing},
+                           sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+
+
+def cached_thumbnail(image):
+    """Готовая миниатюра картинки или None. Ничего не генерирует."""
+    if not image:
+        return None
+    source, thumbnail = _thumbnail_file(image)
+    cached = default.kvstore.get(thumbnail)
+    if cached is None and thumbnail.exists():
+        # Файл создан в другом процессе: запоминаем его размеры
+        default.kvstore.set(thumbnail, source)
+        cached = thumbnail
+    return cached
+
+
+def generate(name, feeds):
+    """Задача очереди: создаёт миниатюру и сбрасывает ленты поста."""
+    get_thumbnail(name, GEOMETRY, **OPTIONS)
+    # В кешированных лентах вместо заглушки должна появиться картинка
+    bump(*feeds)
+
+
+def schedule(post):
+    """Ставит миниатюру поста в очередь задач.
+
+    Задача записывается в той же транзакции, что и пост, и видна
+    воркеру только после коммита.
+    """
+    if post.image:
+        enqueue(generate, name=post.image.name, feeds=post_feeds(post))
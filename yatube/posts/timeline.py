@@ -0,0 +1,158 @@
+from django.db import connection
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import AuthorStats, Follow, Post, TimelineEntry, User
+
+# Посты авторов с большим числом подписчиков не раскладываются
+# по лентам, а подтягиваются при чтении (fan-out on read)
+FANOUT_FOLLOWERS_LIMIT = 1000
+# Сколько последних постов автора попадает в ленту при подписке
+BACKFILL_LIMIT = 500
+
+
+def _entry(user_id, post):
+    return TimelineEntry(user_id=user_id,
+                         post_id=post.pk,
+                         author_id=post.author_id,
+                         pub_date=post.pub_date)
+
+
+def _with_followers(authors):
+    """Авторы с числом подписчиков, по которому решается раскладка.
+
+    Раскладка и чтение при запросе сверяют с порогом одно и то же число:
+    счётчик AuthorStats, а без строки счётчиков — подсчёт подписок.
+    Иначе автор мог бы не попасть ни в раскладку, ни в чтение.
+    """
+    live = (Follow.objects.filter(author=OuterRef('pk')).order_by()
+            .values('author').annotate(count=Count('pk')).values('count'))
+    return authors.annotate(followers=Coalesce(
+        'stats__followers_count', Subquery(live), 0,
+        output_field=IntegerField()))
+
+
+def pushed_authors(authors):
+    """id авторов из authors, чьи посты раскладываются по лентам."""
+    return (_with_followers(authors)
+            .filter(followers__lte=FANOUT_FOLLOWERS_LIMIT)
+            .values_list('pk', flat=True))
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if not pushed_authors(User.objects.filter(pk=post.author_id)).exists():
+        return
+    followers = (Follow.objects.filter(author=post.author_id)
+                 .values_list('user', flat=True))
+    TimelineEntry.objects.bulk_create(
+        [_entry(user_id, post) for user_id in followers],
+        ignore_conflicts=True)
+
+
+def fan_out_many(posts):
+    """Раскладывает пачку новых постов по лентам подписчиков.
+
+    В отличие от fill берёт только посты пачки: один INSERT ... SELECT,
+    работа растёт с размером пачки, а не с числом постов авторов.
+    """
+    authors = {post.author_id for post in posts}
+    pushed = set(pushed_authors(User.objects.filter(pk__in=authors)))
+    if not pushed:
+        return
+    ids = [post.pk for post in posts if post.author_id in pushed]
+    sql = (
+        'INSERT INTO {entry} (user_id, post_id, author_id, pub_date) '
+        'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+        'FROM {follow} f JOIN {post} p ON p.author_id = f.author_id '
+        'WHERE p.id IN ({ids}) '
+        'ON CONFLICT DO NOTHING'
+    ).format(entry=TimelineEntry._meta.db_table,
+             follow=Follow._meta.db_table,
+             post=Post._meta.db_table,
+             ids=', '.join(['%s'] * len(ids)))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, ids)
+
+
+def backfill(follow):
+    """Добавляет в ленту подписчика последние посты автора."""
+    posts = (Post.objects.filter(author=follow.author_id)
+             .only('pk', 'author', 'pub_date')
+             .order_by('-pub_date')[:BACKFILL_LIMIT])
+    TimelineEntry.objects.bulk_create(
+        [_entry(follow.user_id, post) for post in posts],
+        ignore_conflicts=True)
+
+
+def fill(authors=None, followers=None):
+    """Раскладывает последние посты авторов по лентам подписчиков.
+
+    Заменяет fan_out и backfill при массовой записи, которая не шлёт
+    сигналов. Строки ленты не проходят через Python: по одному
+    INSERT ... SELECT на автора. followers ограничивает подписчиков.
+    """
+    sql = (
+        'INSERT INTO {entry} (user_id, post_id, author_id, pub_date) '
+        'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+        'FROM {follow} f, (SELECT id, author_id, pub_date FROM {post} '
+        '  WHERE author_id = %s ORDER BY pub_date DESC LIMIT %s) p '
+        'WHERE f.author_id = %s{only} '
+        'ON CONFLICT DO NOTHING'
+    ).format(entry=TimelineEntry._meta.db_table,
+             follow=Follow._meta.db_table,
+             post=Post._meta.db_table,
+             only=(' AND f.user_id IN ({})'.format(
+                 ', '.join(['%s'] * len(followers))) if followers else ''))
+    followed = User.objects.filter(pk__in=Follow.objects.values('author'))
+    if authors is not None:
+        followed = followed.filter(pk__in=authors)
+    pushed = pushed_authors(followed)
+    with connection.cursor() as cursor:
+        for author in pushed.iterator():
+            cursor.execute(sql, [author, BACKFILL_LIMIT, author,
+                                 *(followers or ())])
+
+
+def prune(follow):
+    """Убирает из ленты подписчика посты автора."""
+    TimelineEntry.objects.filter(user=follow.user_id,
+                                 author=follow.author_id).delete()
+
+
+def follower_removed(author_id):
+    """Возвращает автора, опустившегося до порога, к раскладке по лентам.
+
+    Вызывается после уменьшения счётчика подписчиков. Посты, написанные
+    выше порога, не разложены, а читать их при запросе ленты перестанут:
+    раскладываем последние посты автора по лентам всех подписчиков.
+    """
+    if AuthorStats.objects.filter(
+            user=author_id,
+            followers_count=FANOUT_FOLLOWERS_LIMIT).exists():
+        fill(authors=[author_id])
+
+
+def pulled_authors(user):
+    """Авторы из подписок, чьи посты читаются без материализации."""
+    return (_with_followers(User.objects.filter(following__user=user))
+            .filter(followers__gt=FANOUT_FOLLOWERS_LIMIT)
+            .values_list('pk', flat=True))
+
+
+def timeline_posts(user):
+    """Посты ленты подписок пользователя, новые сверху.
+
+    Возвращает посты и поле даты, по которому они отсортированы. Без
+    подтягиваемых авторов это дата строки ленты: страница читается по
+    индексу (user, pub_date), а не сортируется.
+    """
+    posts = Post.objects.select_related('author', 'group')
+    pulled = list(pulled_authors(user))
+    if not pulled:
+        key = 'timeline_entries__pub_date'
+        return (posts.filter(timeline_entries__user=user)
+                .order_by(f'-{key}')), key
+    entries = TimelineEntry.objects.filter(user=user).values('post')
+    return (posts.filter(Q(pk__in=entries) | Q(author__in=pulled))
+            .order_by('-pub_date')), 'pub_date'
@@ -6,12 +6,20 @@ app_name = 'posts'
 urlpatterns = [
     # Главная страница
     path('', views.index, name='index'),
+    path('popular/', views.popular, name='popular'),
+    path('group/', views.group_index, name='group_index'),
     # Страница с группами
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path('search/', views.search, name='search'),
+    path('export/<str:kind>/', views.export_data, name='export'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'),
     path(
         'posts/<int:post_id>/comment/',
         views.add_comment,
@@ -1,11 +1,284 @@
-from django.core.paginator import Paginator
+import binascii
 
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db.models import F, Q
+from django.db.models.constants import LOOKUP_SEP
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from core.cache import generations
 
 POST_RESTRICTION = 10
+GROUPS_RESTRICTION = 20
+COMMENTS_RESTRICTION = 20
+# Сколько ссылок на страницы показывать вокруг текущей и по краям
+PAGES_ON_EACH_SIDE = 2
+PAGES_ON_ENDS = 1
+
+# Направления курсора: после ключа, перед ключом и последняя страница
+CURSOR_AFTER = 'a'
+CURSOR_BEFORE = 'b'
+CURSOR_LAST = 'l'
+
+
+def encode_cursor(direction, value=None, pk=None):
+    """Упаковывает ключ (значение, id) в непрозрачную строку для ссылки."""
+    if value is None:
+        raw = direction
+    else:
+        raw = f'{direction}|{value.isoformat()}|{pk}'
+    return urlsafe_base64_encode(force_bytes(raw))
+
+
+def decode_cursor(cursor):
+    """Распаковывает курсор. Для битого курсора бросает ValueError."""
+    try:
+        raw = urlsafe_base64_decode(cursor or '').decode()
+    except (TypeError, ValueError, binascii.Error):
+        raise ValueError('Некорректный курсор')
+    if raw == CURSOR_LAST:
+        return CURSOR_LAST, None, None
+    parts = raw.split('|')
+    if (len(parts) != 3 or parts[0] not in (CURSOR_AFTER, CURSOR_BEFORE)
+            or not parts[2].isdigit()):
+        raise ValueError('Некорректный курсор')
+    value = parse_datetime(parts[1])
+    if value is None:
+        raise ValueError('Некорректный курсор')
+    return parts[0], value, int(parts[2])
+
+
+class CursorPage(Page):
+    """Страница курсорной пагинации.
+
+    Сохраняет интерфейс обычной страницы для шаблона paginator.html:
+    вместо номеров соседних страниц отдаются курсоры.
+    """
+
+    def __init__(self, object_list, number, paginator,
+                 has_next, has_previous):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def next_page_number(self):
+        # У пустой страницы нет ключа, от которого листать
+        if not self.object_list:
+            return None
+        return self.paginator.cursor_for(CURSOR_AFTER, self.object_list[-1])
+
+    def previous_page_number(self):
+        if not self.object_list:
+            return None
+        return self.paginator.cursor_for(CURSOR_BEFORE, self.object_list[0])
+
+    def start_index(self):
+        return None
+
+    def end_index(self):
+        return None
+
+
+class CursorPaginator(Paginator):
+    """Пагинация по ключу (key, id) без COUNT(*) и OFFSET.
+
+    Каждая страница — один запрос по индексу, глубина прокрутки
+    на скорость не влияет. Ключ должен быть полем DateTimeField.
+    """
+
+    def __init__(self, object_list, per_page, key='pub_date'):
+        if LOOKUP_SEP in key:
+            # Поле связанной модели: аннотация берёт соединение из
+            # filter(), а фильтр курсора по ней не добавит второго
+            object_list = object_list.annotate(cursor_key=F(key))
+            key = 'cursor_key'
+        super().__init__(object_list.order_by(f'-{key}', '-pk'), per_page)
+        self.key = key
+
+    @property
+    def num_pages(self):
+        # Ссылка «Последняя» ведёт на курсор последней страницы
+        return encode_cursor(CURSOR_LAST)
+
+    @property
+    def page_range(self):
+        # Номера страниц неизвестны без подсчёта записей
+        return ()
+
+    def cursor_for(self, direction, obj):
+        return encode_cursor(direction, getattr(obj, self.key), obj.pk)
+
+    def get_page(self, cursor):
+        try:
+            direction, value, pk = decode_cursor(cursor)
+        except ValueError:
+            direction = value = pk = None
+        posts = self.object_list
+        if direction == CURSOR_AFTER:
+            posts = posts.filter(Q(**{f'{self.key}__lt': value})
+                                 | Q(**{self.key: value, 'pk__lt': pk}))
+        elif direction == CURSOR_BEFORE:
+            posts = posts.filter(Q(**{f'{self.key}__gt': value})
+                                 | Q(**{self.key: value, 'pk__gt': pk}))
+        if direction in (CURSOR_BEFORE, CURSOR_LAST):
+            posts = posts.reverse()
+        items = list(posts[:self.per_page + 1])
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if direction == CURSOR_AFTER and not items:
+            # Курсор за последней записью: например, её удалили
+            return self.get_page(encode_cursor(CURSOR_LAST))
+        if direction in (CURSOR_BEFORE, CURSOR_LAST):
+            if not items:
+                return self.get_page(None)
+            items.reverse()
+            return CursorPage(items, cursor, self,
+                              has_next=direction == CURSOR_BEFORE,
+                              has_previous=has_more)
+        if direction is None:
+            cursor = 1
+        return CursorPage(items, cursor, self,
+                          has_next=has_more,
+                          has_previous=direction == CURSOR_AFTER)
+
+
+class CountedPaginator(Paginator):
+    """Нумерованные страницы без COUNT(*) на каждый запрос.
 
+    count — уже известное число записей, например денормализованный
+    счётчик. Иначе число записей кешируется под поколением name (или
+    списком поколений) и считается заново только после его сдвига.
+    """
 
-def paginator_func(request, posts):
-    paginator = Paginator(posts, POST_RESTRICTION)
+    def __init__(self, object_list, per_page, count=None, name=None):
+        super().__init__(object_list, per_page)
+        self.known_count = count
+        self.name = name
+
+    @cached_property
+    def count(self):
+        if self.known_count is not None:
+            return self.known_count
+        if self.name is None:
+            return super().count
+        names = ([self.name] if isinstance(self.name, str)
+                 else list(self.name))
+        key = 'count:' + ':'.join(map(str, [*names, *generations(*names)]))
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, None)
+        return count
+
+
+def page_window(page, on_each_side=PAGES_ON_EACH_SIDE,
+                on_ends=PAGES_ON_ENDS):
+    """Номера страниц вокруг текущей и по краям, None на месте пропуска.
+
+    Курсорная страница своих номеров не знает: для неё список пуст.
+    """
+    num_pages = page.paginator.num_pages
+    if not isinstance(num_pages, int):
+        return []
+    # Перебираем только показываемые номера: страниц могут быть тысячи
+    shown = sorted({*range(1, min(on_ends, num_pages) + 1),
+                    *range(max(page.number - on_each_side, 1),
+                           min(page.number + on_each_side, num_pages) + 1),
+                    *range(max(num_pages - on_ends + 1, 1), num_pages + 1)})
+    pages = []
+    for number in shown:
+        if pages and number > pages[-1] + 1:
+            pages.append(None)
+        pages.append(number)
+    return pages
+
+
+def feed_name(author=None, group=None):
+    """Имя поколения кеша ленты: главной, автора или группы."""
+    if author is not None:
+        return f'feed:profile:{author}'
+    if group is not None:
+        return f'feed:group:{group}'
+    return 'feed:index'
+
+
+def groups_name():
+    """Имя поколения каталога групп."""
+    return 'feed:groups'
+
+
+def popular_name():
+    """Имя поколения ленты популярных постов."""
+    return 'feed:popular'
+
+
+def post_name(post_id):
+    """Имя поколения страницы поста с комментариями."""
+    return f'post:{post_id}'
+
+
+def author_name(author_id):
+    """Имя поколения данных автора в карточках постов."""
+    return f'author:{author_id}'
+
+
+def group_name(group_id):
+    """Имя поколения данных группы в карточках постов."""
+    return f'group:{group_id}'
+
+
+def follows_name(author_id):
+    """Имя поколения подписчиков автора."""
+    return f'follows:{author_id}'
+
+
+def following_name(user_id):
+    """Имя поколения подписок пользователя."""
+    return f'following:{user_id}'
+
+
+def post_feeds(post):
+    """Имена поколений всех страниц, на которых показывается пост."""
+    feeds = [feed_name(), feed_name(author=post.author_id),
+             post_name(post.pk), popular_name()]
+    if post.group_id:
+        feeds += [feed_name(group=post.group_id), groups_name()]
+    return feeds
+
+
+def paginator_func(request, posts, cursor=None, count=None, name=None,
+                   key='pub_date'):
+    """Страница ленты. cursor=False — нумерованные страницы всегда.
+
+    count и name нумерованным страницам передаются в CountedPaginator,
+    key — поле даты курсора.
+    """
+    if cursor is None:
+        cursor = settings.POSTS_CURSOR_PAGINATION
+    if cursor:
+        paginator = CursorPaginator(posts, POST_RESTRICTION, key=key)
+    else:
+        paginator = CountedPaginator(posts, POST_RESTRICTION,
+                                     count=count, name=name)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
+
+
+def comments_page(post, cursor):
+    """Очередная порция комментариев поста вместе с авторами."""
+    comments = post.comments.select_related('author')
+    return CursorPaginator(comments, COMMENTS_RESTRICTION).get_page(cursor)
@@ -1,40 +1,100 @@
 from django.contrib.auth import get_user_model
 from django.shortcuts import render, get_object_or_404, redirect
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.http import Http404, HttpResponseBadRequest, StreamingHttpResponse
+from django.db import transaction
+from django.utils.http import urlencode
+from core.queries import query_budget
+from core.replicas import use_replica
+from core.sqlite import retry_on_lock
+from .conditional import (directory_condition, group_condition,
+                          index_condition, popular_condition,
+                          post_condition, profile_condition)
 from .models import Post, Group, Follow
-from .forms import PostForm, CommentForm
-from .utils import paginator_func
+from .counters import author_stats
+from . import export
+from .forms import CommentForm, ExportForm, PostForm
+from .directory import attach_previews, directory
+from .popular import popular_posts
+from .utils import (GROUPS_RESTRICTION, POST_RESTRICTION, CountedPaginator,
+                    comments_page, feed_name, following_name, groups_name,
+                    paginator_func, popular_name)
+from .search import search_posts
+from .thumbnails import schedule as schedule_thumbnail
+from .timeline import timeline_posts
 
 User = get_user_model()
 
 
 # Главная страница
+@use_replica
+@query_budget(6)
+@index_condition
 def index(request):
     post_list = (Post.objects.select_related('author', 'group')
                  .all())
-    page_obj = paginator_func(request, post_list)
+    page_obj = paginator_func(request, post_list, name=feed_name())
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+# Популярные посты
+@use_replica
+@query_budget(6)
+@popular_condition
+def popular(request):
+    # Рейтинг меняется постоянно: курсор по нему не стабилен
+    page_obj = paginator_func(request, popular_posts(), cursor=False,
+                              name=popular_name())
+    context = {
+        'page_obj': page_obj,
+        'popular': True,
+    }
+    return render(request, 'posts/index.html', context)
+
+
+# Каталог групп
+@use_replica
+@query_budget(6)
+@directory_condition
+def group_index(request):
+    page_obj = (CountedPaginator(directory(), GROUPS_RESTRICTION,
+                                 name=groups_name())
+                .get_page(request.GET.get('page')))
+    attach_previews(page_obj.object_list)
+    context = {
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/group_index.html', context)
+
+
 # Страница с группами
+@use_replica
+@query_budget(6)
+@group_condition
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     post_list = (group.posts.select_related('author')
                  .all())
-    page_obj = paginator_func(request, post_list)
+    page_obj = paginator_func(request, post_list, count=group.posts_count)
     context = {'group': group,
                'page_obj': page_obj, }
     return render(request, 'posts/group_list.html', context)
 
 
+@use_replica
+@query_budget(7)
+@profile_condition
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
     post_list = (author.posts.select_related('group')
                  .all())
-    page_obj = paginator_func(request, post_list)
+    page_obj = paginator_func(request, post_list,
+                              count=author_stats(author).posts_count)
     following = (author.following.filter(user=request.user.id).exists()
                  and request.user.is_authenticated)
     context = {'author': author,
@@ -43,29 +103,65 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+@use_replica
+@query_budget(5)
+def search(request):
+    """Полнотекстовый поиск по постам"""
+    query = request.GET.get('q', '').strip()
+    # Порядок задаёт релевантность, поэтому страницы по номерам
+    paginator = CountedPaginator(search_posts(query), POST_RESTRICTION)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    context = {'query': query,
+               'page_prefix': urlencode({'q': query}) + '&',
+               'page_obj': page_obj}
+    return render(request, 'posts/search.html', context)
+
+
+@use_replica
+@query_budget(6)
+@post_condition
 def post_detail(request, post_id):
     form = CommentForm(request.POST or None)
-    post = get_object_or_404(Post.objects.select_related('author', 'group'),
-                             id=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id)
+    author_stats(post.author)
+    comments = comments_page(post, request.GET.get('cursor'))
     context = {'post': post,
                'form': form,
                'comments': comments}
     return render(request, 'posts/post_detail.html', context)
 
 
+@use_replica
+@query_budget(3)
+def post_comments(request, post_id):
+    """Следующая порция комментариев в виде HTML-фрагмента"""
+    post = get_object_or_404(Post.objects.only('pk'), id=post_id)
+    comments = comments_page(post, request.GET.get('cursor'))
+    context = {'post': post,
+               'comments': comments}
+    return render(request, 'includes/comment_list.html', context)
+
+
+@query_budget(12)
+@retry_on_lock
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         post = form.save(False)
         post.author = request.user
         post.save()
+        schedule_thumbnail(post)
         return redirect('posts:profile', username=request.user)
     return render(request, 'posts/create_post.html', {'form': form})
 
 
+@query_budget(11)
+@retry_on_lock
 @login_required
+@transaction.atomic
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     if post.author != request.user:
@@ -75,13 +171,17 @@ def post_edit(request, post_id):
                     instance=post)
     if form.is_valid():
         post = form.save()
-        post.save()
+        if 'image' in form.changed_data:
+            schedule_thumbnail(post)
         return redirect('posts:post_detail', post_id)
     return render(request, 'posts/create_post.html', {'form': form,
                                                       'is_edit': True})
 
 
+@query_budget(6)
+@retry_on_lock
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -93,18 +193,26 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@use_replica
+@query_budget(6)
 @login_required
 def follow_index(request):
     """Отображение страницы с подписками"""
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginator_func(request, posts)
+    posts, key = timeline_posts(request.user)
+    # Число постов меняется с новыми постами и подписками пользователя
+    page_obj = paginator_func(
+        request, posts, key=key,
+        name=[feed_name(), following_name(request.user.pk)])
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/follow.html', context)
 
 
+@query_budget(12)
+@retry_on_lock
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     """Функция подписки на автора
     """
@@ -114,11 +222,33 @@ def profile_follow(request, username):
     return redirect('posts:follow_index')
 
 
+@query_budget(12)
+@retry_on_lock
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     """Функция отписки от автора
     """
     author = get_object_or_404(User, username=username)
-    if author.following.filter(user=request.user).exists():
-        Follow.objects.get(user=request.user, author=author).delete()
+    # Без отдельной проверки exists(): сигналы получат найденную подписку
+    Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:follow_index')
+
+
+@query_budget(3)
+@staff_member_required
+def export_data(request, kind):
+    """Потоковая выгрузка данных для аналитики"""
+    if kind not in export.KINDS:
+        raise Http404
+    form = ExportForm(request.GET, kind=kind)
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.errors.as_text())
+    export_format = form.cleaned_data['format']
+    columns, values = export.rows(kind, **form.filters())
+    response = StreamingHttpResponse(
+        export.lines(export_format, columns, values),
+        content_type=export.CONTENT_TYPES[export_format])
+    response['Content-Disposition'] = (
+        f'attachment; filename="{kind}.{export_format}"')
+    return response
@@ -13,6 +13,9 @@ ALLOWED_HOSTS = [
     'testserver',
 ]
 
+# Адрес сайта для ссылок в письмах
+SITE_URL = os.environ.get('YATUBE_SITE_URL', 'http://localhost:8000')
+
 INSTALLED_APPS = [
     'django.contrib.admin',
     'django.contrib.auth',
@@ -28,6 +31,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.page_cache.AnonymousPageCacheMiddleware',
+    'core.queries.QueryBudgetMiddleware',
+    'core.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -37,6 +43,17 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Превышение бюджета запросов и N+1 — ошибка, а не запись в журнал.
+# Тесты включают этот режим сами
+QUERY_BUDGET_STRICT = False
+TEST_RUNNER = 'core.testing.QueryBudgetRunner'
+
+# Сколько секунд хранить страницы для анонимов; 0 выключает кеш.
+# Раньше срока запись сбрасывается при изменении данных страницы
+PAGE_CACHE_TIMEOUT = 60 * 10
+# Сколько секунд хранить отрисованные карточки постов; 0 выключает кеш
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
@@ -63,9 +80,44 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение живёт между запросами: без повторного открытия
+        # файла и прагм на каждый запрос
+        'CONN_MAX_AGE': 60,
     }
 }
 
+# Прагмы каждого нового соединения SQLite (core/sqlite.py)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — размер в КиБ, а не в страницах
+    'cache_size': -64 * 1024,
+    'temp_store': 'memory',
+}
+# Повторы пишущих представлений при занятой базе и первая пауза, с
+SQLITE_LOCK_RETRIES = 3
+SQLITE_LOCK_RETRY_DELAY = 0.05
+
+# Реплика только для чтения. Локально это копия основной базы,
+# которую обновляет manage.py sync_replicas
+if os.environ.get('YATUBE_REPLICA'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['YATUBE_REPLICA'],
+        'CONN_MAX_AGE': 60,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+# Сколько секунд после записи сессия читает из основной базы
+REPLICA_PIN_SECONDS = 10
+# Сколько секунд после изменения данных их читают из основной базы:
+# на столько реплика может отставать
+REPLICA_LAG_SECONDS = 10
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -95,12 +147,32 @@ STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 
 STATIC_URL = '/static/'
 
+# Сессия и пользователь запроса могут читаться из кеша, а не из базы,
+# но только с общим для всех процессов кешем (SQLiteCache ниже): с
+# LocMemCache выход в одном процессе не завершит сессию в остальных.
+# С общим кешем включаются так:
+# SESSION_ENGINE = 'core.sessions'
+# USER_CACHE_TIMEOUT = 60
+SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# ModelBackend остаётся для сессий, открытых до появления кеша
+AUTHENTICATION_BACKENDS = ['core.auth.CachedModelBackend',
+                           'django.contrib.auth.backends.ModelBackend']
+# Сколько секунд хранить пользователя сессии; 0 выключает кеш.
+# Правка пользователя и выход сбрасывают запись раньше срока
+USER_CACHE_TIMEOUT = 0
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
 
+# Письма ставятся в очередь в базе, а отправляет их пачками команда
+# send_mail_queue через бэкенд EMAIL_DELIVERY_BACKEND
+EMAIL_BACKEND = 'core.mail.QueuedEmailBackend'
 #  подключаем движок filebased.EmailBackend
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+EMAIL_DELIVERY_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+EMAIL_BATCH_SIZE = 100
+# Через сколько секунд письмо упавшего обработчика берёт другой
+EMAIL_LOCK_SECONDS = 5 * 60
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
@@ -117,3 +189,24 @@ CACHES = {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+
+# Курсорная пагинация лент по ключу (pub_date, id): без COUNT(*) и OFFSET
+POSTS_CURSOR_PAGINATION = False
+
+# Для нескольких воркеров на одном хосте кеш должен быть общим,
+# иначе каждый процесс прогревает и сбрасывает свою копию:
+# CACHES = {
+#     'default': {
+#         'BACKEND': 'core.cache_backend.SQLiteCache',
+#         'LOCATION': os.path.join(BASE_DIR, 'cache', 'cache.sqlite3'),
+#         'TIMEOUT': None,
+#         'OPTIONS': {'MAX_ENTRIES': 100000},
+#     }
+# }
+
+# Очередь фоновых задач core.jobs, выполняет команда runworker.
+# Через сколько секунд задачу упавшего воркера берёт другой
+JOB_VISIBILITY_TIMEOUT = 5 * 60
+JOB_MAX_ATTEMPTS = 5
+# Пауза перед первым повтором, дальше она растёт вдвое
+JOB_RETRY_DELAY = 10